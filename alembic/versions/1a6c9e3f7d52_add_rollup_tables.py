@@ -0,0 +1,45 @@
+"""Add rollup tables
+
+Revision ID: 1a6c9e3f7d52
+Revises: f4d2a8c6b913
+Create Date: 2026-10-18 16:31:09.224170
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '1a6c9e3f7d52'
+down_revision = 'f4d2a8c6b913'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Existing data is counted in by `python -m app.rollups rebuild`
+    op.create_table('run_rollups',
+    sa.Column('granularity', sa.String(), nullable=False),
+    sa.Column('bucket_start', sa.DateTime(), nullable=False),
+    sa.Column('run_name', sa.String(), nullable=False),
+    sa.Column('status', sa.String(), nullable=False),
+    sa.Column('count', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('granularity', 'bucket_start', 'run_name', 'status')
+    )
+    op.create_table('phase_rollups',
+    sa.Column('granularity', sa.String(), nullable=False),
+    sa.Column('bucket_start', sa.DateTime(), nullable=False),
+    sa.Column('run_name', sa.String(), nullable=False),
+    sa.Column('phase_name', sa.String(), nullable=False),
+    sa.Column('status', sa.String(), nullable=False),
+    sa.Column('count', sa.Integer(), nullable=False),
+    sa.Column('duration_count', sa.Integer(), nullable=False),
+    sa.Column('duration_sum', sa.Float(), nullable=False),
+    sa.Column('duration_sumsq', sa.Float(), nullable=False),
+    sa.PrimaryKeyConstraint('granularity', 'bucket_start', 'run_name', 'phase_name', 'status')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('phase_rollups')
+    op.drop_table('run_rollups')
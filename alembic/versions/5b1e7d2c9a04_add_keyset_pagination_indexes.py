@@ -0,0 +1,26 @@
+"""Add keyset pagination indexes
+
+Revision ID: 5b1e7d2c9a04
+Revises: 20c8efc9bfb8
+Create Date: 2026-10-18 09:12:41.503817
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5b1e7d2c9a04'
+down_revision = '20c8efc9bfb8'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_test_runs_created_at_id', 'test_runs', ['created_at', 'id'], unique=False)
+    op.create_index('ix_test_phases_test_run_id_created_at_id', 'test_phases', ['test_run_id', 'created_at', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_test_phases_test_run_id_created_at_id', table_name='test_phases')
+    op.drop_index('ix_test_runs_created_at_id', table_name='test_runs')
@@ -0,0 +1,30 @@
+"""Add run filter indexes
+
+Revision ID: 8e4a61f0c3d7
+Revises: 5b1e7d2c9a04
+Create Date: 2026-10-18 10:03:27.118402
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8e4a61f0c3d7'
+down_revision = '5b1e7d2c9a04'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_test_runs_status_created_at', 'test_runs', ['status', 'created_at', 'id'], unique=False)
+    op.create_index('ix_test_runs_uut_serial_created_at', 'test_runs', ['uut_serial', 'created_at', 'id'], unique=False)
+    op.create_index('ix_test_runs_uut_id_created_at', 'test_runs', ['uut_id', 'created_at', 'id'], unique=False)
+    op.create_index('ix_test_runs_name_created_at', 'test_runs', ['name', 'created_at', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_test_runs_name_created_at', table_name='test_runs')
+    op.drop_index('ix_test_runs_uut_id_created_at', table_name='test_runs')
+    op.drop_index('ix_test_runs_uut_serial_created_at', table_name='test_runs')
+    op.drop_index('ix_test_runs_status_created_at', table_name='test_runs')
@@ -0,0 +1,30 @@
+"""Add archived runs
+
+Revision ID: 9f1b3d7e5a20
+Revises: d5a7c2e9f148
+Create Date: 2026-10-18 19:14:27.905316
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9f1b3d7e5a20'
+down_revision = 'd5a7c2e9f148'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('archived_runs',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('month', sa.String(), nullable=False),
+    sa.Column('run_name', sa.String(), nullable=True),
+    sa.Column('archived_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('archived_runs')
@@ -0,0 +1,26 @@
+"""Add attachment sha256
+
+Revision ID: b8e3f1c5a264
+Revises: 1a6c9e3f7d52
+Create Date: 2026-10-18 17:12:40.318562
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b8e3f1c5a264'
+down_revision = '1a6c9e3f7d52'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('attachments', sa.Column('sha256', sa.String(length=64), nullable=True))
+    op.create_index(op.f('ix_attachments_sha256'), 'attachments', ['sha256'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_attachments_sha256'), table_name='attachments')
+    op.drop_column('attachments', 'sha256')
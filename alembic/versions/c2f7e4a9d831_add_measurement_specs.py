@@ -0,0 +1,38 @@
+"""Add measurement specs
+
+Revision ID: c2f7e4a9d831
+Revises: a6d3e8f2c714
+Create Date: 2026-10-18 21:48:09.530127
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c2f7e4a9d831'
+down_revision = 'a6d3e8f2c714'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('measurement_specs',
+    sa.Column('procedure', sa.String(), nullable=False),
+    sa.Column('name', sa.String(), nullable=False),
+    sa.Column('unit', sa.String(), nullable=True),
+    sa.Column('low_limit', sa.Float(), nullable=True),
+    sa.Column('high_limit', sa.Float(), nullable=True),
+    sa.Column('comparator', sa.String(), nullable=False),
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('procedure', 'name', name='uq_measurement_specs_procedure_name')
+    )
+    op.create_index(op.f('ix_measurement_specs_id'), 'measurement_specs', ['id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_measurement_specs_id'), table_name='measurement_specs')
+    op.drop_table('measurement_specs')
@@ -0,0 +1,40 @@
+"""Use JSONB on PostgreSQL
+
+Revision ID: c3f9a2d81b56
+Revises: 8e4a61f0c3d7
+Create Date: 2026-10-18 11:42:05.310947
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = 'c3f9a2d81b56'
+down_revision = '8e4a61f0c3d7'
+branch_labels = None
+depends_on = None
+
+JSON_COLUMNS = [
+    ('test_runs', 'meta_data'),
+    ('test_runs', 'results'),
+    ('test_phases', 'measurements'),
+]
+
+
+def upgrade() -> None:
+    # SQLite has a single JSON storage format; nothing to change there
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    for table, column in JSON_COLUMNS:
+        op.alter_column(table, column, type_=postgresql.JSONB(), existing_type=sa.JSON(),
+                        postgresql_using=f'{column}::jsonb')
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    for table, column in JSON_COLUMNS:
+        op.alter_column(table, column, type_=sa.JSON(), existing_type=postgresql.JSONB(),
+                        postgresql_using=f'{column}::json')
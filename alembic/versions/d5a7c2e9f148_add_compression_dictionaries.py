@@ -0,0 +1,33 @@
+"""Add compression dictionaries
+
+Revision ID: d5a7c2e9f148
+Revises: b8e3f1c5a264
+Create Date: 2026-10-18 18:02:51.730194
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd5a7c2e9f148'
+down_revision = 'b8e3f1c5a264'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('compression_dictionaries',
+    sa.Column('data', sa.LargeBinary(), nullable=False),
+    sa.Column('sample_count', sa.Integer(), nullable=True),
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_compression_dictionaries_id'), 'compression_dictionaries', ['id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_compression_dictionaries_id'), table_name='compression_dictionaries')
+    op.drop_table('compression_dictionaries')
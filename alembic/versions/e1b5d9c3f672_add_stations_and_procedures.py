@@ -0,0 +1,64 @@
+"""Add stations and procedures
+
+Revision ID: e1b5d9c3f672
+Revises: c2f7e4a9d831
+Create Date: 2026-10-18 22:31:56.204718
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e1b5d9c3f672'
+down_revision = 'c2f7e4a9d831'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('stations',
+    sa.Column('name', sa.String(), nullable=False),
+    sa.Column('description', sa.String(), nullable=True),
+    sa.Column('location', sa.String(), nullable=True),
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('name')
+    )
+    op.create_index(op.f('ix_stations_id'), 'stations', ['id'], unique=False)
+    op.create_table('procedures',
+    sa.Column('name', sa.String(), nullable=False),
+    sa.Column('description', sa.String(), nullable=True),
+    sa.Column('version', sa.String(), nullable=True),
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('name')
+    )
+    op.create_index(op.f('ix_procedures_id'), 'procedures', ['id'], unique=False)
+    # SQLite can only add a foreign key by copying the table, so on a large
+    # test_runs this takes a while and needs room for a second copy
+    with op.batch_alter_table('test_runs') as batch_op:
+        batch_op.add_column(sa.Column('station_id', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('procedure_id', sa.Integer(), nullable=True))
+        batch_op.create_foreign_key('test_runs_station_id_fkey', 'stations', ['station_id'], ['id'])
+        batch_op.create_foreign_key('test_runs_procedure_id_fkey', 'procedures', ['procedure_id'], ['id'])
+    op.create_index('ix_test_runs_station_id_created_at', 'test_runs', ['station_id', 'created_at', 'id'], unique=False)
+    op.create_index('ix_test_runs_procedure_id_created_at', 'test_runs', ['procedure_id', 'created_at', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_test_runs_procedure_id_created_at', table_name='test_runs')
+    op.drop_index('ix_test_runs_station_id_created_at', table_name='test_runs')
+    with op.batch_alter_table('test_runs') as batch_op:
+        batch_op.drop_constraint('test_runs_procedure_id_fkey', type_='foreignkey')
+        batch_op.drop_constraint('test_runs_station_id_fkey', type_='foreignkey')
+        batch_op.drop_column('procedure_id')
+        batch_op.drop_column('station_id')
+    op.drop_index(op.f('ix_procedures_id'), table_name='procedures')
+    op.drop_table('procedures')
+    op.drop_index(op.f('ix_stations_id'), table_name='stations')
+    op.drop_table('stations')
@@ -0,0 +1,128 @@
+"""Add measurements table
+
+Revision ID: e7b2c4a91f30
+Revises: c3f9a2d81b56
+Create Date: 2026-10-18 13:20:44.861203
+
+"""
+from alembic import context, op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e7b2c4a91f30'
+down_revision = 'c3f9a2d81b56'
+branch_labels = None
+depends_on = None
+
+BACKFILL_CHUNK = 1000
+
+test_phases = sa.table(
+    'test_phases',
+    sa.column('id', sa.Integer),
+    sa.column('test_run_id', sa.Integer),
+    sa.column('created_at', sa.DateTime),
+    sa.column('measurements', sa.JSON),
+)
+
+
+def _as_float(value):
+    if value is None or isinstance(value, bool):
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _passed(status, value, low, high):
+    if isinstance(status, str):
+        if status.upper() in ('PASS', 'PASSED'):
+            return True
+        if status.upper() in ('FAIL', 'FAILED'):
+            return False
+    if value is None or (low is None and high is None):
+        return None
+    return (low is None or value >= low) and (high is None or value <= high)
+
+
+def _rows(phase):
+    # Frozen copy of app.ingest.flatten_measurements as of this revision
+    if not isinstance(phase.measurements, dict):
+        return []
+    rows = []
+    for name, data in phase.measurements.items():
+        if not isinstance(data, dict):
+            data = {'value': data}
+        raw = data.get('value')
+        value = _as_float(raw)
+        limits = data.get('limits') if isinstance(data.get('limits'), dict) else {}
+        low = _as_float(limits.get('min'))
+        high = _as_float(limits.get('max'))
+        rows.append({
+            'name': name,
+            'value': value,
+            'text_value': str(raw) if value is None and raw is not None else None,
+            'unit': data.get('unit'),
+            'low_limit': low,
+            'high_limit': high,
+            'passed': _passed(data.get('status'), value, low, high),
+            'phase_id': phase.id,
+            'test_run_id': phase.test_run_id,
+            'created_at': phase.created_at,
+            'updated_at': phase.created_at,
+        })
+    return rows
+
+
+def upgrade() -> None:
+    measurements = op.create_table('measurements',
+    sa.Column('name', sa.String(), nullable=False),
+    sa.Column('value', sa.Float(), nullable=True),
+    sa.Column('text_value', sa.String(), nullable=True),
+    sa.Column('unit', sa.String(), nullable=True),
+    sa.Column('low_limit', sa.Float(), nullable=True),
+    sa.Column('high_limit', sa.Float(), nullable=True),
+    sa.Column('passed', sa.Boolean(), nullable=True),
+    sa.Column('phase_id', sa.Integer(), nullable=False),
+    sa.Column('test_run_id', sa.Integer(), nullable=False),
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['phase_id'], ['test_phases.id'], ),
+    sa.ForeignKeyConstraint(['test_run_id'], ['test_runs.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_measurements_id'), 'measurements', ['id'], unique=False)
+    op.create_index(op.f('ix_measurements_phase_id'), 'measurements', ['phase_id'], unique=False)
+    op.create_index(op.f('ix_measurements_test_run_id'), 'measurements', ['test_run_id'], unique=False)
+    op.create_index('ix_measurements_name_created_at', 'measurements', ['name', 'created_at'], unique=False)
+
+    if context.is_offline_mode():
+        return
+
+    # Backfill from the phases' JSON, walking the phases by id so each chunk
+    # is an index range scan and memory stays bounded on large databases
+    bind = op.get_bind()
+    last_id = 0
+    while True:
+        phases = bind.execute(
+            sa.select(test_phases)
+            .where(test_phases.c.id > last_id, test_phases.c.measurements.isnot(None))
+            .order_by(test_phases.c.id)
+            .limit(BACKFILL_CHUNK)
+        ).all()
+        if not phases:
+            break
+        rows = [row for phase in phases for row in _rows(phase)]
+        if rows:
+            bind.execute(measurements.insert(), rows)
+        last_id = phases[-1].id
+
+
+def downgrade() -> None:
+    op.drop_index('ix_measurements_name_created_at', table_name='measurements')
+    op.drop_index(op.f('ix_measurements_test_run_id'), table_name='measurements')
+    op.drop_index(op.f('ix_measurements_phase_id'), table_name='measurements')
+    op.drop_index(op.f('ix_measurements_id'), table_name='measurements')
+    op.drop_table('measurements')
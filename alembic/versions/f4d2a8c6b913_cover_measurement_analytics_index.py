@@ -0,0 +1,27 @@
+"""Cover measurement analytics index
+
+Revision ID: f4d2a8c6b913
+Revises: e7b2c4a91f30
+Create Date: 2026-10-18 15:07:32.559018
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f4d2a8c6b913'
+down_revision = 'e7b2c4a91f30'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.drop_index('ix_measurements_name_created_at', table_name='measurements')
+    op.create_index('ix_measurements_name_created_at', 'measurements',
+                    ['name', 'created_at', 'value', 'passed', 'test_run_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_measurements_name_created_at', table_name='measurements')
+    op.create_index('ix_measurements_name_created_at', 'measurements', ['name', 'created_at'], unique=False)
@@ -0,0 +1,51 @@
+"""Key measurement specs by procedure id
+
+Revision ID: f8a3c1d7b295
+Revises: e1b5d9c3f672
+Create Date: 2026-10-19 10:12:47.318502
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f8a3c1d7b295'
+down_revision = 'e1b5d9c3f672'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Register the procedures that only have specs so far
+    op.execute(
+        "INSERT INTO procedures (name, created_at, updated_at) "
+        "SELECT DISTINCT procedure, CURRENT_TIMESTAMP, CURRENT_TIMESTAMP FROM measurement_specs "
+        "WHERE procedure NOT IN (SELECT name FROM procedures)"
+    )
+    op.add_column('measurement_specs', sa.Column('procedure_id', sa.Integer(), nullable=True))
+    op.execute(
+        "UPDATE measurement_specs SET procedure_id = "
+        "(SELECT id FROM procedures WHERE procedures.name = measurement_specs.procedure)"
+    )
+    # The table is small, so copying it on SQLite to add the foreign key is fine
+    with op.batch_alter_table('measurement_specs') as batch_op:
+        batch_op.drop_constraint('uq_measurement_specs_procedure_name', type_='unique')
+        batch_op.drop_column('procedure')
+        batch_op.alter_column('procedure_id', existing_type=sa.Integer(), nullable=False)
+        batch_op.create_unique_constraint('uq_measurement_specs_procedure_id_name', ['procedure_id', 'name'])
+        batch_op.create_foreign_key('measurement_specs_procedure_id_fkey', 'procedures', ['procedure_id'], ['id'])
+
+
+def downgrade() -> None:
+    op.add_column('measurement_specs', sa.Column('procedure', sa.String(), nullable=True))
+    op.execute(
+        "UPDATE measurement_specs SET procedure = "
+        "(SELECT name FROM procedures WHERE procedures.id = measurement_specs.procedure_id)"
+    )
+    with op.batch_alter_table('measurement_specs') as batch_op:
+        batch_op.drop_constraint('measurement_specs_procedure_id_fkey', type_='foreignkey')
+        batch_op.drop_constraint('uq_measurement_specs_procedure_id_name', type_='unique')
+        batch_op.drop_column('procedure_id')
+        batch_op.alter_column('procedure', existing_type=sa.String(), nullable=False)
+        batch_op.create_unique_constraint('uq_measurement_specs_procedure_name', ['procedure', 'name'])
@@ -0,0 +1,249 @@
+import os
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import List, Optional, Tuple
+import numpy as np
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .database import is_sqlite
+from .models import measurement
+
+BUCKETS = {"hour": 3600, "day": 86400, "week": 7 * 86400}
+PERCENTILES = (1, 5, 25, 50, 75, 95, 99)
+CHUNK_SIZE = 100_000
+# Memory for cached samples over all measurements, 40 bytes per sample; 0 turns the cache off
+CACHE_BYTES = int(float(os.environ.get("NOTTOFU_ANALYTICS_CACHE_MB", 160)) * 1024 * 1024)
+
+# 1970-01-01 was a Thursday; weekly buckets start on Monday
+_WEEK_ORIGIN = 4 * 86400
+
+# Columns of the sample array returned by load_samples
+TIME, VALUE, PASSED, RUN, ID = range(5)
+
+
+def _epoch_seconds(column):
+    if is_sqlite:
+        # julianday() resolves milliseconds; rounding to them keeps whole
+        # seconds exact, e.g. a sample at midnight in its own day's bucket
+        return func.round((func.julianday(column) - 2440587.5) * 86400.0, 3)
+    return func.extract("epoch", column)
+
+
+def _fetch_array(sync_conn, stmt, width: int) -> np.ndarray:
+    """
+    Run ``stmt`` on a raw DB-API cursor and return its rows as a float64 array.
+
+    Rows are pulled CHUNK_SIZE at a time and converted chunk by chunk, skipping
+    SQLAlchemy's per-row Result objects, which cost several times more than
+    the query itself at a million rows. NULLs become NaN.
+    """
+    compiled = stmt.compile(dialect=sync_conn.dialect)
+    params = compiled.construct_params()
+    if compiled.positional:
+        params = tuple(params[key] for key in compiled.positiontup)
+    cursor = sync_conn.connection.dbapi_connection.cursor()
+    try:
+        cursor.execute(str(compiled), params)
+        chunks = []
+        while True:
+            rows = cursor.fetchmany(CHUNK_SIZE)
+            if not rows:
+                break
+            chunks.append(np.array(rows, dtype=np.float64))
+    finally:
+        cursor.close()
+    return np.concatenate(chunks) if chunks else np.empty((0, width))
+
+
+def _filtered(query, name: str, created_after: Optional[datetime], created_before: Optional[datetime]):
+    query = query.where(measurement.Measurement.name == name)
+    if created_after is not None:
+        query = query.where(measurement.Measurement.created_at >= created_after)
+    if created_before is not None:
+        query = query.where(measurement.Measurement.created_at < created_before)
+    return query
+
+
+def _epoch(value: datetime) -> float:
+    """The wall-clock time of ``value`` in epoch seconds, read as UTC like the stored timestamps."""
+    return value.replace(tzinfo=timezone.utc).timestamp()
+
+
+async def _query_samples(db: AsyncSession, name: str, created_after: Optional[datetime] = None,
+                         created_before: Optional[datetime] = None, after_id: int = 0) -> np.ndarray:
+    m = measurement.Measurement
+    query = _filtered(
+        select(_epoch_seconds(m.created_at), m.value, m.passed, m.test_run_id, m.id),
+        name, created_after, created_before,
+    )
+    if after_id:
+        query = query.where(m.id > after_id)
+    conn = await db.connection()
+    return await conn.run_sync(_fetch_array, query.order_by(m.created_at), 5)
+
+
+class SampleCache:
+    """
+    Every sample of recently requested measurements, by name, so a request
+    reads only the rows stored since the previous one rather than the
+    measurement's whole history.
+
+    Each request also counts the measurement's rows, a scan of the index
+    alone. When the count doesn't add up, because rows were deleted
+    (archived) or committed out of id order, the entry is reloaded in full.
+    At most ``max_bytes`` of samples are kept over all measurements, least
+    recently used out first; a measurement larger than that is read in full
+    for each request and not kept. Only used from the event loop thread.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        # name -> (highest id loaded, samples in time order)
+        self._entries: "OrderedDict[str, Tuple[int, np.ndarray]]" = OrderedDict()
+        self._size = 0
+
+    async def get(self, db: AsyncSession, name: str) -> np.ndarray:
+        entry = self._entries.get(name)
+        if entry is None:
+            return self._store(name, await _query_samples(db, name))
+
+        last_id, samples = entry
+        new = await _query_samples(db, name, after_id=last_id)
+        # Rows stored after the query above have higher ids, so they aren't counted
+        bound = int(new[:, ID].max()) if len(new) else last_id
+        m = measurement.Measurement
+        count = await db.scalar(select(func.count()).where(m.name == name, m.id <= bound))
+        if len(samples) + len(new) != count:
+            return self._store(name, await _query_samples(db, name))
+
+        # Another request may have updated the entry while this one waited
+        last_id, samples = self._entries.get(name, entry)
+        new = new[new[:, ID] > last_id]
+        if not len(new):
+            if name in self._entries:
+                self._entries.move_to_end(name)
+            return samples
+        backfilled = len(samples) and new[0, TIME] < samples[-1, TIME]
+        samples = np.concatenate([samples, new])
+        if backfilled:
+            # Samples stored late with earlier timestamps belong among the cached ones
+            samples = samples[np.argsort(samples[:, TIME], kind="stable")]
+        return self._store(name, samples)
+
+    def clear(self):
+        self._entries.clear()
+        self._size = 0
+
+    def _store(self, name: str, samples: np.ndarray) -> np.ndarray:
+        previous = self._entries.pop(name, None)
+        if previous is not None:
+            self._size -= previous[1].nbytes
+        if samples.nbytes <= self.max_bytes:
+            last_id = int(samples[:, ID].max()) if len(samples) else 0
+            self._entries[name] = (last_id, samples)
+            self._size += samples.nbytes
+            while self._size > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self._size -= evicted.nbytes
+        return samples
+
+
+sample_cache = SampleCache(CACHE_BYTES)
+
+
+async def load_samples(db: AsyncSession, name: str, created_after: Optional[datetime] = None,
+                       created_before: Optional[datetime] = None) -> np.ndarray:
+    """
+    Load every sample of measurement ``name`` as an (n, 5) array of
+    [epoch seconds, value, passed, test_run_id, id] in time order.
+
+    Samples come from sample_cache, sliced to the time range, which
+    timestamps resolve to the millisecond. With the cache off they are read
+    straight from ix_measurements_name_created_at.
+    """
+    if not sample_cache.max_bytes:
+        return await _query_samples(db, name, created_after, created_before)
+    samples = await sample_cache.get(db, name)
+    times = samples[:, TIME]
+    start = np.searchsorted(times, _epoch(created_after)) if created_after is not None else 0
+    stop = np.searchsorted(times, _epoch(created_before)) if created_before is not None else len(samples)
+    return samples[start:stop]
+
+
+async def latest_limits(db: AsyncSession, name: str, created_after: Optional[datetime] = None,
+                        created_before: Optional[datetime] = None) -> Tuple[Optional[float], Optional[float]]:
+    """The (low, high) limits of the most recent sample in the range."""
+    m = measurement.Measurement
+    query = _filtered(select(m.low_limit, m.high_limit), name, created_after, created_before)
+    row = (await db.execute(query.order_by(m.created_at.desc()).limit(1))).first()
+    return (row.low_limit, row.high_limit) if row else (None, None)
+
+
+def _finite(value) -> Optional[float]:
+    value = float(value)
+    return value if np.isfinite(value) else None
+
+
+def summarize(samples: np.ndarray, low: Optional[float], high: Optional[float]) -> dict:
+    """Descriptive statistics and Cp/Cpk for the numeric values in ``samples``."""
+    values = samples[:, VALUE]
+    values = values[~np.isnan(values)]
+    stats = {"count": int(values.size), "mean": None, "std": None, "min": None, "max": None,
+             "percentiles": {}, "cp": None, "cpk": None}
+    if not values.size:
+        return stats
+
+    mean = values.mean()
+    std = values.std(ddof=1) if values.size > 1 else 0.0
+    stats.update({
+        "mean": _finite(mean),
+        "std": _finite(std),
+        "min": _finite(values.min()),
+        "max": _finite(values.max()),
+        "percentiles": {f"p{p}": _finite(v) for p, v in zip(PERCENTILES, np.percentile(values, PERCENTILES))},
+    })
+
+    if std > 0:
+        if low is not None and high is not None:
+            stats["cp"] = _finite((high - low) / (6 * std))
+        sides = [(high - mean) if high is not None else None, (mean - low) if low is not None else None]
+        sides = [side for side in sides if side is not None]
+        if sides:
+            stats["cpk"] = _finite(min(sides) / (3 * std))
+    return stats
+
+
+def yield_by_bucket(samples: np.ndarray, bucket: str) -> List[dict]:
+    """
+    Sample counts and first-pass yield per time bucket.
+
+    A run's first pass is its earliest sample of the measurement, so retries
+    within a run don't hide the initial failure. Each run counts towards the
+    bucket its first sample falls in; runs whose first sample has no pass/fail
+    verdict are left out of the yield.
+    """
+    if not samples.size:
+        return []
+    width = BUCKETS[bucket]
+    origin = _WEEK_ORIGIN if bucket == "week" else 0
+    starts = np.floor((samples[:, TIME] - origin) / width) * width + origin
+    bucket_starts, bucket_index = np.unique(starts, return_inverse=True)
+    counts = np.bincount(bucket_index, minlength=bucket_starts.size)
+
+    # Samples are time ordered, so the first index of each run is its first pass
+    _, first = np.unique(samples[:, RUN], return_index=True)
+    first_passed = samples[first, PASSED]
+    judged = first[~np.isnan(first_passed)]
+    runs = np.bincount(bucket_index[judged], minlength=bucket_starts.size)
+    passed = np.bincount(bucket_index[judged], weights=samples[judged, PASSED], minlength=bucket_starts.size)
+
+    return [
+        {
+            "start": datetime.fromtimestamp(start, tz=timezone.utc).replace(tzinfo=None),
+            "samples": int(count),
+            "runs": int(run_count),
+            "first_pass_yield": float(passed_count / run_count) if run_count else None,
+        }
+        for start, count, run_count, passed_count in zip(bucket_starts, counts, runs, passed)
+    ]
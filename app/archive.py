@@ -0,0 +1,206 @@
+"""
+Archival of old runs to Parquet.
+
+``python -m app.archive run`` moves runs created more than
+NOTTOFU_ARCHIVE_AFTER_DAYS ago, together with their phases, measurements
+and attachment records, out of the database into Parquet files under
+NOTTOFU_ARCHIVE_DIR, partitioned Hive-style by month and run name:
+
+    archive/test_phases/month=2025-04/run_name=Motor%20Test/1-1000.parquet
+
+The database keeps one archived_runs row per run saying where it went, so
+the read endpoints can fall through to the right partition for an id that
+is no longer in the hot tables. Rollups are left alone and keep counting
+archived runs, and ``python -m app.rollups rebuild`` reads them back from
+the archive; measurement analytics and run listings cover the database
+only. Attachment contents stay in the blob store.
+
+Each batch is written to Parquet before its rows are deleted in the same
+transaction, so a crash can leave a batch archived twice but never lost;
+readers drop the duplicates.
+"""
+import argparse
+import os
+from datetime import datetime, timedelta
+from typing import Collection, Dict, List, Optional, Sequence
+from urllib.parse import quote
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+from sqlalchemy import delete, insert, select
+from sqlalchemy.engine import Connection
+
+from . import columnar, compression
+from .database import engine
+from .models import archived_run, attachment, measurement, test_phase, test_run
+
+ARCHIVE_DIR = os.environ.get("NOTTOFU_ARCHIVE_DIR", "./archive")
+ARCHIVE_AFTER_DAYS = int(os.environ.get("NOTTOFU_ARCHIVE_AFTER_DAYS", 90))
+ARCHIVE_BATCH = 1000
+
+# Hive's name for a null partition value
+_NULL_PARTITION = "__HIVE_DEFAULT_PARTITION__"
+
+RUNS = test_run.TestRun.__table__
+PHASES = test_phase.TestPhase.__table__
+MEASUREMENTS = measurement.Measurement.__table__
+ATTACHMENTS = attachment.Attachment.__table__
+
+
+def month_of(created_at: datetime) -> str:
+    return created_at.strftime("%Y-%m")
+
+
+def partition_dir(table_name: str, month: str, run_name: Optional[str], root: str = ARCHIVE_DIR) -> str:
+    name = quote(run_name, safe="") if run_name else _NULL_PARTITION
+    return os.path.join(root, table_name, f"month={month}", f"run_name={name}")
+
+
+def _write_partitions(table, rows: Sequence, run_partitions: Dict[int, tuple], basename: str, root: str):
+    """Write ``rows`` of ``table`` (each with a test_run_id) into their runs' partitions."""
+    by_partition: Dict[tuple, list] = {}
+    run_id_index = list(table.columns.keys()).index("id" if table is RUNS else "test_run_id")
+    for row in rows:
+        by_partition.setdefault(run_partitions[row[run_id_index]], []).append(row)
+    for (month, run_name), partition_rows in by_partition.items():
+        path = partition_dir(table.name, month, run_name, root)
+        os.makedirs(path, exist_ok=True)
+        batch = columnar.record_batch(list(table.columns), partition_rows)
+        tmp_path = os.path.join(path, f".{basename}.tmp")
+        pq.write_table(pa.Table.from_batches([batch]), tmp_path, compression="zstd")
+        os.replace(tmp_path, os.path.join(path, basename))
+
+
+def _archive_batch(conn: Connection, run_ids: List[int], root: str):
+    runs = conn.execute(select(RUNS).where(RUNS.c.id.in_(run_ids)).order_by(RUNS.c.created_at, RUNS.c.id)).all()
+    run_partitions = {row.id: (month_of(row.created_at), row.name) for row in runs}
+    basename = f"{run_ids[0]}-{run_ids[-1]}.parquet"
+
+    for table in (RUNS, PHASES, MEASUREMENTS, ATTACHMENTS):
+        if table is RUNS:
+            rows = runs
+        else:
+            rows = conn.execute(select(table).where(table.c.test_run_id.in_(run_ids)).order_by(table.c.id)).all()
+        if rows:
+            _write_partitions(table, rows, run_partitions, basename, root)
+
+    for table in (MEASUREMENTS, ATTACHMENTS, PHASES):
+        conn.execute(delete(table).where(table.c.test_run_id.in_(run_ids)))
+    conn.execute(delete(RUNS).where(RUNS.c.id.in_(run_ids)))
+
+
+def archive_runs(older_than: timedelta, root: str = ARCHIVE_DIR, batch_size: int = ARCHIVE_BATCH) -> int:
+    """Move runs created before now - ``older_than`` to the archive and return how many were moved."""
+    cutoff = datetime.utcnow() - older_than
+    archived = 0
+    while True:
+        with engine.begin() as conn:
+            # No phase may be added to these runs between reading and deleting
+            # them: FOR UPDATE blocks that on PostgreSQL, and on SQLite
+            # recording the runs below takes the write lock before anything
+            # else is read
+            runs = conn.execute(
+                select(RUNS.c.id, RUNS.c.name, RUNS.c.created_at)
+                .where(RUNS.c.created_at < cutoff).order_by(RUNS.c.created_at, RUNS.c.id).limit(batch_size)
+                .with_for_update()
+            ).all()
+            if not runs:
+                return archived
+            now = datetime.utcnow()
+            conn.execute(insert(archived_run.ArchivedRun), [
+                {"id": run.id, "month": month_of(run.created_at), "run_name": run.name, "archived_at": now}
+                for run in runs
+            ])
+            # Batches follow creation time so each one adds files to only
+            # about one month's partitions
+            _archive_batch(conn, [run.id for run in runs], root)
+        archived += len(runs)
+
+
+def _read_partition(table, entry: archived_run.ArchivedRun, column: str, value: int,
+                    root: str = ARCHIVE_DIR) -> List[dict]:
+    """Rows of ``table`` in ``entry``'s partition whose ``column`` equals ``value``, without duplicates."""
+    path = partition_dir(table.name, entry.month, entry.run_name, root)
+    if not os.path.isdir(path):
+        return []
+    data = pq.read_table(path, filters=[(column, "=", value)], partitioning=None)
+    rows = {}
+    for row in columnar.to_rows(data, list(table.columns)):
+        rows.setdefault(row["id"], row)
+    return list(rows.values())
+
+
+def read_partition_columns(table, month: str, run_name: Optional[str], run_ids: Collection[int],
+                           columns: List[str], root: str = ARCHIVE_DIR) -> List[dict]:
+    """
+    ``columns`` of the rows of ``table`` in a partition that belong to the
+    runs ``run_ids``, without duplicates. Passing the partition's
+    archived_runs ids leaves out files of a batch whose archiving rolled back.
+    """
+    path = partition_dir(table.name, month, run_name, root)
+    if not os.path.isdir(path):
+        return []
+    run_column = "id" if table is RUNS else "test_run_id"
+    data = pq.read_table(path, columns=list(dict.fromkeys(["id", run_column, *columns])), partitioning=None)
+    rows = {}
+    for row in data.to_pylist():
+        if row[run_column] in run_ids:
+            rows.setdefault(row["id"], row)
+    return list(rows.values())
+
+
+def read_run(entry: archived_run.ArchivedRun) -> Optional[dict]:
+    runs = _read_partition(RUNS, entry, "id", entry.id)
+    return runs[0] if runs else None
+
+
+def read_phases(entry: archived_run.ArchivedRun) -> List[dict]:
+    return _read_partition(PHASES, entry, "test_run_id", entry.id)
+
+
+def read_attachments(entry: archived_run.ArchivedRun) -> List[dict]:
+    return _read_partition(ATTACHMENTS, entry, "test_run_id", entry.id)
+
+
+def read_run_detail(entry: archived_run.ArchivedRun, phases: bool = False, attachments: bool = False) -> Optional[dict]:
+    """An archived run shaped like the get_test_run response, with phases and/or attachments embedded."""
+    run = read_run(entry)
+    if run is None:
+        return None
+    files = sorted(read_attachments(entry), key=lambda a: a["id"]) if attachments else []
+    if phases:
+        run["phases"] = []
+        for phase in sorted(read_phases(entry), key=lambda p: (p["created_at"], p["id"])):
+            if attachments:
+                phase["attachments"] = [a for a in files if a["phase_id"] == phase["id"]]
+            run["phases"].append(phase)
+    if attachments:
+        run["attachments"] = files
+    return run
+
+
+def find_attachment(attachment_id: int, root: str = ARCHIVE_DIR) -> Optional[dict]:
+    """
+    Look up an archived attachment by id. Attachment ids aren't indexed, so
+    this checks every attachment file, though Parquet statistics let it skip
+    reading most of them.
+    """
+    path = os.path.join(root, ATTACHMENTS.name)
+    if not os.path.isdir(path):
+        return None
+    dataset = ds.dataset(path, format="parquet", partitioning="hive")
+    data = dataset.to_table(columns=list(ATTACHMENTS.columns.keys()), filter=ds.field("id") == attachment_id)
+    rows = columnar.to_rows(data, list(ATTACHMENTS.columns))
+    return rows[0] if rows else None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog="python -m app.archive")
+    commands = parser.add_subparsers(dest="command", required=True)
+    run_command = commands.add_parser("run", help="archive old runs")
+    run_command.add_argument("--older-than", type=int, default=ARCHIVE_AFTER_DAYS, metavar="DAYS",
+                             help=f"archive runs created more than DAYS days ago (default {ARCHIVE_AFTER_DAYS})")
+    args = parser.parse_args()
+    compression.dictionaries.load()
+    count = archive_runs(timedelta(days=args.older_than))
+    print(f"Archived {count} runs to {ARCHIVE_DIR}")
@@ -0,0 +1,177 @@
+import hashlib
+import os
+import struct
+import tempfile
+from typing import BinaryIO, Iterator, List, Optional, Tuple
+import zstandard
+
+CHUNK_SIZE = 1024 * 1024
+
+# Files whose first chunk doesn't shrink below this ratio (images, archives,
+# other already compressed data) are stored as they are
+MIN_SAVING = 0.9
+
+# Trailer of the zstd seekable format: a skippable frame holding one
+# (compressed size, decompressed size) entry per frame, then a footer of
+# frame count, descriptor byte and magic number
+_SKIPPABLE_MAGIC = 0x184D2A5E
+_SEEKABLE_MAGIC = 0x8F92EAB1
+_SEEK_ENTRY = struct.Struct("<II")
+_SEEK_FOOTER = struct.Struct("<IBI")
+
+
+class BlobStore:
+    """
+    Content-addressed file store for attachment bodies.
+
+    Each blob lives at ``<root>/ab/cd/<sha256>``, so identical uploads share
+    one file no matter how many attachments reference it. Uploads are copied
+    in CHUNK_SIZE pieces into a temporary file next to the blobs while being
+    hashed, then renamed into place, so memory use doesn't depend on the file
+    size and readers never see a partially written blob.
+
+    With ``compress`` set, blobs that compress well are stored as
+    ``<sha256>.zst`` in the zstd seekable format: one independent frame per
+    CHUNK_SIZE of content plus a seek table, so a range can be read by
+    decompressing only the chunks it covers. The file is still a valid zstd
+    stream for the ``zstd`` command line tool. The hash is always of the
+    uncompressed content.
+
+    Blobs are immutable once written. The methods do blocking file I/O; call
+    them from a thread pool.
+    """
+
+    def __init__(self, root: str, compress: bool = False, level: int = 3):
+        self.root = root
+        self.compress = compress
+        self.level = level
+
+    def path(self, digest: str) -> str:
+        return os.path.join(self.root, digest[:2], digest[2:4], digest)
+
+    def locate(self, digest: str) -> Optional[Tuple[str, bool]]:
+        """(path, compressed) of a stored blob, or None if it is missing."""
+        path = self.path(digest)
+        if os.path.isfile(path):
+            return path, False
+        if os.path.isfile(path + ".zst"):
+            return path + ".zst", True
+        return None
+
+    def exists(self, digest: str) -> bool:
+        return self.locate(digest) is not None
+
+    def put(self, source: BinaryIO) -> Tuple[str, int]:
+        """Store the rest of ``source`` and return its (sha256 hex digest, size in bytes)."""
+        tmp_dir = os.path.join(self.root, "tmp")
+        os.makedirs(tmp_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=tmp_dir)
+        try:
+            hasher = hashlib.sha256()
+            size = 0
+            compressor = zstandard.ZstdCompressor(level=self.level) if self.compress else None
+            seek_table: List[Tuple[int, int]] = []
+            with os.fdopen(fd, "wb") as out:
+                while True:
+                    chunk = source.read(CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    hasher.update(chunk)
+                    size += len(chunk)
+                    if compressor is not None:
+                        frame = compressor.compress(chunk)
+                        if not seek_table and len(frame) > len(chunk) * MIN_SAVING:
+                            compressor = None
+                        else:
+                            out.write(frame)
+                            seek_table.append((len(frame), len(chunk)))
+                            continue
+                    out.write(chunk)
+                if seek_table:
+                    _write_seek_table(out, seek_table)
+                out.flush()
+                # The attachment row is committed after this returns, so the
+                # blob must not be lost to a crash once it is referenced
+                os.fsync(out.fileno())
+
+            digest = hasher.hexdigest()
+            if self.exists(digest):
+                os.unlink(tmp_path)
+            else:
+                path = self.path(digest) + (".zst" if seek_table else "")
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                # Atomic, so concurrent uploads of the same content are harmless
+                os.replace(tmp_path, path)
+            return digest, size
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+
+    def read_compressed(self, path: str, start: int, end: int) -> Iterator[bytes]:
+        """Yield bytes ``start`` to ``end`` (inclusive) of a compressed blob's content, chunk by chunk."""
+        decompressor = zstandard.ZstdDecompressor()
+        with open(path, "rb") as f:
+            offset = position = 0
+            for compressed_size, size in _read_seek_table(f):
+                if position + size > start:
+                    f.seek(offset)
+                    data = decompressor.decompress(f.read(compressed_size))
+                    yield data[max(start - position, 0):end + 1 - position]
+                position += size
+                offset += compressed_size
+                if position > end:
+                    return
+
+    def size(self, path: str, compressed: bool) -> int:
+        """Size of a blob's content."""
+        if not compressed:
+            return os.path.getsize(path)
+        with open(path, "rb") as f:
+            return sum(size for _, size in _read_seek_table(f))
+
+
+def _write_seek_table(out: BinaryIO, seek_table: List[Tuple[int, int]]):
+    entries = b"".join(_SEEK_ENTRY.pack(*entry) for entry in seek_table)
+    footer = _SEEK_FOOTER.pack(len(seek_table), 0, _SEEKABLE_MAGIC)
+    out.write(struct.pack("<II", _SKIPPABLE_MAGIC, len(entries) + len(footer)))
+    out.write(entries)
+    out.write(footer)
+
+
+def _read_seek_table(f: BinaryIO) -> List[Tuple[int, int]]:
+    f.seek(-_SEEK_FOOTER.size, os.SEEK_END)
+    frames, descriptor, magic = _SEEK_FOOTER.unpack(f.read(_SEEK_FOOTER.size))
+    if magic != _SEEKABLE_MAGIC or descriptor & 0x80:
+        raise ValueError("Not a seekable zstd blob")
+    f.seek(-_SEEK_FOOTER.size - frames * _SEEK_ENTRY.size, os.SEEK_END)
+    entries = f.read(frames * _SEEK_ENTRY.size)
+    return [_SEEK_ENTRY.unpack_from(entries, i * _SEEK_ENTRY.size) for i in range(frames)]
+
+
+def parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """
+    The inclusive (start, end) of a single-range ``Range: bytes=`` header, or
+    None to send the whole body (no header, or one this doesn't handle, such
+    as multiple ranges). Raises ValueError for an unsatisfiable range.
+    """
+    if not header or not header.startswith("bytes=") or "," in header:
+        return None
+    first, _, last = header[len("bytes="):].strip().partition("-")
+    try:
+        if not first:
+            start, end = max(size - int(last), 0), size - 1
+        else:
+            start, end = int(first), min(int(last), size - 1) if last else size - 1
+    except ValueError:
+        return None
+    if start >= size or start > end:
+        raise ValueError(f"Range not satisfiable: {header}")
+    return start, end
+
+
+blob_store = BlobStore(
+    os.environ.get("NOTTOFU_BLOB_DIR", "./blobs"),
+    compress=os.environ.get("NOTTOFU_COMPRESS_ATTACHMENTS", "0") == "1",
+    level=int(os.environ.get("NOTTOFU_ZSTD_LEVEL", 3)),
+)
@@ -0,0 +1,193 @@
+import asyncio
+import hashlib
+import os
+import time
+from collections import Counter, OrderedDict
+from typing import Awaitable, Callable, Dict, Hashable, Iterable, Optional, Tuple
+
+
+class CachedResponse:
+    """A serialized JSON response body together with its ETag."""
+
+    __slots__ = ("body", "etag", "headers", "expires_at", "tags")
+
+    def __init__(self, body: bytes, headers: Dict[str, str], expires_at: float, tags: frozenset):
+        self.body = body
+        self.etag = '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+        self.headers = headers
+        self.expires_at = expires_at
+        self.tags = tags
+
+
+class ResponseCache:
+    """
+    In-process LRU cache of serialized read responses with a TTL.
+
+    Entries carry tags (e.g. ``run:42``) so that writes can invalidate exactly
+    the responses that include the data they changed. The TTL only bounds
+    staleness from writers this process does not see, such as other workers
+    or scripts writing straight to the database.
+
+    A response is built from the database while writes can still commit, so
+    builds are bracketed by begin_build() and end_build(): every
+    invalidation bumps a generation counter and stamps its tags with it, and
+    set() doesn't store a response if one of its tags was invalidated after
+    its build began, as the response may predate that write.
+
+    get_or_build() lets concurrent misses of one key wait for a single
+    build, e.g. every open dashboard refetching after the same event. A
+    request only joins a build that began after the latest invalidation, so
+    it never gets a response from before a write it may have been told of.
+
+    All access happens on the event loop thread, so no locking is needed.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 10.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: "OrderedDict[Hashable, CachedResponse]" = OrderedDict()
+        self._tags: Dict[str, set] = {}
+        self._generation = 0
+        # Tag -> generation of its last invalidation, oldest first. Only
+        # kept while a build that began before it is still running.
+        self._invalidated: "OrderedDict[str, int]" = OrderedDict()
+        self._cleared = 0
+        self._builds: Counter = Counter()  # Generation a running build began at -> how many
+        self._flights: Dict[Hashable, Tuple[int, asyncio.Future]] = {}  # Key -> running get_or_build
+
+    def begin_build(self) -> int:
+        """Note that a response is about to be built; pass the result to set() and end_build()."""
+        self._builds[self._generation] += 1
+        return self._generation
+
+    def end_build(self, generation: int):
+        self._builds[generation] -= 1
+        if not self._builds[generation]:
+            del self._builds[generation]
+        oldest = min(self._builds, default=self._generation)
+        while self._invalidated:
+            tag, invalidated = next(iter(self._invalidated.items()))
+            if invalidated > oldest:
+                break
+            del self._invalidated[tag]
+
+    def _stale(self, tags: Iterable[str], generation: int) -> bool:
+        if self._cleared > generation:
+            return True
+        return any(self._invalidated.get(tag, 0) > generation for tag in tags)
+
+    def get(self, key: Hashable) -> Optional[CachedResponse]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry.expires_at < time.monotonic():
+            self._remove(key)
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def set(self, key: Hashable, body: bytes, tags: Iterable[str], headers: Optional[Dict[str, str]] = None,
+            generation: Optional[int] = None) -> CachedResponse:
+        """
+        Cache a response and return it. With the ``generation`` its build
+        began at, a response a write may have made stale in the meantime is
+        returned without being cached.
+        """
+        entry = CachedResponse(body, headers or {}, time.monotonic() + self.ttl, frozenset(tags))
+        if generation is not None and self._stale(entry.tags, generation):
+            return entry
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = entry
+        for tag in entry.tags:
+            self._tags.setdefault(tag, set()).add(key)
+        while len(self._entries) > self.maxsize:
+            self._remove(next(iter(self._entries)))
+        return entry
+
+    async def get_or_build(self, key: Hashable,
+                           build: Callable[[], Awaitable[Tuple[bytes, Iterable[str], Dict[str, str]]]]
+                           ) -> CachedResponse:
+        """
+        The cached response for ``key``, or the one ``build`` returns as
+        ``(body, tags, headers)``, shared with concurrent misses of the key.
+        """
+        while True:
+            entry = self.get(key)
+            if entry is not None:
+                return entry
+            flight = self._flights.get(key)
+            if flight is None or flight[0] != self._generation:
+                break
+            try:
+                return await asyncio.shield(flight[1])
+            except asyncio.CancelledError:
+                # The request building it went away; build it here instead
+                if not flight[1].cancelled():
+                    raise
+
+        generation = self.begin_build()
+        future = asyncio.get_running_loop().create_future()
+        self._flights[key] = (generation, future)
+        try:
+            body, tags, headers = await build()
+            entry = self.set(key, body, tags, headers, generation)
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            # Retrieved, so it isn't logged when no other request waited
+            future.exception()
+            raise
+        else:
+            future.set_result(entry)
+        finally:
+            if self._flights.get(key, (None, None))[1] is future:
+                del self._flights[key]
+            self.end_build(generation)
+        return entry
+
+    def invalidate(self, *tags: str):
+        """Drop every entry carrying any of the given tags."""
+        self._generation += 1
+        for tag in tags:
+            for key in self._tags.pop(tag, ()):
+                self._remove(key)
+            if self._builds:
+                self._invalidated[tag] = self._generation
+                self._invalidated.move_to_end(tag)
+
+    def clear(self):
+        self._generation += 1
+        self._cleared = self._generation
+        self._entries.clear()
+        self._tags.clear()
+
+    def _remove(self, key: Hashable):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for tag in entry.tags:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """True when an If-None-Match header value matches ``etag`` (weak comparison)."""
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == etag:
+            return True
+    return False
+
+
+response_cache = ResponseCache(
+    maxsize=int(os.environ.get("NOTTOFU_CACHE_SIZE", 1024)),
+    ttl=float(os.environ.get("NOTTOFU_CACHE_TTL", 10)),
+)
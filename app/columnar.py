@@ -0,0 +1,54 @@
+import json
+from typing import Dict, List, Sequence
+import pyarrow as pa
+from sqlalchemy import Boolean, Column, DateTime, Enum, Float, Integer, LargeBinary
+
+from .compression import CompressedJSON
+
+
+def arrow_type(column: Column) -> pa.DataType:
+    """The Arrow type a table column is written as. JSON is kept as JSON text."""
+    sql_type = column.type
+    if isinstance(sql_type, Boolean):
+        return pa.bool_()
+    if isinstance(sql_type, Integer):
+        return pa.int64()
+    if isinstance(sql_type, Float):
+        return pa.float64()
+    if isinstance(sql_type, DateTime):
+        return pa.timestamp("us")
+    if isinstance(sql_type, LargeBinary):
+        return pa.binary()
+    return pa.string()
+
+
+def arrow_schema(columns: Sequence[Column]) -> pa.Schema:
+    return pa.schema([pa.field(column.name, arrow_type(column)) for column in columns])
+
+
+def _convert(column: Column, values: list) -> list:
+    if isinstance(column.type, CompressedJSON):
+        return [None if value is None else json.dumps(value, separators=(",", ":")) for value in values]
+    if isinstance(column.type, Enum):
+        return [None if value is None else value.value for value in values]
+    return values
+
+
+def record_batch(columns: Sequence[Column], rows: Sequence[Sequence]) -> pa.RecordBatch:
+    """Turn result rows of ``select(*columns)`` into a record batch, one column at a time."""
+    arrays = [
+        pa.array(_convert(column, [row[i] for row in rows]), type=arrow_type(column))
+        for i, column in enumerate(columns)
+    ]
+    return pa.RecordBatch.from_arrays(arrays, schema=arrow_schema(columns))
+
+
+def to_rows(table: pa.Table, columns: Sequence[Column]) -> List[Dict]:
+    """Inverse of record_batch: rows as dicts, with JSON columns decoded."""
+    rows = table.to_pylist()
+    json_columns = [column.name for column in columns if isinstance(column.type, CompressedJSON)]
+    for row in rows:
+        for name in json_columns:
+            if row.get(name) is not None:
+                row[name] = json.loads(row[name])
+    return rows
@@ -0,0 +1,294 @@
+"""
+Opt-in zstd compression for the JSON columns (run meta_data and results,
+phase measurements).
+
+With ``NOTTOFU_COMPRESS_JSON=1`` values written on SQLite are stored as zstd
+frames instead of JSON text, using the newest dictionary in the
+compression_dictionaries table. Typical values are a few hundred bytes, too
+small for zstd to find much repetition on its own; a dictionary trained on
+earlier rows supplies the keys, units and structure they all share. Frames
+record the id of the dictionary they were written with, so older
+dictionaries stay usable after retraining. Reads accept both forms, so the
+setting can be turned on or off at any time and existing rows are only
+converted by ``python -m app.compression recompress``.
+
+PostgreSQL already compresses large JSONB values itself (TOAST), so this
+only changes what is stored on SQLite.
+
+Commands (run with the backend stopped):
+
+    python -m app.compression train       train a dictionary from stored rows
+    python -m app.compression recompress  rewrite stored rows in the current format
+    python -m app.compression benchmark   compare sizes and timings on stored rows
+"""
+import json
+import os
+import sys
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List, Optional, Union
+import zstandard
+from sqlalchemy import JSON, bindparam, column, func, select, table, update
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.types import TypeDecorator
+
+from .database import engine, is_sqlite
+
+COMPRESS_JSON = os.environ.get("NOTTOFU_COMPRESS_JSON", "0") == "1"
+LEVEL = int(os.environ.get("NOTTOFU_ZSTD_LEVEL", 3))
+DICT_SIZE = 64 * 1024
+TRAIN_SAMPLES = 50000
+RECOMPRESS_CHUNK = 1000
+
+# (table, column) pairs stored with CompressedJSON
+JSON_COLUMNS = [
+    ("test_runs", "meta_data"),
+    ("test_runs", "results"),
+    ("test_phases", "measurements"),
+]
+
+# The columns of models.CompressionDictionary needed here, without importing
+# the models (which use CompressedJSON)
+_dictionaries_table = table(
+    "compression_dictionaries", column("id"), column("data"), column("sample_count"),
+    column("created_at"), column("updated_at"),
+)
+
+
+class DictionaryRegistry:
+    """
+    Trained dictionaries by zstd dictionary id.
+
+    load() reads them all through the synchronous engine: the backend calls
+    it at startup, train() after storing a dictionary, and the command line
+    scripts before reading JSON columns. The column type only looks them up,
+    so converting a value never queries the database. Restart the backend to
+    start using a dictionary trained by another process.
+    """
+
+    def __init__(self):
+        self._dictionaries: Dict[int, zstandard.ZstdCompressionDict] = {}
+        self._latest: Optional[int] = None
+
+    def load(self):
+        with engine.connect() as conn:
+            rows = conn.execute(select(_dictionaries_table.c.id, _dictionaries_table.c.data)
+                                .order_by(_dictionaries_table.c.id)).all()
+        dictionaries = {dict_id: self._compile(data) for dict_id, data in rows}
+        self._dictionaries = dictionaries
+        self._latest = max(dictionaries, default=None)
+
+    def get(self, dict_id: int) -> zstandard.ZstdCompressionDict:
+        dictionary = self._dictionaries.get(dict_id)
+        if dictionary is None:
+            raise LookupError(f"Compression dictionary {dict_id} isn't loaded; restart the backend to load it")
+        return dictionary
+
+    def latest(self) -> Optional[zstandard.ZstdCompressionDict]:
+        """The newest dictionary, or None to compress without one."""
+        return self._dictionaries[self._latest] if self._latest is not None else None
+
+    @staticmethod
+    def _compile(data: bytes) -> zstandard.ZstdCompressionDict:
+        dictionary = zstandard.ZstdCompressionDict(data, dict_type=zstandard.DICT_TYPE_FULLDICT)
+        dictionary.precompute_compress(level=LEVEL)
+        return dictionary
+
+
+dictionaries = DictionaryRegistry()
+
+
+# Compressor and decompressor objects are reused (building one costs more
+# than compressing a typical value) but aren't thread-safe, so each thread
+# keeps its own, keyed by dictionary id (0 for none).
+_codecs = threading.local()
+
+
+def _compressor(dictionary: Optional[zstandard.ZstdCompressionDict]) -> zstandard.ZstdCompressor:
+    cache = _codecs.__dict__.setdefault("compressors", {})
+    key = dictionary.dict_id() if dictionary is not None else 0
+    if key not in cache:
+        if dictionary is None:
+            cache[key] = zstandard.ZstdCompressor(level=LEVEL)
+        else:
+            cache[key] = zstandard.ZstdCompressor(level=LEVEL, dict_data=dictionary)
+    return cache[key]
+
+
+def _decompressor(dict_id: int) -> zstandard.ZstdDecompressor:
+    cache = _codecs.__dict__.setdefault("decompressors", {})
+    if dict_id not in cache:
+        if dict_id:
+            cache[dict_id] = zstandard.ZstdDecompressor(dict_data=dictionaries.get(dict_id))
+        else:
+            cache[dict_id] = zstandard.ZstdDecompressor()
+    return cache[dict_id]
+
+
+def encode_json(value, dictionary: Optional[zstandard.ZstdCompressionDict] = None) -> Union[str, bytes]:
+    """JSON text for ``value``, or a zstd frame of it when that is shorter."""
+    text = json.dumps(value, separators=(",", ":"))
+    frame = _compressor(dictionary).compress(text.encode())
+    return frame if len(frame) < len(text) else text
+
+
+def decode_json(data: Union[str, bytes]):
+    """Inverse of encode_json."""
+    if isinstance(data, str):
+        return json.loads(data)
+    dict_id = zstandard.get_frame_parameters(data).dict_id
+    return json.loads(_decompressor(dict_id).decompress(data))
+
+
+class CompressedJSON(TypeDecorator):
+    """
+    JSON column that is stored as zstd on SQLite when NOTTOFU_COMPRESS_JSON
+    is set and as JSONB on PostgreSQL. Values are decompressed as rows are
+    loaded, so queries that don't select the column never pay for it.
+    """
+
+    impl = JSON
+    cache_ok = True
+
+    def load_dialect_impl(self, dialect):
+        if dialect.name == "postgresql":
+            return dialect.type_descriptor(JSONB())
+        return dialect.type_descriptor(JSON())
+
+    def bind_processor(self, dialect):
+        if dialect.name != "sqlite" or not COMPRESS_JSON:
+            return self.impl_instance.bind_processor(dialect)
+
+        def process(value):
+            if value is None:
+                return None
+            return encode_json(value, dictionaries.latest())
+        return process
+
+    def result_processor(self, dialect, coltype):
+        impl_process = self.impl_instance.result_processor(dialect, coltype)
+        if dialect.name != "sqlite":
+            return impl_process
+
+        def process(value):
+            if isinstance(value, bytes):
+                return decode_json(value)
+            return impl_process(value) if impl_process else value
+        return process
+
+
+def _sample_rows(conn, limit: int) -> List[bytes]:
+    """The most recent stored JSON values of every compressed column, as JSON bytes."""
+    samples = []
+    for table_name, column_name in JSON_COLUMNS:
+        t = table(table_name, column("id"), column(column_name, CompressedJSON()))
+        values = conn.scalars(
+            select(t.c[column_name]).where(t.c[column_name].is_not(None)).order_by(t.c.id.desc()).limit(limit)
+        )
+        samples.extend(json.dumps(value, separators=(",", ":")).encode() for value in values if value is not None)
+    return samples
+
+
+def train(limit: int = TRAIN_SAMPLES) -> Optional[int]:
+    """Train a dictionary on recently stored JSON values, store it and return its id."""
+    with engine.begin() as conn:
+        samples = _sample_rows(conn, limit)
+        if len(samples) < 100:
+            return None
+        dict_id = (conn.scalar(select(func.max(_dictionaries_table.c.id))) or 0) + 1
+        dictionary = zstandard.train_dictionary(DICT_SIZE, samples, dict_id=dict_id, level=LEVEL)
+        now = datetime.utcnow()
+        conn.execute(_dictionaries_table.insert().values(
+            id=dict_id, data=dictionary.as_bytes(), sample_count=len(samples), created_at=now, updated_at=now,
+        ))
+    dictionaries.load()
+    return dict_id
+
+
+def recompress() -> int:
+    """
+    Rewrite every stored JSON value in the format new writes use, committing
+    every RECOMPRESS_CHUNK rows. Run VACUUM afterwards to hand the freed pages
+    back to the filesystem.
+    """
+    rewritten = 0
+    for table_name, column_name in JSON_COLUMNS:
+        t = table(table_name, column("id"), column(column_name, CompressedJSON()))
+        last_id = 0
+        while True:
+            with engine.begin() as conn:
+                rows = conn.execute(
+                    select(t.c.id, t.c[column_name]).where(t.c.id > last_id, t.c[column_name].is_not(None))
+                    .order_by(t.c.id).limit(RECOMPRESS_CHUNK)
+                ).all()
+                if not rows:
+                    break
+                conn.execute(
+                    update(t).where(t.c.id == bindparam("row_id")).values({column_name: bindparam("value")}),
+                    [{"row_id": row_id, "value": value} for row_id, value in rows],
+                )
+            last_id = rows[-1][0]
+            rewritten += len(rows)
+    return rewritten
+
+
+def _time_per_value(fn, values) -> float:
+    start = time.perf_counter()
+    for value in values:
+        fn(value)
+    return (time.perf_counter() - start) / len(values) * 1e6
+
+
+def benchmark(limit: int = TRAIN_SAMPLES) -> List[dict]:
+    """
+    Compare stored size and per-value encode/decode time of plain JSON, zstd
+    and zstd with the newest dictionary on the most recent stored values.
+    """
+    with engine.connect() as conn:
+        values = [json.loads(sample) for sample in _sample_rows(conn, limit)]
+    if not values:
+        return []
+    dictionary = dictionaries.latest()
+    variants = [("json", None, False), ("zstd", None, True)]
+    if dictionary is not None:
+        variants.append((f"zstd+dict {dictionary.dict_id()}", dictionary, True))
+
+    results = []
+    for name, dictionary, compress in variants:
+        if compress:
+            encode = lambda value, d=dictionary: _compressor(d).compress(json.dumps(value, separators=(",", ":")).encode())
+        else:
+            encode = lambda value: json.dumps(value)
+        encoded = [encode(value) for value in values]
+        decode = json.loads if not compress else decode_json
+        results.append({
+            "format": name,
+            "values": len(values),
+            "bytes": sum(len(data) for data in encoded),
+            "encode_us": _time_per_value(encode, values),
+            "decode_us": _time_per_value(decode, encoded),
+        })
+    return results
+
+
+if __name__ == "__main__":
+    command = sys.argv[1:]
+    dictionaries.load()
+    if command == ["train"]:
+        dict_id = train()
+        print(f"Trained dictionary {dict_id}" if dict_id else "Not enough stored values to train a dictionary")
+    elif command == ["recompress"]:
+        if not is_sqlite:
+            print("Compression only applies to SQLite databases")
+            sys.exit(1)
+        print(f"Rewrote {recompress()} values")
+    elif command == ["benchmark"]:
+        rows = benchmark()
+        plain = rows[0]["bytes"] if rows else 0
+        for row in rows:
+            print(f"{row['format']:<16} {row['values']:>8} values {row['bytes']:>12} bytes "
+                  f"({row['bytes'] / plain:6.1%})  encode {row['encode_us']:7.1f} us  decode {row['decode_us']:7.1f} us")
+    else:
+        print("Usage: python -m app.compression train|recompress|benchmark")
+        sys.exit(1)
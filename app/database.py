@@ -1,19 +1,86 @@
-from sqlalchemy import create_engine
+import os
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import URL, make_url
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 
-SQLALCHEMY_DATABASE_URL = "sqlite:///./NotTofu.db"
+DATABASE_URL = os.environ.get("NOTTOFU_DATABASE_URL", "sqlite:///./NotTofu.db")
 
+# Driver used by each supported backend as (sync, async). PostgreSQL uses
+# psycopg 3 for both so a single package covers the API and Alembic.
+_DRIVERS = {
+    "sqlite": ("pysqlite", "aiosqlite"),
+    "postgresql": ("psycopg", "psycopg"),
+}
+
+def _engine_url(url: str, use_async: bool = False) -> URL:
+    """Resolve ``url`` to the driver the sync or async engine should use."""
+    url = make_url(url)
+    backend = url.get_backend_name()
+    if backend not in _DRIVERS:
+        raise ValueError(f"Unsupported database backend: {backend}")
+    return url.set(drivername=f"{backend}+{_DRIVERS[backend][use_async]}")
+
+def _pool_options(url: URL) -> dict:
+    """
+    Connection pool settings, overridable through the environment.
+
+    Pre-ping and recycling guard against server-side connection drops, which
+    a SQLite file never has, so they default to off there.
+    """
+    server = url.get_backend_name() != "sqlite"
+    return {
+        "pool_size": int(os.environ.get("NOTTOFU_DB_POOL_SIZE", 10)),
+        "max_overflow": int(os.environ.get("NOTTOFU_DB_MAX_OVERFLOW", 20)),
+        "pool_timeout": float(os.environ.get("NOTTOFU_DB_POOL_TIMEOUT", 30)),
+        "pool_recycle": int(os.environ.get("NOTTOFU_DB_POOL_RECYCLE", 1800 if server else -1)),
+        "pool_pre_ping": os.environ.get("NOTTOFU_DB_POOL_PRE_PING", "1" if server else "0") == "1",
+    }
+
+_sync_url = _engine_url(DATABASE_URL)
+_async_url = _engine_url(DATABASE_URL, use_async=True)
+SQLALCHEMY_DATABASE_URL = _sync_url.render_as_string(hide_password=False)
+ASYNC_SQLALCHEMY_DATABASE_URL = _async_url.render_as_string(hide_password=False)
+is_sqlite = _sync_url.get_backend_name() == "sqlite"
+
+# Synchronous engine for Alembic and command line scripts
 engine = create_engine(
-    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
+    _sync_url,
+    connect_args={"check_same_thread": False} if is_sqlite else {},
+    **_pool_options(_sync_url),
 )
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Async engine used by the API so queries never block the event loop
+async_engine = create_async_engine(_async_url, **_pool_options(_async_url))
+AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+
+# Applied to every SQLite connection: WAL lets readers run alongside the
+# writer, NORMAL sync only fsyncs at checkpoints (safe in WAL mode), and the
+# busy timeout makes other processes wait for the write lock instead of
+# failing with "database is locked".
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "busy_timeout": int(os.environ.get("NOTTOFU_SQLITE_BUSY_TIMEOUT", 5000)),
+    "cache_size": -int(os.environ.get("NOTTOFU_SQLITE_CACHE_KB", 65536)),
+    "mmap_size": int(os.environ.get("NOTTOFU_SQLITE_MMAP_SIZE", 256 * 1024 * 1024)),
+    "temp_store": "MEMORY",
+}
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    for name, value in SQLITE_PRAGMAS.items():
+        cursor.execute(f"PRAGMA {name}={value}")
+    cursor.close()
+
+if is_sqlite:
+    event.listen(engine, "connect", _set_sqlite_pragmas)
+    event.listen(async_engine.sync_engine, "connect", _set_sqlite_pragmas)
+
 Base = declarative_base()
 
-def get_db():
-    db = SessionLocal()
-    try:
+async def get_db():
+    async with AsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close() 
\ No newline at end of file
@@ -0,0 +1,87 @@
+import asyncio
+import itertools
+import json
+from typing import Any, Dict, Optional, Set
+
+
+class Subscription:
+    """One stream listener: a bounded queue plus the filters it asked for."""
+
+    def __init__(self, run_id: Optional[int], station: Optional[str], maxsize: int):
+        self.run_id = run_id
+        self.station = station
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=maxsize)
+
+    def wants(self, data: Dict[str, Any]) -> bool:
+        if self.run_id is not None and data.get("test_run_id") != self.run_id:
+            return False
+        if self.station is not None and data.get("station") != self.station:
+            return False
+        return True
+
+
+class EventBroker:
+    """
+    In-process pub/sub for run change notifications.
+
+    The write endpoints publish after their commit; each /runs/stream client
+    holds a Subscription. Publishing never blocks: a subscriber that falls
+    behind loses its oldest queued events rather than stalling writers, and
+    can spot the gap from the event ids.
+
+    Publish and subscribe are only called from the event loop thread.
+    """
+
+    def __init__(self, queue_size: int = 256):
+        self.queue_size = queue_size
+        self._subscribers: Set[Subscription] = set()
+        self._ids = itertools.count(1)
+
+    def subscribe(self, run_id: Optional[int] = None, station: Optional[str] = None) -> Subscription:
+        subscription = Subscription(run_id, station, self.queue_size)
+        self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        self._subscribers.discard(subscription)
+
+    @property
+    def subscriber_count(self) -> int:
+        return len(self._subscribers)
+
+    def publish(self, event_type: str, data: Dict[str, Any]):
+        if not self._subscribers:
+            return
+        message = format_sse(next(self._ids), event_type, data)
+        for subscription in self._subscribers:
+            if not subscription.wants(data):
+                continue
+            if subscription.queue.full():
+                subscription.queue.get_nowait()
+            subscription.queue.put_nowait(message)
+
+
+def format_sse(event_id: int, event_type: str, data: Dict[str, Any]) -> str:
+    payload = json.dumps(data, default=str, separators=(",", ":"))
+    return f"id: {event_id}\nevent: {event_type}\ndata: {payload}\n\n"
+
+
+async def stream_events(broker: EventBroker, subscription: Subscription, keepalive: float = 15.0):
+    """
+    Yield SSE frames for a subscription until the client disconnects.
+
+    A comment line is sent after ``keepalive`` idle seconds so proxies keep the
+    connection open and dead clients are noticed.
+    """
+    try:
+        yield "retry: 3000\n\n"
+        while True:
+            try:
+                yield await asyncio.wait_for(subscription.queue.get(), timeout=keepalive)
+            except asyncio.TimeoutError:
+                yield ": keep-alive\n\n"
+    finally:
+        broker.unsubscribe(subscription)
+
+
+broker = EventBroker()
@@ -0,0 +1,80 @@
+import sys
+from datetime import datetime
+from typing import Optional
+from fastapi import HTTPException
+
+from .models import test_run
+from . import ingest
+
+
+def _prefix_upper_bound(prefix: str) -> Optional[str]:
+    """
+    The smallest string above every string starting with ``prefix``, or None
+    if there is none (the prefix is all U+10FFFF).
+    """
+    prefix = prefix.rstrip(chr(sys.maxunicode))
+    if not prefix:
+        return None
+    code = ord(prefix[-1]) + 1
+    if 0xD800 <= code <= 0xDFFF:
+        # Surrogates can't be stored; the next character is U+E000
+        code = 0xE000
+    return prefix[:-1] + chr(code)
+
+
+class RunFilters:
+    """
+    Query-string filters for test run listings, used as ``Depends(RunFilters)``.
+
+    Every filter is an equality or range predicate on an indexed column so it
+    can be served by the composite ``(column, created_at, id)`` indexes on
+    test_runs together with keyset pagination.
+    """
+
+    def __init__(
+        self,
+        status: Optional[str] = None,
+        uut_serial: Optional[str] = None,
+        uut_id: Optional[str] = None,
+        name_prefix: Optional[str] = None,
+        station_id: Optional[int] = None,
+        procedure_id: Optional[int] = None,
+        created_after: Optional[datetime] = None,
+        created_before: Optional[datetime] = None,
+    ):
+        try:
+            self.status = ingest.parse_run_status(status) if status else None
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        self.uut_serial = uut_serial
+        self.uut_id = uut_id
+        self.name_prefix = name_prefix
+        self.station_id = station_id
+        self.procedure_id = procedure_id
+        self.created_after = created_after
+        self.created_before = created_before
+
+    def apply(self, query):
+        TestRun = test_run.TestRun
+        if self.status is not None:
+            query = query.filter(TestRun.status == self.status)
+        if self.uut_serial is not None:
+            query = query.filter(TestRun.uut_serial == self.uut_serial)
+        if self.uut_id is not None:
+            query = query.filter(TestRun.uut_id == self.uut_id)
+        if self.name_prefix:
+            # A half-open range rather than LIKE so the name index is usable
+            # (SQLite's LIKE is case-insensitive and skips ordinary indexes)
+            query = query.filter(TestRun.name >= self.name_prefix)
+            upper = _prefix_upper_bound(self.name_prefix)
+            if upper is not None:
+                query = query.filter(TestRun.name < upper)
+        if self.station_id is not None:
+            query = query.filter(TestRun.station_id == self.station_id)
+        if self.procedure_id is not None:
+            query = query.filter(TestRun.procedure_id == self.procedure_id)
+        if self.created_after is not None:
+            query = query.filter(TestRun.created_at >= self.created_after)
+        if self.created_before is not None:
+            query = query.filter(TestRun.created_at < self.created_before)
+        return query
@@ -0,0 +1,139 @@
+"""
+Idempotency keys for write endpoints.
+
+A client that may retry a write (after a timeout, from a spool, in a batch
+resend) sends an ``Idempotency-Key`` header with a value unique to that
+write. The first request with a key writes as usual and stores its response
+in the same transaction; any later request with the same key gets the stored
+response back, marked with ``Idempotent-Replayed: true``, and writes
+nothing. Reusing a key for a different request is a 422.
+
+Requests with the same key are serialized within the process, so a retry
+that arrives while the original is still being written waits for it and
+is then replayed. Across worker processes the key column is what keeps a
+second write out: a request whose key another worker stored first while it
+was writing is rolled back and answered with 409, and retrying it gets the
+stored response. Keys are kept for NOTTOFU_IDEMPOTENCY_TTL_HOURS.
+"""
+import asyncio
+import hashlib
+import os
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+from fastapi import Header, HTTPException, Request, Response
+from sqlalchemy import delete
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .database import AsyncSessionLocal, is_sqlite
+from .models import idempotency_key
+
+TTL = timedelta(hours=float(os.environ.get("NOTTOFU_IDEMPOTENCY_TTL_HOURS", 24)))
+MAX_KEY_LENGTH = 255
+
+# Expired keys are deleted by the next write that records a key, at most
+# this often (seconds)
+EVICT_INTERVAL = 60.0
+
+_last_eviction = 0.0
+
+
+class _KeyLock:
+    """Lock serializing the requests with one key, dropped when none is using it."""
+
+    __slots__ = ("lock", "users")
+
+    def __init__(self):
+        self.lock = asyncio.Lock()
+        self.users = 0
+
+
+_locks: Dict[str, _KeyLock] = {}
+
+
+class IdempotentRequest:
+    """
+    Dependency giving a write endpoint its request's idempotency key. Use it
+    as an async context manager around the write; it yields the stored
+    response to return if the request is a replay::
+
+        async with idempotent as replay:
+            if replay is not None:
+                return replay
+            ...  # in the write job: await idempotent.record(session, body)
+    """
+
+    def __init__(self, request: Request, idempotency_key: Optional[str] = Header(None)):
+        self.request = request
+        self.key = idempotency_key
+        self._lock: Optional[_KeyLock] = None
+        self._fingerprint: Optional[str] = None
+        if self.key is not None and not 0 < len(self.key) <= MAX_KEY_LENGTH:
+            raise HTTPException(status_code=400, detail=f"Idempotency-Key must be 1 to {MAX_KEY_LENGTH} characters")
+
+    async def __aenter__(self) -> Optional[Response]:
+        if self.key is None:
+            return None
+        endpoint = self.request.scope["endpoint"].__name__
+        path_params = sorted(self.request.path_params.items())
+        self._fingerprint = hashlib.sha256(
+            f"{endpoint}\n{path_params}\n".encode() + await self.request.body()
+        ).hexdigest()
+
+        self._lock = _locks.setdefault(self.key, _KeyLock())
+        self._lock.users += 1
+        try:
+            await self._lock.lock.acquire()
+        except BaseException:
+            self._lock.users -= 1
+            if not self._lock.users:
+                del _locks[self.key]
+            self._lock = None
+            raise
+        try:
+            async with AsyncSessionLocal() as db:
+                stored = await db.get(idempotency_key.IdempotencyKey, self.key)
+            if stored is None or stored.created_at < datetime.utcnow() - TTL:
+                return None
+            if stored.fingerprint != self._fingerprint:
+                raise HTTPException(status_code=422, detail="Idempotency-Key was already used for a different request")
+            return Response(content=stored.response, status_code=stored.status_code, media_type="application/json",
+                            headers={"Idempotent-Replayed": "true"})
+        except BaseException:
+            self._release()
+            raise
+
+    async def __aexit__(self, *exc_info):
+        self._release()
+
+    def _release(self):
+        if self._lock is None:
+            return
+        self._lock.lock.release()
+        self._lock.users -= 1
+        if not self._lock.users:
+            del _locks[self.key]
+        self._lock = None
+
+    async def record(self, session: AsyncSession, body: bytes, status_code: int = 200):
+        """Store ``body`` as the response to this request, as part of the write in ``session``."""
+        global _last_eviction
+        if self.key is None:
+            return
+        now = datetime.utcnow()
+        model = idempotency_key.IdempotencyKey
+        if time.monotonic() - _last_eviction > EVICT_INTERVAL:
+            _last_eviction = time.monotonic()
+            await session.execute(delete(model).where(model.created_at < now - TTL))
+        # An expired row with this key may not have been evicted yet. A live
+        # one was stored by another worker since __aenter__ looked.
+        await session.execute(delete(model).where(model.key == self.key, model.created_at < now - TTL))
+        stmt = (sqlite.insert if is_sqlite else postgresql.insert)(model.__table__).on_conflict_do_nothing(
+            index_elements=["key"])
+        result = await session.execute(stmt, {"key": self.key, "fingerprint": self._fingerprint,
+                                              "status_code": status_code, "response": body, "created_at": now})
+        if result.rowcount == 0:
+            # Raised inside the write job, so the write is rolled back
+            raise HTTPException(status_code=409, detail="A request with this Idempotency-Key was completed "
+                                                        "concurrently; retry to get its response")
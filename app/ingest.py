@@ -0,0 +1,363 @@
+import base64
+import json
+from datetime import datetime
+from typing import AsyncIterator, List, Optional, Tuple
+from pydantic import ValidationError
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .models import test_run, test_phase, attachment, measurement
+from .schemas import test_schemas
+from . import live, registry, rollups, specs
+
+
+def parse_phase_status(status_str: str) -> test_phase.PhaseStatus:
+    """Map a client supplied status string (any case) onto PhaseStatus."""
+    try:
+        return test_phase.PhaseStatus[status_str.upper()]
+    except KeyError:
+        raise ValueError(f"Invalid status value: {status_str}")
+
+
+def parse_run_status(status_str: str) -> test_run.TestStatus:
+    """Map a client supplied status string (any case) onto TestStatus."""
+    try:
+        return test_run.TestStatus[status_str.upper()]
+    except KeyError:
+        raise ValueError(f"Invalid status value: {status_str}")
+
+
+def _attachment_row(data: dict) -> dict:
+    file_data = base64.b64decode(data["data"]) if data.get("data") else None
+    file_size = data.get("file_size")
+    if file_size is None and file_data is not None:
+        file_size = len(file_data)
+    return {
+        "filename": data["filename"],
+        "content_type": data.get("content_type"),
+        "description": data.get("description"),
+        "file_path": data.get("file_path"),
+        "file_data": file_data,
+        "file_size": file_size,
+    }
+
+
+def _as_float(value) -> Optional[float]:
+    if value is None or isinstance(value, bool):
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _measurement_passed(status, value: Optional[float], low: Optional[float], high: Optional[float]) -> Optional[bool]:
+    if isinstance(status, str):
+        status = status.upper()
+        if status in ("PASS", "PASSED"):
+            return True
+        if status in ("FAIL", "FAILED"):
+            return False
+    if value is None or (low is None and high is None):
+        return None
+    return (low is None or value >= low) and (high is None or value <= high)
+
+
+def flatten_measurements(measurements: Optional[dict], phase_id: int, test_run_id: int, created_at: datetime) -> List[dict]:
+    """
+    Flatten a phase's ``measurements`` JSON into rows for the measurements table.
+
+    Entries use the shape of ``TestPhase.add_measurement`` in complex_test.py:
+    ``{name: {"value", "unit", "expected", "limits": {"min", "max"}, "status"}}``.
+    A bare value is accepted too. Numeric values land in ``value`` and anything
+    else in ``text_value``; ``passed`` comes from the status, or from the
+    limits when there is no status.
+    """
+    if not isinstance(measurements, dict):
+        return []
+    rows = []
+    for name, data in measurements.items():
+        if not isinstance(data, dict):
+            data = {"value": data}
+        raw = data.get("value")
+        value = _as_float(raw)
+        limits = data.get("limits") if isinstance(data.get("limits"), dict) else {}
+        low = _as_float(limits.get("min"))
+        high = _as_float(limits.get("max"))
+        rows.append({
+            "name": name,
+            "value": value,
+            "text_value": str(raw) if value is None and raw is not None else None,
+            "unit": data.get("unit"),
+            "low_limit": low,
+            "high_limit": high,
+            "passed": _measurement_passed(data.get("status"), value, low, high),
+            "phase_id": phase_id,
+            "test_run_id": test_run_id,
+            "created_at": created_at,
+            "updated_at": created_at,
+        })
+    return rows
+
+
+async def bulk_insert_runs(db: AsyncSession, runs: List[dict]) -> List[int]:
+    """
+    Insert many test runs and their phases using executemany INSERTs.
+
+    Each entry in ``runs`` is a TestRunBulkCreate-shaped dict with a ``phases``
+    list. Imported reports may also carry ``status``, ``created_at``,
+    ``results`` and ``attachments`` (on the run or on a phase). Phase
+    measurements are checked against the specs of the run's procedure and
+    also written to the measurements table, and the runs
+    and phases are counted into the rollups. Nothing is
+    committed here, so the caller controls the transaction; the returned IDs
+    are in the same order as ``runs``.
+    """
+    if not runs:
+        return []
+
+    # Linked first, as specs belong to the procedure; then one pass over
+    # the phases of all runs of a procedure
+    await registry.link_runs(db, runs)
+    by_procedure = {}
+    for run in runs:
+        by_procedure.setdefault(run["procedure_id"], []).extend(run.get("phases") or [])
+    for procedure_id, phases in by_procedure.items():
+        await specs.apply(db, procedure_id, phases)
+
+    now = datetime.utcnow()
+    run_rows = []
+    for run in runs:
+        phases = run.get("phases") or []
+        if run.get("status"):
+            status = parse_run_status(run["status"])
+        elif any(parse_phase_status(p.get("status") or "PENDING") == test_phase.PhaseStatus.FAILED
+                 for p in phases):
+            # A failed phase fails the run, same as create_test_phase does
+            status = test_run.TestStatus.FAILED
+        else:
+            status = test_run.TestStatus.PENDING
+        run_rows.append({
+            "name": run["name"],
+            "uut_id": run.get("uut_id"),
+            "uut_serial": run.get("uut_serial"),
+            "meta_data": run.get("meta_data"),
+            "results": run.get("results"),
+            "status": status,
+            "station_id": run["station_id"],
+            "procedure_id": run["procedure_id"],
+            "created_at": run.get("created_at") or now,
+            "updated_at": now,
+        })
+
+    run_ids = (await db.scalars(
+        insert(test_run.TestRun).returning(test_run.TestRun.id, sort_by_parameter_order=True),
+        run_rows,
+    )).all()
+
+    phase_rows = []
+    phase_attachments = []
+    attachment_rows = []
+    for run_id, run in zip(run_ids, runs):
+        for data in run.get("attachments") or []:
+            attachment_rows.append({**_attachment_row(data), "test_run_id": run_id, "created_at": now, "updated_at": now})
+        for phase in run.get("phases") or []:
+            phase_rows.append({
+                "test_run_id": run_id,
+                "name": phase["name"],
+                "description": phase.get("description"),
+                "status": parse_phase_status(phase.get("status") or "PENDING"),
+                "measurements": phase.get("measurements"),
+                "duration": phase.get("duration"),
+                "created_at": phase.get("created_at") or now,
+                "updated_at": now,
+            })
+            phase_attachments.append(phase.get("attachments") or [])
+
+    measurement_rows = []
+    if phase_rows and (any(phase_attachments) or any(row["measurements"] for row in phase_rows)):
+        # Phase IDs are only needed to link attachments and measurements to their phase
+        phase_ids = (await db.scalars(
+            insert(test_phase.TestPhase).returning(test_phase.TestPhase.id, sort_by_parameter_order=True),
+            phase_rows,
+        )).all()
+        for phase_id, row, attachments in zip(phase_ids, phase_rows, phase_attachments):
+            measurement_rows.extend(flatten_measurements(row["measurements"], phase_id, row["test_run_id"], row["created_at"]))
+            for data in attachments:
+                attachment_rows.append({
+                    **_attachment_row(data),
+                    "test_run_id": row["test_run_id"],
+                    "phase_id": phase_id,
+                    "created_at": now,
+                    "updated_at": now,
+                })
+    elif phase_rows:
+        await db.execute(insert(test_phase.TestPhase), phase_rows)
+
+    if attachment_rows:
+        for row in attachment_rows:
+            row.setdefault("phase_id", None)
+        await db.execute(insert(attachment.Attachment), attachment_rows)
+    if measurement_rows:
+        await db.execute(insert(measurement.Measurement), measurement_rows)
+
+    rollups.record_runs(db, [(row["created_at"], row["name"], row["status"].value) for row in run_rows])
+    run_names = dict(zip(run_ids, (row["name"] for row in run_rows)))
+    rollups.record_phases(db, [
+        (row["created_at"], run_names[row["test_run_id"]], row["name"], row["status"].value, row["duration"])
+        for row in phase_rows
+    ])
+    live.record_runs(db, [
+        (row["created_at"], row["updated_at"], row["station_id"], row["procedure_id"], row["status"].value)
+        for row in run_rows
+    ])
+    run_links = {run_id: (row["created_at"], row["station_id"], row["procedure_id"])
+                 for run_id, row in zip(run_ids, run_rows)}
+    live.record_phases(db, [
+        (row["created_at"], *run_links[row["test_run_id"]], row["status"].value, row["duration"]) for row in phase_rows
+    ])
+
+    return list(run_ids)
+
+
+async def bulk_insert_phases(db: AsyncSession, run: test_run.TestRun, phases: List[dict]) -> List[int]:
+    """
+    Insert many phases of one existing run, with their measurements.
+
+    Entries are TestPhaseBulkCreate-shaped dicts; their measurements are
+    checked against the run's specs, which may set their status. As with
+    create_test_phase, a failed phase fails the run and the rollups are
+    updated. Nothing is committed here; the returned IDs are in the same
+    order as ``phases``.
+    """
+    if not phases:
+        return []
+
+    await specs.apply(db, run.procedure_id, phases)
+    now = datetime.utcnow()
+    phase_rows = [{
+        "test_run_id": run.id,
+        "name": phase["name"],
+        "description": phase.get("description"),
+        "status": parse_phase_status(phase.get("status") or "PENDING"),
+        "measurements": phase.get("measurements"),
+        "duration": phase.get("duration"),
+        "created_at": now,
+        "updated_at": now,
+    } for phase in phases]
+    phase_ids = (await db.scalars(
+        insert(test_phase.TestPhase).returning(test_phase.TestPhase.id, sort_by_parameter_order=True),
+        phase_rows,
+    )).all()
+
+    measurement_rows = []
+    for phase_id, row in zip(phase_ids, phase_rows):
+        measurement_rows.extend(flatten_measurements(row["measurements"], phase_id, run.id, now))
+    if measurement_rows:
+        await db.execute(insert(measurement.Measurement), measurement_rows)
+
+    previous_status = run.status
+    if any(row["status"] == test_phase.PhaseStatus.FAILED for row in phase_rows):
+        run.status = test_run.TestStatus.FAILED
+    rollups.record_phases(db, [
+        (row["created_at"], run.name, row["name"], row["status"].value, row["duration"]) for row in phase_rows
+    ])
+    rollups.move_run(db, run, previous_status)
+    live.record_phases(db, [(row["created_at"], run.created_at, run.station_id, run.procedure_id, row["status"].value,
+                             row["duration"]) for row in phase_rows])
+    live.move_run(db, run, previous_status)
+    return list(phase_ids)
+
+
+def report_to_run(report: dict) -> dict:
+    """
+    Convert a JSON test report into the dict shape bulk_insert_runs expects.
+
+    Accepts the reports written by the example clients (``generate_report`` in
+    complex_test.py and hw_motor_test.py) as well as plain TestRunImport
+    objects. Either is validated against TestRunImport, and a ValueError
+    says what is wrong with it.
+    """
+    if not isinstance(report, dict):
+        raise ValueError("Expected a JSON object")
+    if "test_run" in report:
+        report = _convert_report(report)
+    try:
+        run = test_schemas.TestRunImport(**report).dict()
+    except ValidationError as e:
+        raise ValueError("; ".join(f"{'.'.join(map(str, error['loc']))}: {error['msg']}" for error in e.errors()))
+    if run["status"]:
+        parse_run_status(run["status"])
+    for phase in run["phases"]:
+        parse_phase_status(phase["status"])
+    return run
+
+
+def _convert_report(report: dict) -> dict:
+    run = report["test_run"]
+    if not isinstance(run, dict):
+        raise ValueError("test_run: Expected a JSON object")
+    serial = run.get("uut_serial") or run.get("serial_number")
+    results = {key: run[key] for key in ("start_time", "end_time", "duration") if run.get(key) is not None}
+
+    phases = []
+    for phase in report.get("phases") or []:
+        if not isinstance(phase, dict):
+            raise ValueError("phases: Expected JSON objects")
+        phases.append({
+            "name": phase.get("name"),
+            "description": phase.get("description"),
+            "status": phase.get("status") or "PENDING",
+            "measurements": phase.get("measurements"),
+            "duration": phase.get("duration"),
+            "created_at": phase.get("start_time") or None,
+            "attachments": phase.get("attachments"),
+        })
+
+    return {
+        "name": run.get("name") or f"Imported Report - {serial or 'unknown'}",
+        "uut_id": run.get("uut_id") or run.get("device_id"),
+        "uut_serial": serial,
+        "meta_data": run.get("meta_data") or run.get("metadata"),
+        "status": run.get("status"),
+        "created_at": run.get("start_time") or None,
+        "results": results or None,
+        "phases": phases,
+        "attachments": report.get("attachments"),
+    }
+
+
+async def iter_ndjson(chunks: AsyncIterator[bytes]) -> AsyncIterator[Tuple[int, dict]]:
+    """
+    Yield the line number and decoded JSON object of each line of an NDJSON
+    byte stream.
+
+    Only the current partial line is buffered, so memory stays bounded by the
+    longest line rather than the size of the body. Blank lines are skipped and
+    a ValueError names the offending line number.
+    """
+    buffer = b""
+    line_no = 0
+
+    def decode(line: bytes) -> Optional[dict]:
+        line = line.strip()
+        if not line:
+            return None
+        try:
+            return json.loads(line)
+        except ValueError as e:
+            raise ValueError(f"Invalid JSON on line {line_no}: {e}")
+
+    async for chunk in chunks:
+        lines = (buffer + chunk).split(b"\n")
+        buffer = lines.pop()
+        for line in lines:
+            line_no += 1
+            item = decode(line)
+            if item is not None:
+                yield line_no, item
+
+    line_no += 1
+    item = decode(buffer)
+    if item is not None:
+        yield line_no, item
@@ -0,0 +1,349 @@
+"""
+Live throughput and health of stations and procedures.
+
+The write paths report runs started, runs finished and phases here, and
+they are counted in a sliding window of NOTTOFU_LIVE_WINDOW_MINUTES
+(default 15) for every station, every procedure and every station and
+procedure pair. A window is a ring of SLOT_SECONDS slots plus running
+totals: recording an event adds to the current slot and the totals, and a
+slot leaving the window is subtracted from them, so both recording and
+reading cost O(1). Phase durations are counted into a fixed log-scale
+histogram, which percentiles are read from.
+
+As with the rollups, the write paths only note events on their session, and
+the events are counted when the transaction commits, each in the slot of
+its own timestamp, so backfilled reports from before the window are left
+out. On startup the windows are refilled from the runs and phases stored
+during the last window.
+"""
+import math
+import os
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from sqlalchemy import event, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from .models import test_phase, test_run
+
+SLOT_SECONDS = 10
+WINDOW_SECONDS = max(int(float(os.environ.get("NOTTOFU_LIVE_WINDOW_MINUTES", 15)) * 60), SLOT_SECONDS)
+SLOTS = WINDOW_SECONDS // SLOT_SECONDS
+
+# Phases of runs started up to this long before the window are looked at
+# when restoring; phases of runs older than that are not restored
+RESTORE_RUN_AGE = timedelta(hours=1)
+RESTORE_CHUNK = 10000
+
+# Duration histogram: BINS_PER_DECADE log-spaced bins per decade from
+# MIN_DURATION seconds, plus a bin below and a bin above
+BINS_PER_DECADE = 20
+MIN_DURATION = 1e-3
+DECADES = 8
+BINS = BINS_PER_DECADE * DECADES + 2
+PERCENTILES = (50, 90, 99)
+
+# Counters kept per slot and window
+RUNS_STARTED, RUNS_FINISHED, RUNS_FAILED, PHASES, PHASES_FAILED = range(5)
+
+FINISHED = {test_run.TestStatus.PASSED.value, test_run.TestStatus.FAILED.value, test_run.TestStatus.ERROR.value}
+FAILED = {test_run.TestStatus.FAILED.value, test_run.TestStatus.ERROR.value}
+
+_EPOCH = datetime(1970, 1, 1)
+
+
+def _bin(duration: float) -> int:
+    if duration < MIN_DURATION:
+        return 0
+    return min(int(math.log10(duration / MIN_DURATION) * BINS_PER_DECADE) + 1, BINS - 1)
+
+
+def _bin_value(i: int) -> float:
+    """Geometric middle of bin ``i`` (the edge for the under- and overflow bins)."""
+    if i == 0:
+        return MIN_DURATION
+    if i == BINS - 1:
+        return MIN_DURATION * 10 ** DECADES
+    return MIN_DURATION * 10 ** ((i - 0.5) / BINS_PER_DECADE)
+
+
+class Window:
+    """Counts and a phase-duration histogram over the last WINDOW_SECONDS."""
+
+    __slots__ = ("head", "counts", "durations", "slot_counts", "slot_durations", "last_activity")
+
+    def __init__(self):
+        self.head = 0  # Newest slot (seconds since the epoch // SLOT_SECONDS)
+        self.counts = [0] * 5
+        self.durations = [0] * BINS
+        # Slot n lives at position n % SLOTS; positions are filled on first use
+        self.slot_counts: List[Optional[List[int]]] = [None] * SLOTS
+        self.slot_durations: List[Optional[Dict[int, int]]] = [None] * SLOTS
+        self.last_activity: Optional[int] = None  # Newest slot with an event
+
+    def advance(self, now: float):
+        """Drop the slots that are no longer within the window ending at ``now``."""
+        slot = int(now // SLOT_SECONDS)
+        if slot <= self.head:
+            return
+        # After a long idle spell every position expires once, so this is
+        # bounded by SLOTS
+        for expired in range(max(self.head + 1, slot - SLOTS + 1), slot + 1):
+            position = expired % SLOTS
+            counts = self.slot_counts[position]
+            if counts is not None:
+                for i, n in enumerate(counts):
+                    self.counts[i] -= n
+                self.slot_counts[position] = None
+            durations = self.slot_durations[position]
+            if durations is not None:
+                for i, n in durations.items():
+                    self.durations[i] -= n
+                self.slot_durations[position] = None
+        self.head = slot
+
+    def add(self, slot: int, counter: int, duration_bin: Optional[int] = None, n: int = 1):
+        """Count ``n`` events in ``slot``, which must not be newer than the last advance()."""
+        if slot <= self.head - SLOTS:
+            return
+        position = min(slot, self.head) % SLOTS
+        counts = self.slot_counts[position]
+        if counts is None:
+            counts = self.slot_counts[position] = [0] * 5
+        counts[counter] += n
+        self.counts[counter] += n
+        if duration_bin is not None:
+            durations = self.slot_durations[position]
+            if durations is None:
+                durations = self.slot_durations[position] = {}
+            durations[duration_bin] = durations.get(duration_bin, 0) + n
+            self.durations[duration_bin] += n
+        if self.last_activity is None or slot > self.last_activity:
+            self.last_activity = slot
+
+    def percentiles(self) -> Dict[str, float]:
+        total = sum(self.durations)
+        if not total:
+            return {}
+        result = {}
+        targets = iter(PERCENTILES)
+        target = next(targets)
+        seen = 0
+        for i, n in enumerate(self.durations):
+            seen += n
+            while target is not None and seen * 100 >= target * total:
+                result[f"p{target}"] = _bin_value(i)
+                target = next(targets, None)
+            if target is None:
+                break
+        return result
+
+    def summary(self) -> dict:
+        counts = self.counts
+        return {
+            "window_seconds": WINDOW_SECONDS,
+            "runs_started": counts[RUNS_STARTED],
+            "runs_finished": counts[RUNS_FINISHED],
+            "runs_failed": counts[RUNS_FAILED],
+            "runs_per_minute": counts[RUNS_STARTED] * 60 / WINDOW_SECONDS,
+            "failure_rate": counts[RUNS_FAILED] / counts[RUNS_FINISHED] if counts[RUNS_FINISHED] else None,
+            "phases": counts[PHASES],
+            "phases_failed": counts[PHASES_FAILED],
+            "phase_failure_rate": counts[PHASES_FAILED] / counts[PHASES] if counts[PHASES] else None,
+            "phase_duration_percentiles": self.percentiles(),
+            "last_activity": (datetime.utcfromtimestamp((self.last_activity + 1) * SLOT_SECONDS)
+                              if self.last_activity is not None else None),
+        }
+
+
+# (station id, procedure id, counter, duration bin, slot), and how many of them
+EventCounts = Iterable[Tuple[Tuple[Optional[int], Optional[int], int, Optional[int], int], int]]
+
+
+class LiveMetrics:
+    """Windows by station, by procedure and by station and procedure. Only used from the event loop thread."""
+
+    def __init__(self):
+        self._windows: Dict[tuple, Window] = {}
+        self._station_procedures: Dict[int, Set[int]] = {}
+
+    def _window(self, key: tuple, now: float) -> Window:
+        window = self._windows.get(key)
+        if window is None:
+            window = self._windows[key] = Window()
+        window.advance(now)
+        return window
+
+    def add(self, events: EventCounts, now: Optional[float] = None):
+        now = time.time() if now is None else now
+        for (station_id, procedure_id, counter, duration_bin, slot), n in events:
+            if station_id is not None:
+                self._window(("station", station_id), now).add(slot, counter, duration_bin, n)
+            if procedure_id is not None:
+                self._window(("procedure", procedure_id), now).add(slot, counter, duration_bin, n)
+            if station_id is not None and procedure_id is not None:
+                self._window(("station", station_id, procedure_id), now).add(slot, counter, duration_bin, n)
+                self._station_procedures.setdefault(station_id, set()).add(procedure_id)
+
+    def _summary(self, key: tuple) -> dict:
+        window = self._windows.get(key)
+        if window is None:
+            window = Window()
+        window.advance(time.time())
+        return window.summary()
+
+    def station(self, station_id: int) -> dict:
+        """Summary of a station, with one per procedure run on it during the window."""
+        summary = self._summary(("station", station_id))
+        summary["procedures"] = []
+        for procedure_id in sorted(self._station_procedures.get(station_id, ())):
+            entry = self._summary(("station", station_id, procedure_id))
+            if entry["runs_started"] or entry["runs_finished"] or entry["phases"]:
+                summary["procedures"].append({"procedure_id": procedure_id, **entry})
+        return summary
+
+    def procedure(self, procedure_id: int) -> dict:
+        return self._summary(("procedure", procedure_id))
+
+    def clear(self):
+        self._windows.clear()
+        self._station_procedures.clear()
+
+
+live_metrics = LiveMetrics()
+
+
+def _timestamp(value: datetime) -> float:
+    """Seconds since the epoch of a naive UTC datetime as stored in the database."""
+    return (value - _EPOCH).total_seconds()
+
+
+def _restorable_since() -> datetime:
+    """Runs created before this are left out by restore(), so they aren't counted here either."""
+    return datetime.utcfromtimestamp(time.time() - WINDOW_SECONDS) - RESTORE_RUN_AGE
+
+
+def _pending(db: AsyncSession) -> list:
+    return db.sync_session.info.setdefault("pending_live", [])
+
+
+def record_runs(db: AsyncSession, runs: Iterable[Tuple[datetime, datetime, Optional[int], Optional[int], str]]):
+    """
+    Count new runs, given as (created_at, updated_at, station id, procedure
+    id, status), when ``db`` commits. A run counts as started at created_at
+    and, if its status is final, as finished at updated_at, the times
+    restore() goes by; backfilled runs from before the window aren't counted.
+    """
+    pending = _pending(db)
+    since = _restorable_since()
+    for created_at, updated_at, station_id, procedure_id, status in runs:
+        pending.append((station_id, procedure_id, RUNS_STARTED, None, _timestamp(created_at)))
+        if status in FINISHED and created_at >= since:
+            finished_at = _timestamp(updated_at)
+            pending.append((station_id, procedure_id, RUNS_FINISHED, None, finished_at))
+            if status in FAILED:
+                pending.append((station_id, procedure_id, RUNS_FAILED, None, finished_at))
+
+
+def record_phases(db: AsyncSession,
+                  phases: Iterable[Tuple[datetime, datetime, Optional[int], Optional[int], str, Optional[float]]]):
+    """
+    Count new phases, given as (created_at, run created_at, station id,
+    procedure id, status, duration), at their created_at when ``db`` commits.
+    """
+    pending = _pending(db)
+    since = _restorable_since()
+    for created_at, run_created_at, station_id, procedure_id, status, duration in phases:
+        if run_created_at < since:
+            continue
+        at = _timestamp(created_at)
+        pending.append((station_id, procedure_id, PHASES, None if duration is None else _bin(duration), at))
+        if status in FAILED:
+            pending.append((station_id, procedure_id, PHASES_FAILED, None, at))
+
+
+def move_run(db: AsyncSession, run: test_run.TestRun, previous: test_run.TestStatus):
+    """Count a run as finished now if its status went from pending or running to a final one."""
+    if previous.value in FINISHED or run.status.value not in FINISHED or run.created_at < _restorable_since():
+        return
+    pending = _pending(db)
+    now = time.time()
+    pending.append((run.station_id, run.procedure_id, RUNS_FINISHED, None, now))
+    if run.status.value in FAILED:
+        pending.append((run.station_id, run.procedure_id, RUNS_FAILED, None, now))
+
+
+@event.listens_for(Session, "after_commit")
+def _count_pending(session: Session):
+    pending = session.info.pop("pending_live", None)
+    if pending:
+        # Windows drop events older than themselves; events from the future
+        # (clock skew in imported reports) count in the current slot
+        live_metrics.add(((station_id, procedure_id, counter, duration_bin, int(at // SLOT_SECONDS)), 1)
+                         for station_id, procedure_id, counter, duration_bin, at in pending)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_pending(session: Session):
+    session.info.pop("pending_live", None)
+
+
+async def restore(db: AsyncSession, metrics: LiveMetrics = live_metrics) -> int:
+    """
+    Refill ``metrics`` with the runs and phases stored during the last
+    window, using the runs' created_at and updated_at and the phases'
+    created_at as event times. Returns how many events were counted.
+    """
+    TestRun, TestPhase = test_run.TestRun, test_phase.TestPhase
+    now = time.time()
+    start = datetime.utcfromtimestamp(now - WINDOW_SECONDS)
+    runs_since = start - RESTORE_RUN_AGE
+    # Events are summed by slot first, so each window gets one add per
+    # slot and kind of event rather than one per row
+    events: Counter = Counter()
+
+    async def count(query, to_events):
+        result = await db.stream(query.execution_options(yield_per=RESTORE_CHUNK))
+        async for rows in result.partitions():
+            for row in rows:
+                events.update(to_events(*row))
+
+    def slot(value: datetime) -> int:
+        return int(_timestamp(value) // SLOT_SECONDS)
+
+    await count(
+        select(TestRun.station_id, TestRun.procedure_id, TestRun.created_at).where(TestRun.created_at >= start),
+        lambda station_id, procedure_id, created_at: [(station_id, procedure_id, RUNS_STARTED, None, slot(created_at))],
+    )
+
+    def finished(station_id, procedure_id, status, updated_at):
+        at = slot(updated_at)
+        if status.value in FAILED:
+            return [(station_id, procedure_id, RUNS_FINISHED, None, at), (station_id, procedure_id, RUNS_FAILED, None, at)]
+        return [(station_id, procedure_id, RUNS_FINISHED, None, at)]
+
+    await count(
+        select(TestRun.station_id, TestRun.procedure_id, TestRun.status, TestRun.updated_at)
+        .where(TestRun.created_at >= runs_since, TestRun.updated_at >= start,
+               TestRun.status.in_([test_run.TestStatus(status) for status in FINISHED])),
+        finished,
+    )
+
+    def phase(station_id, procedure_id, status, duration, created_at):
+        at = slot(created_at)
+        counted = [(station_id, procedure_id, PHASES, None if duration is None else _bin(duration), at)]
+        if status is not None and status.value in FAILED:
+            counted.append((station_id, procedure_id, PHASES_FAILED, None, at))
+        return counted
+
+    await count(
+        select(TestRun.station_id, TestRun.procedure_id, TestPhase.status, TestPhase.duration, TestPhase.created_at)
+        .join(TestRun, TestRun.id == TestPhase.test_run_id)
+        .where(TestRun.created_at >= runs_since, TestPhase.created_at >= start),
+        phase,
+    )
+    metrics.clear()
+    metrics.add(events.items(), now)
+    return sum(events.values())
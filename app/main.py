@@ -1,15 +1,43 @@
-from fastapi import FastAPI, HTTPException, Depends
+from fastapi import FastAPI, HTTPException, Depends, File, Form, Query, Request, Response, UploadFile
 from fastapi.middleware.cors import CORSMiddleware
-from sqlalchemy.orm import Session
-from typing import List
+from fastapi.responses import FileResponse, StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from sqlalchemy import delete, insert, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+from pydantic import TypeAdapter
+from typing import List, Literal, Optional
+from datetime import datetime
+from urllib.parse import quote
+from contextlib import asynccontextmanager
 import uvicorn
 import os
+import time
 
-from .database import get_db
-from .models import test_run, test_phase
+from .database import AsyncSessionLocal, async_engine, engine, get_db
+from .models import archived_run, attachment, test_run, test_phase, measurement, measurement_spec, procedure, rollup, station
 from .schemas import test_schemas
+from . import analytics, archive, compression, export, ingest, live, metrics, pagination, registry, rollups, specs
+from .idempotency import IdempotentRequest
+from .blobs import blob_store, parse_range
+from .cache import response_cache, etag_matches
+from .events import broker, stream_events
+from .filters import RunFilters
+from .metrics import MetricsMiddleware, api_metrics
+from .writer import writer
 
-app = FastAPI(title="NotTofu Test Management Platform")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Before any request, so JSON columns never query for them
+    await run_in_threadpool(compression.dictionaries.load)
+    async with AsyncSessionLocal() as db:
+        await live.restore(db)
+    yield
+    # Let queued writes commit before the process exits
+    await writer.close()
+
+app = FastAPI(title="NotTofu Test Management Platform", lifespan=lifespan)
 
 # CORS middleware
 app.add_middleware(
@@ -18,8 +46,63 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "X-Next-Cursor", "X-Prev-Cursor", "Content-Disposition", "Content-Range", "Accept-Ranges",
+                    "Idempotent-Replayed"],
 )
 
+# Outermost, so request latency includes the other middleware
+app.add_middleware(MetricsMiddleware)
+api_metrics.instrument(async_engine.sync_engine)
+api_metrics.instrument(engine)
+
+RUN_LIST = TypeAdapter(List[test_schemas.TestRun])
+PHASE_LIST = TypeAdapter(List[test_schemas.TestPhase])
+
+def _cursor_headers(next_cursor: Optional[str], prev_cursor: Optional[str]) -> dict:
+    headers = {}
+    if next_cursor:
+        headers["X-Next-Cursor"] = next_cursor
+    if prev_cursor:
+        headers["X-Prev-Cursor"] = prev_cursor
+    return headers
+
+def _json_body(schema, value) -> bytes:
+    """``value`` (a model instance or dict) serialized as ``schema``, as the response to a write."""
+    return schema.model_validate(value).model_dump_json().encode()
+
+def _cache_key(request: Request, endpoint: str, *args):
+    # Keyed on the endpoint rather than the path so /runs/ and /test-runs/ share entries
+    return (endpoint, *args, tuple(sorted(request.query_params.multi_items())))
+
+async def _cached_json(request: Request, key, build) -> Response:
+    """
+    Serve a JSON response from the response cache, building it on a miss.
+
+    ``build`` returns ``(body, tags, headers)``; concurrent misses of a key
+    share one build. Responses carry an ETag, and a matching If-None-Match
+    gets an empty 304 instead of the body.
+    """
+    entry = await response_cache.get_or_build(key, build)
+    headers = {"ETag": entry.etag, "Cache-Control": "no-cache", **entry.headers}
+    if etag_matches(request.headers.get("if-none-match"), entry.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=entry.body, media_type="application/json", headers=headers)
+
+def _publish_run_created(run: test_run.TestRun):
+    broker.publish("run-created", {
+        "test_run_id": run.id,
+        "name": run.name,
+        "status": run.status.value,
+        "uut_id": run.uut_id,
+        "uut_serial": run.uut_serial,
+        "station": registry.station_name(run.meta_data),
+        "created_at": run.created_at.isoformat(),
+    })
+
+def _invalidate_run(test_run_id: int):
+    """Drop cached responses that include this run, status-filtered lists it may move between, and rollups."""
+    response_cache.invalidate(f"run:{test_run_id}", "runs:status", "rollups")
+
 @app.get("/")
 async def root():
     return {"message": "Welcome to NotTofu Test Management Platform"}
@@ -27,144 +110,807 @@ async def root():
 # Support both /test-runs/ (legacy) and /runs/ (new) endpoints
 @app.post("/runs/", response_model=test_schemas.TestRun)
 @app.post("/test-runs/", response_model=test_schemas.TestRun)
-async def create_test_run(test_run_data: test_schemas.TestRunCreate, db: Session = Depends(get_db)):
-    db_test_run = test_run.TestRun(**test_run_data.dict())
-    db.add(db_test_run)
-    db.commit()
-    db.refresh(db_test_run)
+async def create_test_run(test_run_data: test_schemas.TestRunCreate, idempotent: IdempotentRequest = Depends()):
+    async def write(session: AsyncSession):
+        run = test_run_data.dict()
+        await registry.link_runs(session, [run])
+        db_test_run = test_run.TestRun(**run)
+        session.add(db_test_run)
+        await session.flush()
+        rollups.record_runs(session, [(db_test_run.created_at, db_test_run.name, db_test_run.status.value)])
+        live.record_runs(session, [(db_test_run.created_at, db_test_run.updated_at, db_test_run.station_id,
+                                    db_test_run.procedure_id, db_test_run.status.value)])
+        await idempotent.record(session, _json_body(test_schemas.TestRun, db_test_run))
+        return db_test_run
+
+    async with idempotent as replay:
+        if replay is not None:
+            return replay
+        db_test_run = await writer.submit(write)
+    response_cache.invalidate("runs", "rollups")
+    _publish_run_created(db_test_run)
     return db_test_run
 
+@app.post("/runs/bulk", response_model=test_schemas.BulkCreateResponse)
+@app.post("/test-runs/bulk", response_model=test_schemas.BulkCreateResponse)
+async def create_test_runs_bulk(runs_data: List[test_schemas.TestRunBulkCreate], db: AsyncSession = Depends(get_db),
+                                idempotent: IdempotentRequest = Depends()):
+    """
+    Create many test runs, each with its nested phases, in a single transaction
+    """
+    runs = [run.dict() for run in runs_data]
+
+    async def write(session: AsyncSession):
+        run_ids = await ingest.bulk_insert_runs(session, runs)
+        await idempotent.record(session, _json_body(test_schemas.BulkCreateResponse, {"ids": run_ids}))
+        return run_ids
+
+    async with idempotent as replay:
+        if replay is not None:
+            return replay
+        try:
+            run_ids = await writer.submit(write)
+        except HTTPException:
+            raise
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Error creating test runs: {str(e)}")
+    response_cache.invalidate("runs", "measurements", "rollups")
+    if broker.subscriber_count:
+        for run in await db.scalars(select(test_run.TestRun).where(test_run.TestRun.id.in_(run_ids))):
+            _publish_run_created(run)
+    return {"ids": run_ids}
+
+@app.post("/runs/ingest", response_model=test_schemas.IngestResponse)
+@app.post("/test-runs/ingest", response_model=test_schemas.IngestResponse)
+async def ingest_reports(request: Request, chunk_size: int = Query(500, ge=1, le=10000)):
+    """
+    Import test reports from an NDJSON request body, one report per line.
+
+    The body is parsed as it arrives and committed every ``chunk_size`` reports,
+    so arbitrarily large backfills run in bounded memory. Chunks committed
+    before a bad line are kept; the error says how many runs were stored.
+    """
+    def insert(chunk):
+        return lambda session: ingest.bulk_insert_runs(session, chunk)
+
+    chunk = []
+    runs = 0
+    chunks = 0
+    try:
+        async for line_no, report in ingest.iter_ndjson(request.stream()):
+            try:
+                chunk.append(ingest.report_to_run(report))
+            except ValueError as e:
+                raise ValueError(f"Invalid report on line {line_no}: {e}") from e
+            if len(chunk) >= chunk_size:
+                runs += len(await writer.submit(insert(chunk)))
+                chunks += 1
+                chunk = []
+        if chunk:
+            runs += len(await writer.submit(insert(chunk)))
+            chunks += 1
+    except (ValueError, KeyError, TypeError) as e:
+        raise HTTPException(status_code=400, detail=f"Error ingesting reports after {runs} runs: {str(e)}")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error ingesting reports after {runs} runs: {str(e)}")
+    finally:
+        if runs:
+            response_cache.invalidate("runs", "measurements", "rollups")
+    return {"runs": runs, "chunks": chunks}
+
 @app.get("/runs/", response_model=List[test_schemas.TestRun])
 @app.get("/test-runs/", response_model=List[test_schemas.TestRun])
-async def list_test_runs(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    return db.query(test_run.TestRun).offset(skip).limit(limit).all()
-
-@app.get("/runs/{test_run_id}", response_model=test_schemas.TestRun)
-@app.get("/test-runs/{test_run_id}", response_model=test_schemas.TestRun)
-async def get_test_run(test_run_id: int, db: Session = Depends(get_db)):
-    db_test_run = db.query(test_run.TestRun).filter(test_run.TestRun.id == test_run_id).first()
-    if db_test_run is None:
+async def list_test_runs(request: Request, skip: int = 0, limit: int = Query(100, ge=1),
+                         cursor: Optional[str] = None, filters: RunFilters = Depends(),
+                         db: AsyncSession = Depends(get_db)):
+    """
+    List test runs ordered by (created_at, id), optionally filtered by status,
+    uut_serial, uut_id, name_prefix, station_id, procedure_id and a
+    created_after/created_before range.
+
+    Pages are fetched by keyset: follow the opaque ``X-Next-Cursor`` /
+    ``X-Prev-Cursor`` response headers via ``?cursor=``. ``skip`` is kept for
+    older clients and falls back to OFFSET paging.
+    """
+    async def build():
+        query = filters.apply(select(test_run.TestRun))
+        headers = {}
+        if skip:
+            query = query.order_by(test_run.TestRun.created_at, test_run.TestRun.id).offset(skip).limit(limit)
+            runs = (await db.scalars(query)).all()
+        else:
+            try:
+                runs, next_cursor, prev_cursor = await pagination.keyset_page(db, query, test_run.TestRun, limit, cursor)
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=str(e))
+            headers = _cursor_headers(next_cursor, prev_cursor)
+        tags = {"runs"} | {f"run:{run.id}" for run in runs}
+        if filters.status is not None:
+            tags.add("runs:status")
+        return RUN_LIST.dump_json(RUN_LIST.validate_python(runs, from_attributes=True)), tags, headers
+
+    return await _cached_json(request, _cache_key(request, "list_test_runs"), build)
+
+@app.get("/runs/stream")
+@app.get("/test-runs/stream")
+async def stream_run_events(run_id: Optional[int] = None, station: Optional[str] = None):
+    """
+    Server-Sent Events feed of run-created, phase-added and status-changed
+    events, optionally limited to one run or one station. Events are pushed
+    from the write endpoints, so idle listeners cost no database queries.
+    """
+    subscription = broker.subscribe(run_id=run_id, station=station)
+    return StreamingResponse(
+        stream_events(broker, subscription),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+RUN_INCLUDES = {"phases", "attachments"}
+
+async def _archived_run_detail(db: AsyncSession, test_run_id: int, phases: bool, attachments: bool) -> dict:
+    """Read a run that has been moved to the Parquet archive, or raise 404 if there is no such run."""
+    entry = await db.get(archived_run.ArchivedRun, test_run_id)
+    result = await run_in_threadpool(archive.read_run_detail, entry, phases, attachments) if entry else None
+    if result is None:
         raise HTTPException(status_code=404, detail="Test run not found")
-    return db_test_run
+    return result
+
+@app.get("/runs/{test_run_id}", response_model=test_schemas.TestRunDetail, response_model_exclude_unset=True)
+@app.get("/test-runs/{test_run_id}", response_model=test_schemas.TestRunDetail, response_model_exclude_unset=True)
+async def get_test_run(test_run_id: int, request: Request, include: Optional[str] = None, db: AsyncSession = Depends(get_db)):
+    """
+    Return a test run. ``?include=phases,attachments`` embeds the run's phases
+    and/or attachments, loaded with selectinload in one query per relationship
+    instead of one query per row.
+    """
+    includes = set(filter(None, (include or "").split(",")))
+    if includes - RUN_INCLUDES:
+        raise HTTPException(status_code=400, detail=f"Invalid include value: {','.join(sorted(includes - RUN_INCLUDES))}")
+
+    async def build():
+        query = select(test_run.TestRun).where(test_run.TestRun.id == test_run_id)
+        if "phases" in includes:
+            phases_loader = selectinload(test_run.TestRun.phases)
+            if "attachments" in includes:
+                phases_loader = phases_loader.selectinload(test_phase.TestPhase.attachments)
+            query = query.options(phases_loader)
+        if "attachments" in includes:
+            query = query.options(selectinload(test_run.TestRun.attachments))
+
+        db_test_run = (await db.scalars(query)).first()
+        if db_test_run is None:
+            result = await _archived_run_detail(db, test_run_id, "phases" in includes, "attachments" in includes)
+            body = test_schemas.TestRunDetail.model_validate(result).model_dump_json(exclude_unset=True)
+            return body.encode(), {f"run:{test_run_id}"}, {}
+
+        # Build the response by hand so unrequested relationships are never touched
+        result = test_schemas.TestRun.model_validate(db_test_run).model_dump()
+        if "phases" in includes:
+            result["phases"] = []
+            for phase in sorted(db_test_run.phases, key=lambda p: (p.created_at, p.id)):
+                phase_result = test_schemas.TestPhase.model_validate(phase).model_dump()
+                if "attachments" in includes:
+                    phase_result["attachments"] = [test_schemas.Attachment.model_validate(a) for a in phase.attachments]
+                result["phases"].append(phase_result)
+        if "attachments" in includes:
+            result["attachments"] = [test_schemas.Attachment.model_validate(a) for a in db_test_run.attachments]
+        body = test_schemas.TestRunDetail.model_validate(result).model_dump_json(exclude_unset=True)
+        return body.encode(), {f"run:{test_run_id}"}, {}
+
+    return await _cached_json(request, _cache_key(request, "get_test_run", test_run_id), build)
 
 @app.post("/test-phases/", response_model=test_schemas.TestPhase)
 @app.post("/phases/", response_model=test_schemas.TestPhase)
-async def create_test_phase(phase_data: test_schemas.TestPhaseCreate, db: Session = Depends(get_db)):
-    # First check if the test_run exists
-    db_test_run = db.query(test_run.TestRun).filter(test_run.TestRun.id == phase_data.test_run_id).first()
-    if db_test_run is None:
-        raise HTTPException(status_code=404, detail="Test run not found")
-    
-    # Convert the status string to the appropriate enum value
-    status_str = phase_data.status
-    if status_str.upper() == "PASSED":
-        status_value = test_phase.PhaseStatus.PASSED
-    elif status_str.upper() == "FAILED":
-        status_value = test_phase.PhaseStatus.FAILED
-    elif status_str.upper() == "PENDING":
-        status_value = test_phase.PhaseStatus.PENDING
-    elif status_str.upper() == "RUNNING":
-        status_value = test_phase.PhaseStatus.RUNNING
-    elif status_str.upper() == "SKIPPED":
-        status_value = test_phase.PhaseStatus.SKIPPED
-    elif status_str.upper() == "ERROR":
-        status_value = test_phase.PhaseStatus.ERROR
-    else:
-        raise HTTPException(status_code=400, detail=f"Invalid status value: {status_str}")
-    
-    # Create the test phase object
+async def create_test_phase(phase_data: test_schemas.TestPhaseCreate, idempotent: IdempotentRequest = Depends()):
     try:
+        ingest.parse_phase_status(phase_data.status)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    async def write(session: AsyncSession):
+        # First check if the test_run exists
+        db_test_run = await session.get(test_run.TestRun, phase_data.test_run_id)
+        if db_test_run is None:
+            raise HTTPException(status_code=404, detail="Test run not found")
+
+        # Create the test phase object
         phase_dict = phase_data.dict()
+        # Measurements with a spec are checked against it, which can decide the status
+        await specs.apply(session, db_test_run.procedure_id, [phase_dict])
         # Replace the string status with the enum value
-        phase_dict.pop("status", None)  # Remove string status
+        status_value = ingest.parse_phase_status(phase_dict.pop("status"))
         db_phase = test_phase.TestPhase(**phase_dict)
         db_phase.status = status_value  # Set the status directly
-        
-        # Add and commit to the database
-        db.add(db_phase)
-        db.commit()
-        db.refresh(db_phase)
-        
+        session.add(db_phase)
+
         # Update test run status based on phase status if needed
+        previous_status = db_test_run.status
         if status_value == test_phase.PhaseStatus.FAILED and db_test_run.status != test_run.TestStatus.FAILED:
             db_test_run.status = test_run.TestStatus.FAILED
-            db.commit()
-            db.refresh(db_test_run)
-        
+        await session.flush()
+
+        rows = ingest.flatten_measurements(db_phase.measurements, db_phase.id, db_test_run.id, db_phase.created_at)
+        if rows:
+            await session.execute(insert(measurement.Measurement), rows)
+        rollups.record_phases(session, [(db_phase.created_at, db_test_run.name, db_phase.name,
+                                         db_phase.status.value, db_phase.duration)])
+        rollups.move_run(session, db_test_run, previous_status)
+        live.record_phases(session, [(db_phase.created_at, db_test_run.created_at, db_test_run.station_id,
+                                      db_test_run.procedure_id, db_phase.status.value, db_phase.duration)])
+        live.move_run(session, db_test_run, previous_status)
+        await idempotent.record(session, _json_body(test_schemas.TestPhase, db_phase))
+        return db_phase, db_test_run, previous_status
+
+    try:
+        async with idempotent as replay:
+            if replay is not None:
+                return replay
+            db_phase, db_test_run, previous_status = await writer.submit(write)
+        _invalidate_run(db_test_run.id)
+        if db_phase.measurements:
+            response_cache.invalidate("measurements")
+        station = registry.station_name(db_test_run.meta_data)
+        broker.publish("phase-added", {
+            "test_run_id": db_test_run.id,
+            "phase_id": db_phase.id,
+            "name": db_phase.name,
+            "status": db_phase.status.value,
+            "station": station,
+        })
+        if db_test_run.status != previous_status:
+            broker.publish("status-changed", {
+                "test_run_id": db_test_run.id,
+                "status": db_test_run.status.value,
+                "previous_status": previous_status.value,
+                "station": station,
+            })
         return db_phase
+    except HTTPException:
+        raise
     except Exception as e:
-        db.rollback()
         raise HTTPException(status_code=500, detail=f"Error creating test phase: {str(e)}")
 
+@app.post("/runs/{test_run_id}/phases/bulk", response_model=test_schemas.BulkCreateResponse)
+@app.post("/test-runs/{test_run_id}/phases/bulk", response_model=test_schemas.BulkCreateResponse)
+async def create_test_phases_bulk(test_run_id: int, phases_data: List[test_schemas.TestPhaseBulkCreate],
+                                  idempotent: IdempotentRequest = Depends()):
+    """
+    Add many phases to a test run in a single transaction, e.g. the phases a
+    client buffered during a test
+    """
+    phases = [phase.dict() for phase in phases_data]
+    try:
+        for phase in phases:
+            ingest.parse_phase_status(phase["status"])
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    async def write(session: AsyncSession):
+        db_test_run = await session.get(test_run.TestRun, test_run_id)
+        if db_test_run is None:
+            raise HTTPException(status_code=404, detail="Test run not found")
+        previous_status = db_test_run.status
+        phase_ids = await ingest.bulk_insert_phases(session, db_test_run, phases)
+        await session.flush()
+        await idempotent.record(session, _json_body(test_schemas.BulkCreateResponse, {"ids": phase_ids}))
+        return phase_ids, db_test_run, previous_status
+
+    async with idempotent as replay:
+        if replay is not None:
+            return replay
+        try:
+            phase_ids, db_test_run, previous_status = await writer.submit(write)
+        except HTTPException:
+            raise
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Error creating test phases: {str(e)}")
+    _invalidate_run(test_run_id)
+    if any(phase["measurements"] for phase in phases):
+        response_cache.invalidate("measurements")
+    station = registry.station_name(db_test_run.meta_data)
+    for phase_id, phase in zip(phase_ids, phases):
+        broker.publish("phase-added", {
+            "test_run_id": test_run_id,
+            "phase_id": phase_id,
+            "name": phase["name"],
+            "status": ingest.parse_phase_status(phase["status"]).value,
+            "station": station,
+        })
+    if db_test_run.status != previous_status:
+        broker.publish("status-changed", {
+            "test_run_id": test_run_id,
+            "status": db_test_run.status.value,
+            "previous_status": previous_status.value,
+            "station": station,
+        })
+    return {"ids": phase_ids}
+
 @app.put("/runs/{test_run_id}/status", response_model=test_schemas.TestRun)
 @app.put("/test-runs/{test_run_id}/status", response_model=test_schemas.TestRun)
-async def update_test_run_status(test_run_id: int, status_data: dict, db: Session = Depends(get_db)):
+async def update_test_run_status(test_run_id: int, status_data: dict):
+    if "status" not in status_data:
+        raise HTTPException(status_code=400, detail="Status field is required")
     try:
-        db_test_run = db.query(test_run.TestRun).filter(test_run.TestRun.id == test_run_id).first()
+        status_value = ingest.parse_run_status(status_data["status"])
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    async def write(session: AsyncSession):
+        db_test_run = await session.get(test_run.TestRun, test_run_id)
         if db_test_run is None:
             raise HTTPException(status_code=404, detail="Test run not found")
-        
-        if "status" not in status_data:
-            raise HTTPException(status_code=400, detail="Status field is required")
-        
-        status_str = status_data["status"]
-        if status_str.upper() == "PASSED":
-            status_value = test_run.TestStatus.PASSED
-        elif status_str.upper() == "FAILED":
-            status_value = test_run.TestStatus.FAILED
-        elif status_str.upper() == "PENDING":
-            status_value = test_run.TestStatus.PENDING
-        elif status_str.upper() == "RUNNING":
-            status_value = test_run.TestStatus.RUNNING
-        elif status_str.upper() == "ERROR":
-            status_value = test_run.TestStatus.ERROR
-        else:
-            raise HTTPException(status_code=400, detail=f"Invalid status value: {status_str}")
-        
+        previous_status = db_test_run.status
         db_test_run.status = status_value
-        db.commit()
-        db.refresh(db_test_run)
+        await session.flush()
+        rollups.move_run(session, db_test_run, previous_status)
+        live.move_run(session, db_test_run, previous_status)
+        return db_test_run, previous_status
+
+    try:
+        db_test_run, previous_status = await writer.submit(write)
+        _invalidate_run(test_run_id)
+        if status_value != previous_status:
+            broker.publish("status-changed", {
+                "test_run_id": test_run_id,
+                "status": status_value.value,
+                "previous_status": previous_status.value,
+                "station": registry.station_name(db_test_run.meta_data),
+            })
         return db_test_run
+    except HTTPException:
+        raise
     except Exception as e:
-        db.rollback()
         raise HTTPException(status_code=500, detail=f"Error updating test run status: {str(e)}")
 
 @app.get("/runs/{test_run_id}/phases", response_model=List[test_schemas.TestPhase])
 @app.get("/test-runs/{test_run_id}/phases", response_model=List[test_schemas.TestPhase])
-async def get_test_phases_by_run_id(test_run_id: int, db: Session = Depends(get_db)):
-    db_test_run = db.query(test_run.TestRun).filter(test_run.TestRun.id == test_run_id).first()
-    if db_test_run is None:
+async def get_test_phases_by_run_id(test_run_id: int, request: Request, limit: int = Query(1000, ge=1),
+                                    cursor: Optional[str] = None, db: AsyncSession = Depends(get_db)):
+    async def build():
+        db_test_run = await db.get(test_run.TestRun, test_run_id)
+        try:
+            if db_test_run is None:
+                result = await _archived_run_detail(db, test_run_id, phases=True, attachments=False)
+                archived_phases = [test_schemas.TestPhase.model_validate(phase) for phase in result["phases"]]
+                phases, next_cursor, prev_cursor = pagination.keyset_slice(archived_phases, limit, cursor)
+            else:
+                query = select(test_phase.TestPhase).where(test_phase.TestPhase.test_run_id == test_run_id)
+                phases, next_cursor, prev_cursor = await pagination.keyset_page(db, query, test_phase.TestPhase, limit, cursor)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        body = PHASE_LIST.dump_json(PHASE_LIST.validate_python(phases, from_attributes=True))
+        return body, {f"run:{test_run_id}"}, _cursor_headers(next_cursor, prev_cursor)
+
+    return await _cached_json(request, _cache_key(request, "get_test_phases_by_run_id", test_run_id), build)
+
+async def _attachment_run_id(session: AsyncSession, test_run_id: Optional[int], phase_id: Optional[int]) -> int:
+    """The run an attachment to ``test_run_id`` or ``phase_id`` belongs to; 404 if it doesn't exist."""
+    if phase_id is not None:
+        db_phase = await session.get(test_phase.TestPhase, phase_id)
+        if db_phase is None:
+            raise HTTPException(status_code=404, detail="Test phase not found")
+        return db_phase.test_run_id
+    if await session.get(test_run.TestRun, test_run_id) is None:
         raise HTTPException(status_code=404, detail="Test run not found")
-    
-    phases = db.query(test_phase.TestPhase).filter(test_phase.TestPhase.test_run_id == test_run_id).all()
-    return phases
+    return test_run_id
+
+async def _store_attachment(file: UploadFile, description: Optional[str], test_run_id: Optional[int],
+                            phase_id: Optional[int]) -> attachment.Attachment:
+    """
+    Copy an uploaded file into the blob store and record it as an attachment.
+
+    The multipart body has already been spooled to a temporary file by the
+    form parser; it is hashed and copied into the store chunk by chunk in a
+    worker thread, so neither step holds the file in memory. The run or
+    phase is looked up first, so an upload to one that doesn't exist leaves
+    nothing in the store. Blobs are shared by content, so one is never
+    removed again once stored.
+    """
+    async with AsyncSessionLocal() as db:
+        await _attachment_run_id(db, test_run_id, phase_id)
+    digest, size = await run_in_threadpool(blob_store.put, file.file)
+
+    async def write(session: AsyncSession):
+        # Checked again in case the run was archived during the upload
+        run_id = await _attachment_run_id(session, test_run_id, phase_id)
+        db_attachment = attachment.Attachment(
+            filename=file.filename or digest,
+            content_type=file.content_type,
+            file_size=size,
+            sha256=digest,
+            description=description,
+            test_run_id=run_id,
+            phase_id=phase_id,
+        )
+        session.add(db_attachment)
+        await session.flush()
+        return db_attachment
+
+    db_attachment = await writer.submit(write)
+    _invalidate_run(db_attachment.test_run_id)
+    return db_attachment
+
+@app.post("/runs/{test_run_id}/attachments", response_model=test_schemas.Attachment)
+@app.post("/test-runs/{test_run_id}/attachments", response_model=test_schemas.Attachment)
+async def upload_run_attachment(test_run_id: int, file: UploadFile = File(...), description: Optional[str] = Form(None)):
+    """Attach a file to a test run from a multipart/form-data upload."""
+    return await _store_attachment(file, description, test_run_id, None)
+
+@app.post("/phases/{phase_id}/attachments", response_model=test_schemas.Attachment)
+@app.post("/test-phases/{phase_id}/attachments", response_model=test_schemas.Attachment)
+async def upload_phase_attachment(phase_id: int, file: UploadFile = File(...), description: Optional[str] = Form(None)):
+    """Attach a file to a test phase from a multipart/form-data upload."""
+    return await _store_attachment(file, description, None, phase_id)
+
+def _content_disposition(filename: str) -> str:
+    # Same encoding FileResponse uses, so both download paths name files alike
+    quoted = quote(filename)
+    if quoted != filename:
+        return f"attachment; filename*=utf-8''{quoted}"
+    return f'attachment; filename="{filename}"'
+
+def _compressed_blob_response(request: Request, path: str, media_type: str, filename: str, headers: dict) -> Response:
+    """Stream a compressed blob's content, decompressing only the chunks a Range request covers."""
+    size = blob_store.size(path, compressed=True)
+    headers = {**headers, "Accept-Ranges": "bytes", "Content-Disposition": _content_disposition(filename)}
+    try:
+        byte_range = parse_range(request.headers.get("range"), size)
+    except ValueError:
+        return Response(status_code=416, headers={"Content-Range": f"bytes */{size}"})
+    start, end = byte_range or (0, size - 1)
+    if byte_range is not None:
+        headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    headers["Content-Length"] = str(end - start + 1)
+    return StreamingResponse(
+        blob_store.read_compressed(path, start, end),
+        status_code=206 if byte_range is not None else 200,
+        media_type=media_type,
+        headers=headers,
+    )
+
+@app.get("/attachments/{attachment_id}/content")
+async def download_attachment(attachment_id: int, request: Request, db: AsyncSession = Depends(get_db)):
+    """
+    Return an attachment's contents. Files in the blob store are sent straight
+    from disk (using sendfile where the server supports it), or decompressed
+    chunk by chunk if they were stored compressed, and honour Range requests;
+    attachments stored in the database by older clients are returned whole.
+    """
+    db_attachment = await db.get(attachment.Attachment, attachment_id)
+    if db_attachment is None:
+        archived = await run_in_threadpool(archive.find_attachment, attachment_id)
+        if archived is None:
+            raise HTTPException(status_code=404, detail="Attachment not found")
+        db_attachment = attachment.Attachment(**archived)
+    media_type = db_attachment.content_type or "application/octet-stream"
+
+    if db_attachment.sha256:
+        location = blob_store.locate(db_attachment.sha256)
+        if location is None:
+            raise HTTPException(status_code=404, detail="Attachment content not found")
+        path, compressed = location
+        headers = {"ETag": f'"{db_attachment.sha256}"', "Cache-Control": "private, max-age=31536000, immutable"}
+        if compressed:
+            return await run_in_threadpool(
+                _compressed_blob_response, request, path, media_type, db_attachment.filename, headers)
+    elif db_attachment.file_data is not None:
+        return Response(
+            content=db_attachment.file_data,
+            media_type=media_type,
+            headers={"Content-Disposition": _content_disposition(db_attachment.filename)},
+        )
+    else:
+        path = db_attachment.file_path
+        headers = None
+        if not path or not os.path.isfile(path):
+            raise HTTPException(status_code=404, detail="Attachment content not found")
+    return FileResponse(path, media_type=media_type, filename=db_attachment.filename, headers=headers)
+
+async def _create_registry_entry(registry_map: registry.Registry, data):
+    async def write(session: AsyncSession):
+        entry = registry_map.model(**data.dict())
+        session.add(entry)
+        await session.flush()
+        return entry
+
+    try:
+        entry = await writer.submit(write)
+    except IntegrityError:
+        raise HTTPException(status_code=409, detail=f"{data.name} already exists")
+    registry_map.invalidate()
+    return entry
+
+async def _update_registry_entry(registry_map: registry.Registry, entry_id: int, data):
+    async def write(session: AsyncSession):
+        entry = await session.get(registry_map.model, entry_id)
+        if entry is None:
+            raise HTTPException(status_code=404, detail=f"{registry_map.model.__name__} not found")
+        for key, value in data.dict().items():
+            setattr(entry, key, value)
+        await session.flush()
+        return entry
+
+    try:
+        entry = await writer.submit(write)
+    except IntegrityError:
+        raise HTTPException(status_code=409, detail=f"{data.name} already exists")
+    registry_map.invalidate()
+    return entry
+
+async def _get_registry_entry(db: AsyncSession, model, entry_id: int):
+    entry = await db.get(model, entry_id)
+    if entry is None:
+        raise HTTPException(status_code=404, detail=f"{model.__name__} not found")
+    return entry
+
+@app.get("/stations/", response_model=List[test_schemas.Station])
+async def list_stations(db: AsyncSession = Depends(get_db)):
+    return (await db.scalars(select(station.Station).order_by(station.Station.name))).all()
+
+@app.post("/stations/", response_model=test_schemas.Station)
+async def create_station(station_data: test_schemas.StationCreate):
+    return await _create_registry_entry(registry.stations, station_data)
+
+@app.get("/stations/metrics", response_model=List[test_schemas.StationLiveMetrics])
+async def list_station_metrics(db: AsyncSession = Depends(get_db)):
+    """Live metrics of every station over the last NOTTOFU_LIVE_WINDOW_MINUTES, see ``app.live``."""
+    stations = (await db.scalars(select(station.Station).order_by(station.Station.name))).all()
+    return [{"station_id": s.id, "name": s.name, **live.live_metrics.station(s.id)} for s in stations]
+
+@app.get("/stations/{station_id}/metrics", response_model=test_schemas.StationLiveMetrics)
+async def get_station_metrics(station_id: int, db: AsyncSession = Depends(get_db)):
+    """
+    Runs per minute, run and phase failure rates and phase duration
+    percentiles of a station over the last NOTTOFU_LIVE_WINDOW_MINUTES, in
+    total and per procedure. Served from memory.
+    """
+    entry = await _get_registry_entry(db, station.Station, station_id)
+    return {"station_id": entry.id, "name": entry.name, **live.live_metrics.station(entry.id)}
+
+@app.get("/stations/{station_id}", response_model=test_schemas.Station)
+async def get_station(station_id: int, db: AsyncSession = Depends(get_db)):
+    return await _get_registry_entry(db, station.Station, station_id)
+
+@app.put("/stations/{station_id}", response_model=test_schemas.Station)
+async def update_station(station_id: int, station_data: test_schemas.StationCreate):
+    """Update a station. Runs that name the station by its old name afterwards register a new one."""
+    return await _update_registry_entry(registry.stations, station_id, station_data)
+
+@app.get("/procedures/", response_model=List[test_schemas.Procedure])
+async def list_procedures(db: AsyncSession = Depends(get_db)):
+    return (await db.scalars(select(procedure.Procedure).order_by(procedure.Procedure.name))).all()
+
+@app.post("/procedures/", response_model=test_schemas.Procedure)
+async def create_procedure(procedure_data: test_schemas.ProcedureCreate):
+    return await _create_registry_entry(registry.procedures, procedure_data)
+
+@app.get("/procedures/{procedure_id}", response_model=test_schemas.Procedure)
+async def get_procedure(procedure_id: int, db: AsyncSession = Depends(get_db)):
+    return await _get_registry_entry(db, procedure.Procedure, procedure_id)
+
+@app.get("/procedures/{procedure_id}/metrics", response_model=test_schemas.ProcedureLiveMetrics)
+async def get_procedure_metrics(procedure_id: int, db: AsyncSession = Depends(get_db)):
+    """Live metrics of a procedure across all stations, like ``/stations/{id}/metrics``."""
+    entry = await _get_registry_entry(db, procedure.Procedure, procedure_id)
+    return {"procedure_id": entry.id, **live.live_metrics.procedure(entry.id)}
+
+@app.put("/procedures/{procedure_id}", response_model=test_schemas.Procedure)
+async def update_procedure(procedure_id: int, procedure_data: test_schemas.ProcedureCreate):
+    """Update a procedure. Runs created afterwards under its old name register a new one."""
+    return await _update_registry_entry(registry.procedures, procedure_id, procedure_data)
+
+@app.get("/procedures/{procedure_id}/specs", response_model=List[test_schemas.MeasurementSpec])
+async def get_measurement_specs(procedure_id: int, db: AsyncSession = Depends(get_db)):
+    await _get_registry_entry(db, procedure.Procedure, procedure_id)
+    model = measurement_spec.MeasurementSpec
+    return (await db.scalars(select(model).where(model.procedure_id == procedure_id).order_by(model.id))).all()
+
+@app.put("/procedures/{procedure_id}/specs", response_model=List[test_schemas.MeasurementSpec])
+async def set_measurement_specs(procedure_id: int, specs_data: List[test_schemas.MeasurementSpecCreate]):
+    """
+    Replace the measurement specs of a procedure. Phases reported for its
+    runs from now on have these measurements checked against the specs;
+    phases already stored are left as they are.
+    """
+    names = set()
+    for spec in specs_data:
+        if spec.name in names:
+            raise HTTPException(status_code=400, detail=f"Duplicate spec for measurement {spec.name}")
+        names.add(spec.name)
+        if spec.low_limit is not None and spec.high_limit is not None and spec.low_limit > spec.high_limit:
+            raise HTTPException(status_code=400, detail=f"Low limit of {spec.name} is above its high limit")
+
+    async def write(session: AsyncSession):
+        await _get_registry_entry(session, procedure.Procedure, procedure_id)
+        model = measurement_spec.MeasurementSpec
+        await session.execute(delete(model).where(model.procedure_id == procedure_id))
+        db_specs = [model(procedure_id=procedure_id, **spec.dict()) for spec in specs_data]
+        session.add_all(db_specs)
+        await session.flush()
+        return db_specs
+
+    db_specs = await writer.submit(write)
+    specs.spec_cache.invalidate(procedure_id)
+    return db_specs
+
+@app.get("/analytics/measurements/{name}", response_model=test_schemas.MeasurementStats)
+async def get_measurement_stats(name: str, request: Request, bucket: Literal["hour", "day", "week"] = "day",
+                                created_after: Optional[datetime] = None, created_before: Optional[datetime] = None,
+                                db: AsyncSession = Depends(get_db)):
+    """
+    Process statistics for one measurement across all runs: count, mean, std,
+    min/max, percentiles, Cp/Cpk against the latest stored limits, and sample
+    counts with first-pass yield per hour, day or week.
+    """
+    async def build():
+        samples = await analytics.load_samples(db, name, created_after, created_before)
+        low, high = await analytics.latest_limits(db, name, created_after, created_before)
+        # Keep the number crunching off the event loop
+        stats = await run_in_threadpool(analytics.summarize, samples, low, high)
+        buckets = await run_in_threadpool(analytics.yield_by_bucket, samples, bucket)
+        result = test_schemas.MeasurementStats(
+            name=name, low_limit=low, high_limit=high, bucket=bucket, buckets=buckets, **stats,
+        )
+        return result.model_dump_json().encode(), {"measurements"}, {}
+
+    return await _cached_json(request, _cache_key(request, "get_measurement_stats", name), build)
+
+ROLLUP_LIST = TypeAdapter(List[test_schemas.RunRollup])
+PHASE_ROLLUP_LIST = TypeAdapter(List[test_schemas.PhaseRollup])
+
+def _rollup_range(query, model, granularity: str, created_after: Optional[datetime], created_before: Optional[datetime]):
+    query = query.where(model.granularity == granularity)
+    if created_after is not None:
+        query = query.where(model.bucket_start >= rollups.bucket_start(created_after, granularity))
+    if created_before is not None:
+        query = query.where(model.bucket_start < created_before)
+    return query.order_by(*model.__table__.primary_key.columns)
+
+@app.get("/analytics/rollups/runs", response_model=List[test_schemas.RunRollup])
+async def get_run_rollups(request: Request, granularity: Literal["hour", "day"] = "day", run_name: Optional[str] = None,
+                          created_after: Optional[datetime] = None, created_before: Optional[datetime] = None,
+                          db: AsyncSession = Depends(get_db)):
+    """Run counts per hour or day, run name and current status, read from the run rollups."""
+    async def build():
+        model = rollup.RunRollup
+        query = select(model).where(model.count != 0)
+        if run_name is not None:
+            query = query.where(model.run_name == run_name)
+        rows = (await db.scalars(_rollup_range(query, model, granularity, created_after, created_before))).all()
+        return ROLLUP_LIST.dump_json(ROLLUP_LIST.validate_python(rows, from_attributes=True)), {"rollups"}, {}
+
+    return await _cached_json(request, _cache_key(request, "get_run_rollups"), build)
+
+@app.get("/analytics/rollups/phases", response_model=List[test_schemas.PhaseRollup])
+async def get_phase_rollups(request: Request, granularity: Literal["hour", "day"] = "day", run_name: Optional[str] = None,
+                            phase_name: Optional[str] = None, created_after: Optional[datetime] = None,
+                            created_before: Optional[datetime] = None, db: AsyncSession = Depends(get_db)):
+    """
+    Phase counts and duration mean/std per hour or day, run name, phase name
+    and phase status, read from the phase rollups.
+    """
+    async def build():
+        model = rollup.PhaseRollup
+        query = select(model)
+        if run_name is not None:
+            query = query.where(model.run_name == run_name)
+        if phase_name is not None:
+            query = query.where(model.phase_name == phase_name)
+        rows = []
+        for row in (await db.scalars(_rollup_range(query, model, granularity, created_after, created_before))).all():
+            mean, std = rollups.duration_stats(row.duration_count, row.duration_sum, row.duration_sumsq)
+            rows.append(test_schemas.PhaseRollup(
+                bucket_start=row.bucket_start, run_name=row.run_name, phase_name=row.phase_name, status=row.status,
+                count=row.count, duration_count=row.duration_count, mean_duration=mean, std_duration=std,
+            ))
+        return PHASE_ROLLUP_LIST.dump_json(rows), {"rollups"}, {}
+
+    return await _cached_json(request, _cache_key(request, "get_phase_rollups"), build)
+
+ExportFormat = Literal["csv", "parquet", "arrow"]
+
+def _export_response(query, columns, fmt: str, name: str) -> StreamingResponse:
+    media_type, extension = export.FORMATS[fmt]
+    return StreamingResponse(
+        export.stream_export(query, columns, fmt),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{name}.{extension}"'},
+    )
+
+@app.get("/export/runs")
+async def export_runs(fmt: ExportFormat = Query("csv", alias="format"), filters: RunFilters = Depends()):
+    """
+    Download every run matching the run list filters as CSV, Parquet or an
+    Arrow IPC stream, ordered by (created_at, id). JSON fields are exported
+    as JSON text.
+    """
+    columns = list(test_run.TestRun.__table__.columns)
+    query = filters.apply(select(*columns)).order_by(test_run.TestRun.created_at, test_run.TestRun.id)
+    return _export_response(query, columns, fmt, "runs")
+
+@app.get("/export/measurements")
+async def export_measurements(fmt: ExportFormat = Query("csv", alias="format"), name: Optional[str] = None,
+                              test_run_id: Optional[int] = None, created_after: Optional[datetime] = None,
+                              created_before: Optional[datetime] = None):
+    """
+    Download measurements as CSV, Parquet or an Arrow IPC stream, optionally
+    limited to one measurement name, one run and a created_after /
+    created_before range. Rows come in time order when filtered by name and
+    in insertion order otherwise, which are the orders the indexes give for
+    free.
+    """
+    m = measurement.Measurement
+    columns = list(m.__table__.columns)
+    query = select(*columns)
+    if name is not None:
+        query = query.where(m.name == name).order_by(m.created_at)
+    else:
+        query = query.order_by(m.id)
+    if test_run_id is not None:
+        query = query.where(m.test_run_id == test_run_id)
+    if created_after is not None:
+        query = query.where(m.created_at >= created_after)
+    if created_before is not None:
+        query = query.where(m.created_at < created_before)
+    return _export_response(query, columns, fmt, "measurements")
+
+def _format_ms(seconds: Optional[float]) -> Optional[str]:
+    return f"{seconds * 1000:.1f}ms" if seconds is not None else None
+
+def _storage_writable() -> bool:
+    # The blob directory is created on the first upload
+    root = blob_store.root if os.path.isdir(blob_store.root) else os.path.dirname(os.path.abspath(blob_store.root))
+    return os.access(root, os.W_OK)
 
 @app.get("/status")
-async def get_api_status():
+async def get_api_status(db: AsyncSession = Depends(get_db)):
     """
-    Return the current API health status
+    Return the current API health status: whether the database answers and
+    how fast, request and query latency since startup, connection pool
+    usage and the process's uptime and memory. /metrics has the same
+    figures in the Prometheus format.
     """
-    import datetime
     import platform
-    
-    # Calculate uptime (mock for now)
-    start_time = datetime.datetime.now() - datetime.timedelta(days=10, hours=5, minutes=30)
-    uptime = datetime.datetime.now() - start_time
-    uptime_str = f"{uptime.days}d {uptime.seconds // 3600}h {(uptime.seconds // 60) % 60}m"
-    
+
+    try:
+        started = time.perf_counter()
+        await db.execute(select(1))
+        ping = time.perf_counter() - started
+    except Exception:
+        ping = None
+    storage = await run_in_threadpool(_storage_writable)
+
+    uptime = int(api_metrics.uptime())
+    requests = api_metrics.request_latency()
+    queries = api_metrics.query_latency()
     return {
-        "status": "operational",
+        "status": "operational" if ping is not None and storage else "degraded",
         "version": "1.0.0",
-        "uptime": uptime_str,
+        "uptime": f"{uptime // 86400}d {uptime // 3600 % 24}h {uptime // 60 % 60}m",
+        "uptime_seconds": uptime,
         "services": {
-            "database": "connected",
-            "storage": "connected",
+            "database": "connected" if ping is not None else "unreachable",
+            "storage": "connected" if storage else "unavailable",
             "cache": "connected"
         },
         "latency": {
-            "database": "15ms",
-            "api": "45ms"
+            "database": _format_ms(ping),
+            "api": _format_ms(requests.percentile(50))
+        },
+        "requests": {
+            "in_flight": api_metrics.in_flight,
+            **requests.summary(),
+            "routes": api_metrics.routes()
         },
+        "database": {
+            "pool": metrics.pool_usage(async_engine.pool),
+            "queries": {**queries.summary(), "errors": api_metrics.query_errors},
+            "query_kinds": {kind: histogram.summary() for kind, histogram in sorted(api_metrics.query_kinds().items())}
+        },
+        "process": metrics.process_usage(),
         "system": {
             "python": platform.python_version(),
             "os": platform.system(),
@@ -172,6 +918,12 @@ async def get_api_status():
         }
     }
 
+@app.get("/metrics")
+async def get_prometheus_metrics():
+    """Request, query, pool and process metrics in the Prometheus text format."""
+    return Response(metrics.prometheus(api_metrics, async_engine.pool),
+                    media_type="text/plain; version=0.0.4; charset=utf-8")
+
 if __name__ == "__main__":
     # Get port from environment variable or use default
     # First try NOTTOFU_PORT, then fall back to PORT, then default to 8000
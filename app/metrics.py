@@ -0,0 +1,312 @@
+"""
+Request, database and process instrumentation for /status and /metrics.
+
+MetricsMiddleware times every HTTP request into a histogram per method,
+route template and response status, and counts the requests in flight.
+Queries on an instrumented engine are timed through SQLAlchemy's cursor
+events, by kind of statement. Histograms have fixed log-spaced buckets, so
+recording one is a bisect and two additions, and the percentiles /status
+shows are interpolated from the buckets. Connection pool usage, memory and
+CPU time are read when they are asked for.
+
+Requests are recorded on the event loop thread only, so they aren't
+locked. Queries also run in worker threads on the synchronous engine
+(exports, reads of archived runs, the compression dictionary load), so the
+query histograms are recorded and read under a lock.
+"""
+import os
+import sys
+import threading
+import time
+from bisect import bisect_left
+from typing import Dict, Iterable, List, Optional, Tuple
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Upper bounds in seconds, 4 per decade from 100 us to 100 s. A bucket is
+# 78% wider than the one below, which bounds the error of a percentile.
+BUCKETS: Tuple[float, ...] = tuple(10 ** (k / 4) for k in range(-16, 9))
+PERCENTILES = (50, 90, 99)
+
+QUERY_KINDS = {"SELECT", "INSERT", "UPDATE", "DELETE"}
+UNMATCHED = "<unmatched>"  # Route label of requests no route matched, e.g. 404s
+
+
+class Histogram:
+    """Counts per bucket of BUCKETS, plus one for values above the last bound."""
+
+    __slots__ = ("counts", "sum")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.sum = 0.0
+
+    def observe(self, seconds: float):
+        self.counts[bisect_left(BUCKETS, seconds)] += 1
+        self.sum += seconds
+
+    @property
+    def count(self) -> int:
+        return sum(self.counts)
+
+    @classmethod
+    def merged(cls, histograms: Iterable["Histogram"]) -> "Histogram":
+        total = cls()
+        for histogram in histograms:
+            total.counts = [a + b for a, b in zip(total.counts, histogram.counts)]
+            total.sum += histogram.sum
+        return total
+
+    def percentile(self, p: float) -> Optional[float]:
+        """The ``p``th percentile in seconds, interpolated geometrically within its bucket."""
+        total = self.count
+        if not total:
+            return None
+        target = total * p / 100
+        seen = 0
+        for i, n in enumerate(self.counts):
+            if n and seen + n >= target:
+                if i == len(BUCKETS):
+                    return BUCKETS[-1]
+                low = BUCKETS[i - 1] if i else BUCKETS[0] / (BUCKETS[1] / BUCKETS[0])
+                return low * (BUCKETS[i] / low) ** ((target - seen) / n)
+            seen += n
+        return BUCKETS[-1]
+
+    def summary(self) -> dict:
+        """Count, mean and percentiles in milliseconds."""
+        count = self.count
+        summary = {"count": count, "mean_ms": self.sum / count * 1000 if count else None}
+        for p in PERCENTILES:
+            value = self.percentile(p)
+            summary[f"p{p}_ms"] = value * 1000 if value is not None else None
+        return summary
+
+
+class Metrics:
+    """Request and query histograms of this process."""
+
+    def __init__(self):
+        self.started_at = time.time()
+        self.in_flight = 0
+        # (method, route, status) -> request durations
+        self.requests: Dict[Tuple[str, str, int], Histogram] = {}
+        # Statement kind -> query durations
+        self.queries: Dict[str, Histogram] = {}
+        self.query_errors = 0
+        self._query_lock = threading.Lock()
+
+    def uptime(self) -> float:
+        return time.time() - self.started_at
+
+    def request_latency(self) -> Histogram:
+        return Histogram.merged(self.requests.values())
+
+    def query_latency(self) -> Histogram:
+        return Histogram.merged(self.query_kinds().values())
+
+    def query_kinds(self) -> Dict[str, Histogram]:
+        """A copy of the query histograms by statement kind."""
+        with self._query_lock:
+            return {kind: Histogram.merged([histogram]) for kind, histogram in self.queries.items()}
+
+    def routes(self) -> List[dict]:
+        """Request count, errors and latency per method and route, busiest first."""
+        by_route: Dict[Tuple[str, str], List[Tuple[int, Histogram]]] = {}
+        for (method, route, status), histogram in self.requests.items():
+            by_route.setdefault((method, route), []).append((status, histogram))
+        routes = []
+        for (method, route), entries in by_route.items():
+            summary = Histogram.merged(histogram for _, histogram in entries).summary()
+            summary["errors"] = sum(histogram.count for status, histogram in entries if status >= 500)
+            routes.append({"method": method, "route": route, **summary})
+        routes.sort(key=lambda entry: entry["count"], reverse=True)
+        return routes
+
+    def instrument(self, engine: Engine):
+        """
+        Time the queries ``engine`` runs, from any thread. Pass the
+        ``sync_engine`` of an async engine.
+        """
+        # retval saves SQLAlchemy wrapping the listener in one that returns the statement
+        event.listen(engine, "before_cursor_execute", self._query_started, retval=True)
+        event.listen(engine, "after_cursor_execute", self._query_finished)
+        event.listen(engine, "handle_error", self._query_failed)
+
+    def _query_started(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+        return statement, parameters
+
+    def _query_finished(self, conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_started"].pop()
+        kind = statement[:6].upper()
+        if kind not in QUERY_KINDS:
+            kind = "OTHER"
+        with self._query_lock:
+            histogram = self.queries.get(kind)
+            if histogram is None:
+                histogram = self.queries[kind] = Histogram()
+            histogram.observe(elapsed)
+
+    def _query_failed(self, context):
+        with self._query_lock:
+            self.query_errors += 1
+        conn = context.connection
+        if conn is not None and conn.info.get("query_started"):
+            conn.info["query_started"].pop()
+
+
+api_metrics = Metrics()
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording every HTTP request in ``metrics``."""
+
+    def __init__(self, app, metrics: Metrics = api_metrics):
+        self.app = app
+        self.metrics = metrics
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        metrics = self.metrics
+        status = 500  # If the app fails before it responds
+
+        # Returns send's awaitable rather than awaiting it, which saves a
+        # coroutine per message
+        def send_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            return send(message)
+
+        metrics.in_flight += 1
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_status)
+        finally:
+            elapsed = time.perf_counter() - start
+            metrics.in_flight -= 1
+            # FastAPI puts the matched route in the scope; label by its
+            # template so /runs/1 and /runs/2 share a histogram
+            route = scope.get("route")
+            key = (scope["method"], route.path if route is not None else UNMATCHED, status)
+            histogram = metrics.requests.get(key)
+            if histogram is None:
+                histogram = metrics.requests[key] = Histogram()
+            histogram.counts[bisect_left(BUCKETS, elapsed)] += 1
+            histogram.sum += elapsed
+
+
+def pool_usage(pool) -> Dict[str, int]:
+    """
+    Configured size and checked-out, idle and overflow connections of
+    ``pool``, as far as its kind of pool tracks them.
+    """
+    usage = {}
+    if hasattr(pool, "size"):
+        usage["size"] = pool.size()
+    if hasattr(pool, "checkedout"):
+        usage["checked_out"] = pool.checkedout()
+    if hasattr(pool, "checkedin"):
+        usage["idle"] = pool.checkedin()
+    if hasattr(pool, "overflow"):
+        # Counts up from -size as connections are opened
+        usage["overflow"] = max(pool.overflow(), 0)
+    return usage
+
+
+def process_usage() -> dict:
+    """Resident and peak memory in bytes (None where the OS doesn't tell) and CPU seconds."""
+    rss = None
+    try:
+        with open("/proc/self/statm") as f:
+            rss = int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        pass
+    peak = None
+    if resource is not None:
+        # Kilobytes on Linux, bytes on macOS
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        peak *= 1 if sys.platform == "darwin" else 1024
+    return {"pid": os.getpid(), "memory_rss_bytes": rss, "memory_peak_bytes": peak,
+            "cpu_seconds": time.process_time()}
+
+
+def _labels(**labels) -> str:
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+               for value in labels.values())
+    return ",".join(f'{name}="{value}"' for name, value in zip(labels, escaped))
+
+
+def _histogram_lines(name: str, labels: dict, histogram: Histogram) -> List[str]:
+    lines = []
+    cumulative = 0
+    for bound, n in zip(BUCKETS, histogram.counts):
+        cumulative += n
+        lines.append(f"{name}_bucket{{{_labels(**labels, le=f'{bound:.6g}')}}} {cumulative}")
+    cumulative += histogram.counts[-1]
+    lines.append(f"{name}_bucket{{{_labels(**labels, le='+Inf')}}} {cumulative}")
+    lines.append(f"{name}_sum{{{_labels(**labels)}}} {histogram.sum!r}")
+    lines.append(f"{name}_count{{{_labels(**labels)}}} {cumulative}")
+    return lines
+
+
+def prometheus(metrics: Metrics, pool) -> str:
+    """``metrics``, ``pool`` usage and process usage in the Prometheus text format."""
+    lines = [
+        "# HELP nottofu_http_requests_in_flight HTTP requests being served.",
+        "# TYPE nottofu_http_requests_in_flight gauge",
+        f"nottofu_http_requests_in_flight {metrics.in_flight}",
+        "# HELP nottofu_http_request_duration_seconds HTTP request latency by method, route and status.",
+        "# TYPE nottofu_http_request_duration_seconds histogram",
+    ]
+    for (method, route, status), histogram in sorted(metrics.requests.items()):
+        lines += _histogram_lines("nottofu_http_request_duration_seconds",
+                                  {"method": method, "route": route, "status": status}, histogram)
+    lines += [
+        "# HELP nottofu_db_query_duration_seconds Database query latency by kind of statement.",
+        "# TYPE nottofu_db_query_duration_seconds histogram",
+    ]
+    for kind, histogram in sorted(metrics.query_kinds().items()):
+        lines += _histogram_lines("nottofu_db_query_duration_seconds", {"kind": kind}, histogram)
+    lines += [
+        "# HELP nottofu_db_query_errors_total Database queries that raised.",
+        "# TYPE nottofu_db_query_errors_total counter",
+        f"nottofu_db_query_errors_total {metrics.query_errors}",
+        "# HELP nottofu_db_pool_connections Open database connections by state.",
+        "# TYPE nottofu_db_pool_connections gauge",
+    ]
+    usage = pool_usage(pool)
+    for state in ("checked_out", "idle", "overflow"):
+        if state in usage:
+            lines.append(f"nottofu_db_pool_connections{{{_labels(state=state)}}} {usage[state]}")
+    if "size" in usage:
+        lines += [
+            "# HELP nottofu_db_pool_size Connections the pool keeps open, not counting overflow.",
+            "# TYPE nottofu_db_pool_size gauge",
+            f"nottofu_db_pool_size {usage['size']}",
+        ]
+
+    process = process_usage()
+    lines += [
+        "# HELP process_start_time_seconds Start time of the process since the epoch in seconds.",
+        "# TYPE process_start_time_seconds gauge",
+        f"process_start_time_seconds {metrics.started_at!r}",
+        "# HELP process_cpu_seconds_total User and system CPU time spent in seconds.",
+        "# TYPE process_cpu_seconds_total counter",
+        f"process_cpu_seconds_total {process['cpu_seconds']!r}",
+    ]
+    if process["memory_rss_bytes"] is not None:
+        lines += [
+            "# HELP process_resident_memory_bytes Resident memory size in bytes.",
+            "# TYPE process_resident_memory_bytes gauge",
+            f"process_resident_memory_bytes {process['memory_rss_bytes']}",
+        ]
+    return "\n".join(lines) + "\n"
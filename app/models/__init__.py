@@ -2,6 +2,14 @@ from .base import Base, BaseModel
 from .test_run import TestRun, TestStatus
 from .test_phase import TestPhase, PhaseStatus
 from .attachment import Attachment
+from .measurement import Measurement
+from .rollup import PhaseRollup, RunRollup
+from .compression_dictionary import CompressionDictionary
+from .archived_run import ArchivedRun
+from .idempotency_key import IdempotencyKey
+from .measurement_spec import MeasurementSpec
+from .station import Station
+from .procedure import Procedure
 
 # Import models so SQLAlchemy can discover them
-__all__ = ["Base", "BaseModel", "TestRun", "TestStatus", "TestPhase", "PhaseStatus", "Attachment"] 
\ No newline at end of file
+__all__ = ["Base", "BaseModel", "TestRun", "TestStatus", "TestPhase", "PhaseStatus", "Attachment", "Measurement", "PhaseRollup", "RunRollup", "CompressionDictionary", "ArchivedRun", "IdempotencyKey", "MeasurementSpec", "Station", "Procedure"] 
\ No newline at end of file
@@ -0,0 +1,15 @@
+from sqlalchemy import Column, String, Integer, DateTime
+from .base import Base
+
+class ArchivedRun(Base):
+    """
+    Where a run moved to Parquet by ``python -m app.archive`` now lives: its
+    rows, and those of its phases, measurements and attachments, are in the
+    ``month``/``run_name`` partition of each table in the archive.
+    """
+    __tablename__ = "archived_runs"
+
+    id = Column(Integer, primary_key=True)  # The run's id
+    month = Column(String, nullable=False)  # YYYY-MM of the run's created_at
+    run_name = Column(String)
+    archived_at = Column(DateTime, nullable=False)
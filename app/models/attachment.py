@@ -10,6 +10,7 @@ class Attachment(BaseModel):
     content_type = Column(String)
     file_size = Column(Integer)
     file_path = Column(String)  # Path to file if stored in filesystem
+    sha256 = Column(String(64), index=True)  # Key in the blob store if stored there
     file_data = Column(LargeBinary, nullable=True)  # Binary data if stored in DB
     description = Column(String)
     
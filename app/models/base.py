@@ -2,8 +2,14 @@ from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy import Column, Integer, DateTime
 from datetime import datetime
 
+from ..compression import CompressedJSON
+
 Base = declarative_base()
 
+# JSON everywhere, stored as binary JSONB on PostgreSQL and optionally
+# zstd-compressed on SQLite
+JSONType = CompressedJSON()
+
 class BaseModel(Base):
     __abstract__ = True
     
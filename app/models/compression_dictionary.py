@@ -0,0 +1,13 @@
+from sqlalchemy import Column, Integer, LargeBinary
+from .base import BaseModel
+
+class CompressionDictionary(BaseModel):
+    """
+    A zstd dictionary trained on stored JSON values. ``id`` is the dictionary
+    id written into every frame compressed with it, so rows must never be
+    deleted while frames may still reference them.
+    """
+    __tablename__ = "compression_dictionaries"
+
+    data = Column(LargeBinary, nullable=False)
+    sample_count = Column(Integer)
@@ -0,0 +1,17 @@
+from sqlalchemy import Column, String, Integer, DateTime, LargeBinary
+from .base import Base
+
+class IdempotencyKey(Base):
+    """
+    A write request made with an ``Idempotency-Key`` header and the response
+    it got, so a retry of the request gets the same response instead of
+    writing again. Rows are evicted once older than the TTL in
+    ``app.idempotency``.
+    """
+    __tablename__ = "idempotency_keys"
+
+    key = Column(String(255), primary_key=True)
+    fingerprint = Column(String(64), nullable=False)  # sha256 of the endpoint, path parameters and body
+    status_code = Column(Integer, nullable=False)
+    response = Column(LargeBinary, nullable=False)
+    created_at = Column(DateTime, nullable=False, index=True)
@@ -0,0 +1,27 @@
+from sqlalchemy import Column, String, Integer, Float, Boolean, ForeignKey, Index
+from .base import BaseModel
+
+class Measurement(BaseModel):
+    """
+    One measurement taken during a test phase, stored as a typed row so
+    analytics can filter and aggregate in SQL instead of decoding the phase's
+    ``measurements`` JSON. ``created_at`` is the phase's start time.
+    """
+    __tablename__ = "measurements"
+    __table_args__ = (
+        # Distribution of one measurement over a time range; the trailing
+        # columns let analytics scans read the index alone
+        Index("ix_measurements_name_created_at", "name", "created_at", "value", "passed", "test_run_id"),
+    )
+
+    name = Column(String, nullable=False)
+    value = Column(Float)  # Numeric value, if the measurement has one
+    text_value = Column(String)  # Non-numeric values such as "PASS"
+    unit = Column(String)
+    low_limit = Column(Float)
+    high_limit = Column(Float)
+    passed = Column(Boolean)
+
+    # Foreign keys
+    phase_id = Column(Integer, ForeignKey("test_phases.id"), nullable=False, index=True)
+    test_run_id = Column(Integer, ForeignKey("test_runs.id"), nullable=False, index=True)
@@ -0,0 +1,20 @@
+from sqlalchemy import Column, String, Float, Integer, ForeignKey, UniqueConstraint
+from .base import BaseModel
+
+class MeasurementSpec(BaseModel):
+    """
+    The unit and limits a procedure declares for one of its measurements.
+    Phases reported for a run of the procedure have the measurement checked
+    against the spec on the server; see ``app.specs``.
+    """
+    __tablename__ = "measurement_specs"
+    __table_args__ = (
+        UniqueConstraint("procedure_id", "name", name="uq_measurement_specs_procedure_id_name"),
+    )
+
+    procedure_id = Column(Integer, ForeignKey("procedures.id"), nullable=False)
+    name = Column(String, nullable=False)
+    unit = Column(String)
+    low_limit = Column(Float)
+    high_limit = Column(Float)
+    comparator = Column(String, nullable=False, default="GELE")  # See app.specs.COMPARATORS
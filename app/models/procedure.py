@@ -0,0 +1,13 @@
+from sqlalchemy import Column, String
+from .base import BaseModel
+
+class Procedure(BaseModel):
+    """
+    A test procedure. Runs are linked to the procedure with their name;
+    procedures seen for the first time are registered automatically.
+    """
+    __tablename__ = "procedures"
+
+    name = Column(String, nullable=False, unique=True)
+    description = Column(String)
+    version = Column(String)
@@ -0,0 +1,31 @@
+from sqlalchemy import Column, String, Integer, Float, DateTime
+from .base import Base
+
+class PhaseRollup(Base):
+    """
+    Phase counts and duration moments per time bucket, kept up to date by the
+    write endpoints so dashboards read one row per bucket instead of scanning
+    test_phases. Mean and spread follow from the sums:
+    mean = duration_sum / duration_count, var = (duration_sumsq - duration_sum * mean) / (duration_count - 1).
+    """
+    __tablename__ = "phase_rollups"
+
+    granularity = Column(String, primary_key=True)  # "hour" or "day"
+    bucket_start = Column(DateTime, primary_key=True)
+    run_name = Column(String, primary_key=True)
+    phase_name = Column(String, primary_key=True)
+    status = Column(String, primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
+    duration_count = Column(Integer, nullable=False, default=0)
+    duration_sum = Column(Float, nullable=False, default=0.0)
+    duration_sumsq = Column(Float, nullable=False, default=0.0)
+
+class RunRollup(Base):
+    """Run counts per time bucket, run name and current run status."""
+    __tablename__ = "run_rollups"
+
+    granularity = Column(String, primary_key=True)
+    bucket_start = Column(DateTime, primary_key=True)
+    run_name = Column(String, primary_key=True)
+    status = Column(String, primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
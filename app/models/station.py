@@ -0,0 +1,14 @@
+from sqlalchemy import Column, String
+from .base import BaseModel
+
+class Station(BaseModel):
+    """
+    A test station. Runs are linked to the station named in their
+    ``meta_data`` (``station`` or ``station_id``); stations seen for the
+    first time are registered automatically.
+    """
+    __tablename__ = "stations"
+
+    name = Column(String, nullable=False, unique=True)
+    description = Column(String)
+    location = Column(String)
@@ -1,7 +1,7 @@
-from sqlalchemy import Column, String, JSON, ForeignKey, Enum, Float, Integer
+from sqlalchemy import Column, String, ForeignKey, Enum, Float, Integer, Index
 from sqlalchemy.orm import relationship
 import enum
-from .base import BaseModel
+from .base import BaseModel, JSONType
 
 class PhaseStatus(enum.Enum):
     PENDING = "pending"
@@ -13,11 +13,15 @@ class PhaseStatus(enum.Enum):
 
 class TestPhase(BaseModel):
     __tablename__ = "test_phases"
+    __table_args__ = (
+        # Keyset pagination order for a run's phases
+        Index("ix_test_phases_test_run_id_created_at_id", "test_run_id", "created_at", "id"),
+    )
 
     name = Column(String, index=True)
     description = Column(String)
     status = Column(Enum(PhaseStatus), default=PhaseStatus.PENDING)
-    measurements = Column(JSON)  # Store measurements and their limits
+    measurements = Column(JSONType)  # Store measurements and their limits
     duration = Column(Float)  # Duration in seconds
     
     # Foreign keys
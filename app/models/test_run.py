@@ -1,7 +1,7 @@
-from sqlalchemy import Column, String, JSON, ForeignKey, Enum
+from sqlalchemy import Column, String, Integer, ForeignKey, Enum, Index
 from sqlalchemy.orm import relationship
 import enum
-from .base import BaseModel
+from .base import BaseModel, JSONType
 
 class TestStatus(enum.Enum):
     PENDING = "pending"
@@ -12,15 +12,30 @@ class TestStatus(enum.Enum):
 
 class TestRun(BaseModel):
     __tablename__ = "test_runs"
+    __table_args__ = (
+        # Keyset pagination order for run listings
+        Index("ix_test_runs_created_at_id", "created_at", "id"),
+        # Filtered listings: equality column first, then the keyset order
+        Index("ix_test_runs_status_created_at", "status", "created_at", "id"),
+        Index("ix_test_runs_uut_serial_created_at", "uut_serial", "created_at", "id"),
+        Index("ix_test_runs_uut_id_created_at", "uut_id", "created_at", "id"),
+        Index("ix_test_runs_name_created_at", "name", "created_at", "id"),
+        Index("ix_test_runs_station_id_created_at", "station_id", "created_at", "id"),
+        Index("ix_test_runs_procedure_id_created_at", "procedure_id", "created_at", "id"),
+    )
 
     name = Column(String, index=True)
     status = Column(Enum(TestStatus), default=TestStatus.PENDING)
-    meta_data = Column(JSON)
-    results = Column(JSON)
+    meta_data = Column(JSONType)
+    results = Column(JSONType)
     
     # Reference to the unit under test
     uut_id = Column(String, index=True)
     uut_serial = Column(String, index=True)
+
+    # Filled in from the registry (app.registry) when the run is created
+    station_id = Column(Integer, ForeignKey("stations.id"))
+    procedure_id = Column(Integer, ForeignKey("procedures.id"))
     
     # Relationships
     phases = relationship("TestPhase", back_populates="test_run")
@@ -0,0 +1,78 @@
+import base64
+import json
+from datetime import datetime
+from typing import Optional, Tuple
+from sqlalchemy import tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+
+def encode_cursor(created_at: datetime, row_id: int, direction: str = "next") -> str:
+    """Pack a (created_at, id) position into an opaque URL-safe cursor."""
+    payload = json.dumps([created_at.isoformat(), row_id, direction], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int, str]:
+    """Unpack a cursor made by encode_cursor, raising ValueError if it is malformed."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, row_id, direction = json.loads(base64.urlsafe_b64decode(padded))
+        if direction not in ("next", "prev"):
+            raise ValueError(direction)
+        return datetime.fromisoformat(created_at), int(row_id), direction
+    except (ValueError, TypeError) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+
+async def keyset_page(db: AsyncSession, query, model, limit: int, cursor: Optional[str] = None):
+    """
+    Fetch one page of the select ``query`` ordered by (created_at, id) using a seek
+    predicate instead of OFFSET, so every page costs the same index range scan.
+
+    Returns ``(rows, next_cursor, prev_cursor)``; a cursor is None when there
+    is nothing further in that direction.
+    """
+    key = tuple_(model.created_at, model.id)
+    direction = "next"
+    if cursor:
+        created_at, row_id, direction = decode_cursor(cursor)
+        position = tuple_(created_at, row_id)
+        query = query.filter(key > position if direction == "next" else key < position)
+
+    if direction == "next":
+        query = query.order_by(model.created_at, model.id)
+    else:
+        query = query.order_by(model.created_at.desc(), model.id.desc())
+
+    # Fetch one extra row to learn whether another page exists
+    rows = list((await db.scalars(query.limit(limit + 1))).all())
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    if direction == "prev":
+        rows.reverse()
+    return _page(rows, has_more, direction, cursor)
+
+
+def keyset_slice(rows: list, limit: int, cursor: Optional[str] = None):
+    """keyset_page for rows already in memory, such as ones read from the archive."""
+    rows = sorted(rows, key=lambda row: (row.created_at, row.id))
+    direction = "next"
+    if cursor:
+        created_at, row_id, direction = decode_cursor(cursor)
+        if direction == "next":
+            rows = [row for row in rows if (row.created_at, row.id) > (created_at, row_id)]
+        else:
+            rows = [row for row in rows if (row.created_at, row.id) < (created_at, row_id)]
+    has_more = len(rows) > limit
+    rows = rows[:limit] if direction == "next" else rows[-limit:]
+    return _page(rows, has_more, direction, cursor)
+
+
+def _page(rows: list, has_more: bool, direction: str, cursor: Optional[str]):
+    if not rows:
+        return rows, None, None
+    has_next = has_more if direction == "next" else True
+    has_prev = has_more if direction == "prev" else cursor is not None
+    next_cursor = encode_cursor(rows[-1].created_at, rows[-1].id, "next") if has_next else None
+    prev_cursor = encode_cursor(rows[0].created_at, rows[0].id, "prev") if has_prev else None
+    return rows, next_cursor, prev_cursor
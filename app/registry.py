@@ -0,0 +1,165 @@
+"""
+Registry of stations and procedures, held in memory.
+
+Every run is linked to its station (named in ``meta_data`` as ``station`` or
+``station_id``) and its procedure (the run name). Both tables are small and
+rarely change, so their name -> id maps are kept in memory and a run is
+linked without a query. A name not seen before is registered in the
+transaction of the run that uses it, and the map learns it once that
+transaction commits; after a rollback it is simply registered again next
+time.
+
+Changes made through the API refresh the maps. The TTL bounds how long
+changes made by other workers go unnoticed; registering a name another
+worker already registered just finds its row. Runs stored before the
+registry existed are linked by ``python -m app.registry backfill``.
+"""
+import asyncio
+import sys
+import time
+from datetime import datetime
+from typing import Dict, Iterable, Optional
+from sqlalchemy import event, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from . import compression
+from .database import AsyncSessionLocal, is_sqlite
+from .models import procedure, station, test_run
+
+BACKFILL_CHUNK = 10000
+
+
+def station_name(meta_data: Optional[dict]) -> Optional[str]:
+    """The station a run's ``meta_data`` names, if any."""
+    meta_data = meta_data or {}
+    name = meta_data.get("station") or meta_data.get("station_id")
+    return str(name) if name is not None else None
+
+
+class Registry:
+    """
+    Name -> id map of one registry table, loaded in full on first use and
+    again after ``ttl`` seconds or an invalidate(). The table is read in the
+    caller's write transaction, which may have registered names itself, so
+    a reload only replaces the map once that transaction commits. Only used
+    from the event loop thread.
+    """
+
+    def __init__(self, model, ttl: float = 300.0):
+        self.model = model
+        self.ttl = ttl
+        self._ids: Dict[str, int] = {}
+        self._expires_at = 0.0
+        self._pending_key = f"pending_{model.__tablename__}"
+        self._reload_key = f"reload_{model.__tablename__}"
+
+    def invalidate(self):
+        self._expires_at = 0.0
+
+    async def resolve(self, db: AsyncSession, names: Iterable[Optional[str]]) -> Dict[str, int]:
+        """Ids of ``names`` (None is skipped), registering the ones not seen before in ``db``'s transaction."""
+        names = {name for name in names if name is not None}
+        if not names:
+            return {}
+        info = db.sync_session.info
+        ids = info.get(self._reload_key)
+        if ids is None:
+            if self._expires_at < time.monotonic():
+                rows = await db.execute(select(self.model.name, self.model.id))
+                ids = info[self._reload_key] = dict(rows.all())
+            else:
+                ids = self._ids
+
+        pending = info.setdefault(self._pending_key, {})
+        missing = [name for name in names if name not in ids and name not in pending]
+        if missing:
+            table = self.model.__table__
+            now = datetime.utcnow()
+            stmt = (sqlite.insert if is_sqlite else postgresql.insert)(table).on_conflict_do_nothing(
+                index_elements=["name"])
+            await db.execute(stmt, [{"name": name, "created_at": now, "updated_at": now} for name in missing])
+            rows = await db.execute(select(self.model.name, self.model.id).where(self.model.name.in_(missing)))
+            pending.update(rows.all())
+        return {name: ids.get(name) or pending[name] for name in names}
+
+    def _commit(self, session: Session):
+        ids = session.info.pop(self._reload_key, None)
+        if ids is not None:
+            self._ids = ids
+            self._expires_at = time.monotonic() + self.ttl
+        pending = session.info.pop(self._pending_key, None)
+        if pending:
+            self._ids.update(pending)
+
+    def _discard(self, session: Session):
+        session.info.pop(self._reload_key, None)
+        session.info.pop(self._pending_key, None)
+
+
+stations = Registry(station.Station)
+procedures = Registry(procedure.Procedure)
+
+
+async def link_runs(db: AsyncSession, runs: Iterable[dict]):
+    """Set ``station_id`` and ``procedure_id`` on run rows (dicts with ``name`` and ``meta_data``)."""
+    runs = list(runs)
+    station_ids = await stations.resolve(db, (station_name(run.get("meta_data")) for run in runs))
+    procedure_ids = await procedures.resolve(db, (run.get("name") for run in runs))
+    for run in runs:
+        run["station_id"] = station_ids.get(station_name(run.get("meta_data")))
+        run["procedure_id"] = procedure_ids.get(run.get("name"))
+
+
+@event.listens_for(Session, "after_commit")
+def _commit_pending(session: Session):
+    stations._commit(session)
+    procedures._commit(session)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_pending(session: Session):
+    stations._discard(session)
+    procedures._discard(session)
+
+
+async def backfill(db: AsyncSession) -> int:
+    """
+    Link the runs that have no procedure yet to their station and
+    procedure, committing every BACKFILL_CHUNK runs. Returns how many runs
+    were looked at.
+    """
+    TestRun = test_run.TestRun
+    done = 0
+    last_id = 0
+    while True:
+        rows = (await db.execute(
+            select(TestRun.id, TestRun.name, TestRun.meta_data)
+            .where(TestRun.procedure_id.is_(None), TestRun.id > last_id)
+            .order_by(TestRun.id).limit(BACKFILL_CHUNK)
+        )).all()
+        if not rows:
+            return done
+        runs = [{"id": run_id, "name": name, "meta_data": meta_data} for run_id, name, meta_data in rows]
+        await link_runs(db, runs)
+        await db.execute(update(TestRun), [
+            {"id": run["id"], "station_id": run["station_id"], "procedure_id": run["procedure_id"]} for run in runs
+        ])
+        await db.commit()
+        done += len(rows)
+        last_id = rows[-1].id
+
+
+async def _backfill_command():
+    compression.dictionaries.load()
+    async with AsyncSessionLocal() as db:
+        runs = await backfill(db)
+    print(f"Linked {runs} runs to their stations and procedures")
+
+
+if __name__ == "__main__":
+    if sys.argv[1:] != ["backfill"]:
+        print("Usage: python -m app.registry backfill")
+        sys.exit(1)
+    asyncio.run(_backfill_command())
@@ -0,0 +1,194 @@
+"""
+Incrementally maintained rollups of runs and phases per hour and day.
+
+The write paths call record_runs / record_phases / move_run inside their own
+transaction. Those only collect deltas on the session; the deltas are summed
+and upserted once, just before the transaction commits, so a writer batch of
+many phases costs a few rollup rows rather than one upsert per phase, and the
+rollups always agree with the rows they summarize. Run
+``python -m app.rollups rebuild`` to recompute them from scratch, e.g. after
+upgrading an existing database; archived runs are read back from the
+archive for that.
+"""
+import asyncio
+import math
+import sys
+from collections import defaultdict
+from datetime import datetime
+from typing import Iterable, Optional, Tuple
+from sqlalchemy import delete, event, insert, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from . import archive
+from .database import AsyncSessionLocal, is_sqlite
+from .models import archived_run, rollup, test_phase, test_run
+
+GRANULARITIES = ("hour", "day")
+REBUILD_CHUNK = 10000
+RUN_KEYS = ["granularity", "bucket_start", "run_name", "status"]
+PHASE_KEYS = ["granularity", "bucket_start", "run_name", "phase_name", "status"]
+PHASE_SUMS = ["count", "duration_count", "duration_sum", "duration_sumsq"]
+
+# (created_at, run name, status) and (created_at, run name, phase name, status, duration)
+RunRow = Tuple[datetime, str, str]
+PhaseRow = Tuple[datetime, str, str, str, Optional[float]]
+
+
+def bucket_start(ts: datetime, granularity: str) -> datetime:
+    ts = ts.replace(minute=0, second=0, microsecond=0)
+    return ts.replace(hour=0) if granularity == "day" else ts
+
+
+def _upsert(table, keys, sums):
+    """INSERT that adds ``sums`` onto an existing row with the same ``keys``."""
+    stmt = (sqlite.insert if is_sqlite else postgresql.insert)(table)
+    return stmt.on_conflict_do_update(
+        index_elements=keys,
+        set_={column: table.c[column] + stmt.excluded[column] for column in sums},
+    )
+
+
+def _add_runs(counts: dict, rows: Iterable[RunRow], delta: int):
+    for created_at, run_name, status in rows:
+        for granularity in GRANULARITIES:
+            counts[(granularity, bucket_start(created_at, granularity), run_name or "", status)] += delta
+
+
+def _add_phases(sums: dict, rows: Iterable[PhaseRow]):
+    for created_at, run_name, phase_name, status, duration in rows:
+        for granularity in GRANULARITIES:
+            entry = sums[(granularity, bucket_start(created_at, granularity), run_name or "", phase_name or "", status)]
+            entry[0] += 1
+            if duration is not None:
+                entry[1] += 1
+                entry[2] += duration
+                entry[3] += duration * duration
+
+
+def _new_sums():
+    return defaultdict(int), defaultdict(lambda: [0, 0, 0.0, 0.0])
+
+
+def _run_params(counts: dict) -> list:
+    return [dict(zip(RUN_KEYS, key), count=n) for key, n in counts.items() if n]
+
+
+def _phase_params(sums: dict) -> list:
+    return [dict(zip(PHASE_KEYS, key), **dict(zip(PHASE_SUMS, values))) for key, values in sums.items()]
+
+
+def _pending(db: AsyncSession):
+    return db.sync_session.info.setdefault("pending_rollups", _new_sums())
+
+
+def record_runs(db: AsyncSession, rows: Iterable[RunRow]):
+    """Count new runs into their buckets when ``db`` commits."""
+    _add_runs(_pending(db)[0], rows, 1)
+
+
+def record_phases(db: AsyncSession, rows: Iterable[PhaseRow]):
+    """Count new phases and their durations into their buckets when ``db`` commits."""
+    _add_phases(_pending(db)[1], rows)
+
+
+def move_run(db: AsyncSession, run: test_run.TestRun, previous: test_run.TestStatus):
+    """Move a run whose status changed from ``previous`` to its current status."""
+    if run.status == previous:
+        return
+    counts = _pending(db)[0]
+    _add_runs(counts, [(run.created_at, run.name, previous.value)], -1)
+    _add_runs(counts, [(run.created_at, run.name, run.status.value)], 1)
+
+
+@event.listens_for(Session, "before_commit")
+def _write_pending(session: Session):
+    pending = session.info.pop("pending_rollups", None)
+    if pending is None:
+        return
+    run_params = _run_params(pending[0])
+    phase_params = _phase_params(pending[1])
+    if run_params:
+        session.execute(_upsert(rollup.RunRollup.__table__, RUN_KEYS, ["count"]), run_params)
+    if phase_params:
+        session.execute(_upsert(rollup.PhaseRollup.__table__, PHASE_KEYS, PHASE_SUMS), phase_params)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_pending(session: Session):
+    session.info.pop("pending_rollups", None)
+
+
+def duration_stats(count: int, total: float, total_sq: float) -> Tuple[Optional[float], Optional[float]]:
+    """(mean, sample std) from a rollup's duration moments."""
+    if not count:
+        return None, None
+    mean = total / count
+    if count < 2:
+        return mean, None
+    return mean, math.sqrt(max(total_sq - total * mean, 0.0) / (count - 1))
+
+
+async def rebuild(db: AsyncSession):
+    """
+    Recompute both rollup tables from test_runs and test_phases, and from the
+    runs and phases moved to the archive.
+
+    Rows are streamed in chunks, and the archive read one partition at a
+    time, and summed in memory, so memory grows with the number of buckets
+    rather than the number of runs and phases. Run it while
+    nothing else is writing: on SQLite it holds the write lock throughout, and
+    on PostgreSQL concurrent writes could be counted twice or not at all.
+    """
+    TestRun, TestPhase = test_run.TestRun, test_phase.TestPhase
+    await db.execute(delete(rollup.RunRollup))
+    await db.execute(delete(rollup.PhaseRollup))
+
+    run_counts, phase_sums = _new_sums()
+    result = await db.stream(
+        select(TestRun.created_at, TestRun.name, TestRun.status).execution_options(yield_per=REBUILD_CHUNK))
+    async for rows in result.partitions():
+        _add_runs(run_counts, ((c, name, s.value) for c, name, s in rows if c and s), 1)
+
+    result = await db.stream(
+        select(TestPhase.created_at, TestRun.name, TestPhase.name, TestPhase.status, TestPhase.duration)
+        .join(TestRun, TestRun.id == TestPhase.test_run_id)
+        .execution_options(yield_per=REBUILD_CHUNK))
+    async for rows in result.partitions():
+        _add_phases(phase_sums, ((c, run_name, name, s.value, d) for c, run_name, name, s, d in rows if c and s))
+
+    ArchivedRun = archived_run.ArchivedRun
+    for month, run_name in (await db.execute(select(ArchivedRun.month, ArchivedRun.run_name).distinct())).all():
+        run_ids = set((await db.scalars(select(ArchivedRun.id).where(
+            ArchivedRun.month == month, ArchivedRun.run_name.is_not_distinct_from(run_name)))).all())
+        rows = await asyncio.to_thread(archive.read_partition_columns, archive.RUNS, month, run_name, run_ids,
+                                       ["created_at", "status"])
+        _add_runs(run_counts, ((r["created_at"], run_name, r["status"]) for r in rows
+                               if r["created_at"] and r["status"]), 1)
+        rows = await asyncio.to_thread(archive.read_partition_columns, archive.PHASES, month, run_name, run_ids,
+                                       ["created_at", "name", "status", "duration"])
+        _add_phases(phase_sums, ((r["created_at"], run_name, r["name"], r["status"], r["duration"]) for r in rows
+                                 if r["created_at"] and r["status"]))
+
+    run_params = _run_params(run_counts)
+    phase_params = _phase_params(phase_sums)
+    if run_params:
+        await db.execute(insert(rollup.RunRollup), run_params)
+    if phase_params:
+        await db.execute(insert(rollup.PhaseRollup), phase_params)
+    return len(run_params), len(phase_params)
+
+
+async def _rebuild_command():
+    async with AsyncSessionLocal() as db:
+        runs, phases = await rebuild(db)
+        await db.commit()
+    print(f"Rebuilt {runs} run rollups and {phases} phase rollups")
+
+
+if __name__ == "__main__":
+    if sys.argv[1:] != ["rebuild"]:
+        print("Usage: python -m app.rollups rebuild")
+        sys.exit(1)
+    asyncio.run(_rebuild_command())
@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List, Literal
 from datetime import datetime
 from enum import Enum
 
@@ -10,6 +10,14 @@ class TestStatus(str, Enum):
     FAILED = "failed"
     ERROR = "error"
 
+class PhaseStatus(str, Enum):
+    PENDING = "pending"
+    RUNNING = "running"
+    PASSED = "passed"
+    FAILED = "failed"
+    SKIPPED = "skipped"
+    ERROR = "error"
+
 class TestRunBase(BaseModel):
     name: str
     uut_id: Optional[str] = None
@@ -23,6 +31,8 @@ class TestRun(TestRunBase):
     id: int
     status: TestStatus
     results: Optional[Dict[str, Any]] = None
+    station_id: Optional[int] = None
+    procedure_id: Optional[int] = None
     created_at: datetime
     updated_at: datetime
 
@@ -39,12 +49,176 @@ class TestPhaseCreate(TestPhaseBase):
     test_run_id: int
     status: str = "PENDING"  # Allow string status values
 
+class TestPhaseBulkCreate(TestPhaseBase):
+    status: str = "PENDING"
+
+class TestRunBulkCreate(TestRunCreate):
+    phases: List[TestPhaseBulkCreate] = []
+
+class AttachmentImport(BaseModel):
+    filename: str
+    content_type: Optional[str] = None
+    description: Optional[str] = None
+    file_path: Optional[str] = None
+    data: Optional[str] = None  # Base64
+    file_size: Optional[int] = None
+
+class TestPhaseImport(TestPhaseBulkCreate):
+    created_at: Optional[datetime] = None
+    attachments: Optional[List[AttachmentImport]] = None
+
+class TestRunImport(TestRunCreate):
+    """A run in a POST /ingest body, which may carry what a finished report has."""
+    status: Optional[str] = None
+    created_at: Optional[datetime] = None
+    results: Optional[Dict[str, Any]] = None
+    phases: List[TestPhaseImport] = []
+    attachments: Optional[List[AttachmentImport]] = None
+
+class BulkCreateResponse(BaseModel):
+    ids: List[int]
+
+class IngestResponse(BaseModel):
+    runs: int
+    chunks: int
+
 class TestPhase(TestPhaseBase):
     id: int
-    status: TestStatus
+    status: PhaseStatus
     test_run_id: int
     created_at: datetime
     updated_at: datetime
 
     class Config:
-        from_attributes = True 
\ No newline at end of file
+        from_attributes = True
+
+class Attachment(BaseModel):
+    id: int
+    filename: str
+    content_type: Optional[str] = None
+    file_size: Optional[int] = None
+    sha256: Optional[str] = None
+    description: Optional[str] = None
+    test_run_id: Optional[int] = None
+    phase_id: Optional[int] = None
+    created_at: datetime
+
+    class Config:
+        from_attributes = True
+
+class TestPhaseDetail(TestPhase):
+    attachments: Optional[List[Attachment]] = None
+
+class TestRunDetail(TestRun):
+    phases: Optional[List[TestPhaseDetail]] = None
+    attachments: Optional[List[Attachment]] = None
+
+
+class YieldBucket(BaseModel):
+    start: datetime
+    samples: int
+    runs: int
+    first_pass_yield: Optional[float] = None
+
+class MeasurementStats(BaseModel):
+    name: str
+    count: int
+    mean: Optional[float] = None
+    std: Optional[float] = None
+    min: Optional[float] = None
+    max: Optional[float] = None
+    percentiles: Dict[str, float] = {}
+    low_limit: Optional[float] = None
+    high_limit: Optional[float] = None
+    cp: Optional[float] = None
+    cpk: Optional[float] = None
+    bucket: str
+    buckets: List[YieldBucket] = []
+
+class RunRollup(BaseModel):
+    bucket_start: datetime
+    run_name: str
+    status: str
+    count: int
+
+class PhaseRollup(BaseModel):
+    bucket_start: datetime
+    run_name: str
+    phase_name: str
+    status: str
+    count: int
+    duration_count: int
+    mean_duration: Optional[float] = None
+    std_duration: Optional[float] = None
+
+class MeasurementSpecBase(BaseModel):
+    name: str
+    unit: Optional[str] = None
+    low_limit: Optional[float] = None
+    high_limit: Optional[float] = None
+    comparator: Literal["GELE", "GTLT", "GELT", "GTLE", "LOG"] = "GELE"
+
+class MeasurementSpecCreate(MeasurementSpecBase):
+    pass
+
+class MeasurementSpec(MeasurementSpecBase):
+    id: int
+    procedure_id: int
+    created_at: datetime
+    updated_at: datetime
+
+    class Config:
+        from_attributes = True
+
+class StationBase(BaseModel):
+    name: str
+    description: Optional[str] = None
+    location: Optional[str] = None
+
+class StationCreate(StationBase):
+    pass
+
+class Station(StationBase):
+    id: int
+    created_at: datetime
+    updated_at: datetime
+
+    class Config:
+        from_attributes = True
+
+class ProcedureBase(BaseModel):
+    name: str
+    description: Optional[str] = None
+    version: Optional[str] = None
+
+class ProcedureCreate(ProcedureBase):
+    pass
+
+class Procedure(ProcedureBase):
+    id: int
+    created_at: datetime
+    updated_at: datetime
+
+    class Config:
+        from_attributes = True
+
+class LiveMetrics(BaseModel):
+    window_seconds: int
+    runs_started: int
+    runs_finished: int
+    runs_failed: int
+    runs_per_minute: float
+    failure_rate: Optional[float] = None
+    phases: int
+    phases_failed: int
+    phase_failure_rate: Optional[float] = None
+    phase_duration_percentiles: Dict[str, float] = {}
+    last_activity: Optional[datetime] = None
+
+class ProcedureLiveMetrics(LiveMetrics):
+    procedure_id: int
+
+class StationLiveMetrics(LiveMetrics):
+    station_id: int
+    name: str
+    procedures: List[ProcedureLiveMetrics] = []
@@ -0,0 +1,172 @@
+"""
+Server-side evaluation of measurements against the specs of their procedure.
+
+A procedure (see ``app.registry``) declares a spec for each of its
+measurements: unit, limits and how the limits compare. When phases are
+reported for a run, the measurements that have a spec are checked on the
+server instead of trusting the client's verdict: each gets ``status`` PASS
+or FAIL, and ``unit`` and ``limits`` from the spec, and the phase status
+follows from the result. Specs belong to the procedure's id, so they stay
+with it when it is renamed.
+
+Specs are compiled per procedure into arrays and cached, and the
+measurements of all phases in a write are compared in one vectorized pass.
+"""
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .models import measurement_spec
+
+# Comparator -> whether the low and the high limit are inclusive. A missing
+# limit is unbounded on that side; LOG measurements are recorded but never
+# fail. An exact value is GELE with equal limits.
+COMPARATORS: Dict[str, Optional[Tuple[bool, bool]]] = {
+    "GELE": (True, True),
+    "GTLT": (False, False),
+    "GELT": (True, False),
+    "GTLE": (False, True),
+    "LOG": None,
+}
+
+
+class CompiledSpecs:
+    """The specs of one procedure as arrays indexed by measurement."""
+
+    __slots__ = ("index", "units", "verdicts", "low", "high", "low_inclusive", "high_inclusive", "logged")
+
+    def __init__(self, specs: Sequence[measurement_spec.MeasurementSpec]):
+        self.index = {spec.name: i for i, spec in enumerate(specs)}
+        self.units = [spec.unit for spec in specs]
+        # The fields each measurement gets when it fails and when it passes
+        self.verdicts = ([], [])
+        for spec in specs:
+            fields = {
+                "limits": {key: limit for key, limit in (("min", spec.low_limit), ("max", spec.high_limit))
+                           if limit is not None},
+                "comparator": spec.comparator,
+            }
+            self.verdicts[0].append({**fields, "status": "FAIL"})
+            self.verdicts[1].append({**fields, "status": "PASS"})
+        bounds = [COMPARATORS[spec.comparator] or (True, True) for spec in specs]
+        self.low = np.array([-np.inf if spec.low_limit is None else spec.low_limit for spec in specs])
+        self.high = np.array([np.inf if spec.high_limit is None else spec.high_limit for spec in specs])
+        self.low_inclusive = np.array([low for low, _ in bounds], dtype=bool)
+        self.high_inclusive = np.array([high for _, high in bounds], dtype=bool)
+        self.logged = np.array([COMPARATORS[spec.comparator] is None for spec in specs], dtype=bool)
+
+    def passed(self, spec: np.ndarray, values: np.ndarray) -> np.ndarray:
+        """Whether each value is within the limits of the spec at the same position. NaN fails."""
+        low, high = self.low[spec], self.high[spec]
+        above = np.where(self.low_inclusive[spec], values >= low, values > low)
+        below = np.where(self.high_inclusive[spec], values <= high, values < high)
+        return (above & below) | self.logged[spec]
+
+
+def _as_value(value) -> float:
+    if type(value) is float or type(value) is int:
+        return value
+    if value is None or isinstance(value, bool):
+        return np.nan
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def evaluate(specs: CompiledSpecs, phases: List[dict]):
+    """
+    Check the measurements of ``phases`` (TestPhaseCreate-shaped dicts) that
+    have a spec, updating them in place. A phase with a failed measurement
+    that was reported PENDING, RUNNING or PASSED becomes FAILED; a PENDING
+    phase whose checked measurements all pass becomes PASSED.
+    """
+    index, units = specs.index, specs.units
+    entries = []  # Measurement dicts with a spec
+    phase_numbers = []
+    spec_numbers = []
+    values = []
+    for number, phase in enumerate(phases):
+        measurements = phase.get("measurements")
+        if not isinstance(measurements, dict):
+            continue
+        for name, data in measurements.items():
+            i = index.get(name)
+            if i is None:
+                continue
+            if type(data) is not dict:
+                data = measurements[name] = {"value": data}
+            value = _as_value(data.get("value"))
+            unit = data.get("unit")
+            if unit is None:
+                if units[i] is not None:
+                    data["unit"] = units[i]
+            elif unit != units[i] and units[i] is not None:
+                # In the wrong unit the value can't be compared with the limits
+                value = np.nan
+            entries.append(data)
+            phase_numbers.append(number)
+            spec_numbers.append(i)
+            values.append(value)
+    if not entries:
+        return
+
+    passed = specs.passed(np.array(spec_numbers, dtype=np.intp), np.array(values, dtype=np.float64))
+    verdicts = specs.verdicts
+    for data, i, ok in zip(entries, spec_numbers, passed.tolist()):
+        data.update(verdicts[ok][i])
+
+    phase_numbers = np.array(phase_numbers, dtype=np.intp)
+    failed = set(np.unique(phase_numbers[~passed]).tolist())
+    for number in np.unique(phase_numbers).tolist():
+        phase = phases[number]
+        status = (phase.get("status") or "PENDING").upper()
+        if number in failed:
+            if status in ("PENDING", "RUNNING", "PASSED"):
+                phase["status"] = "FAILED"
+        elif status == "PENDING":
+            phase["status"] = "PASSED"
+
+
+class SpecCache:
+    """
+    Compiled specs by procedure id, including the procedures that have none.
+
+    Changes made through this process invalidate their procedure; the TTL
+    bounds how long changes made elsewhere go unnoticed. Only used from the
+    event loop thread.
+    """
+
+    def __init__(self, ttl: float = 30.0):
+        self.ttl = ttl
+        self._entries: Dict[int, Tuple[float, Optional[CompiledSpecs]]] = {}
+
+    async def get(self, db: AsyncSession, procedure_id: int) -> Optional[CompiledSpecs]:
+        entry = self._entries.get(procedure_id)
+        if entry is not None and entry[0] > time.monotonic():
+            return entry[1]
+        model = measurement_spec.MeasurementSpec
+        specs = (await db.scalars(select(model).where(model.procedure_id == procedure_id).order_by(model.id))).all()
+        compiled = CompiledSpecs(specs) if specs else None
+        self._entries[procedure_id] = (time.monotonic() + self.ttl, compiled)
+        return compiled
+
+    def invalidate(self, procedure_id: int):
+        self._entries.pop(procedure_id, None)
+
+    def clear(self):
+        self._entries.clear()
+
+
+spec_cache = SpecCache()
+
+
+async def apply(db: AsyncSession, procedure_id: Optional[int], phases: List[dict]):
+    """Evaluate ``phases`` of a run of procedure ``procedure_id`` against its specs, if it has any."""
+    if not phases or procedure_id is None:
+        return
+    specs = await spec_cache.get(db, procedure_id)
+    if specs is not None:
+        evaluate(specs, phases)
@@ -0,0 +1,135 @@
+import asyncio
+import os
+from typing import Any, Awaitable, Callable, List, Optional, Tuple
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .database import AsyncSessionLocal, is_sqlite
+
+WriteJob = Callable[[AsyncSession], Awaitable[Any]]
+
+
+class WriteQueue:
+    """
+    Serializes database writes through a single writer task.
+
+    SQLite allows one writer at a time, so concurrent requests that each
+    commit on their own spend their time waiting for the lock and paying an
+    fsync each. Here requests submit a job (an async function taking a
+    session) and await its result, while the writer drains whatever has
+    queued up and commits it as one transaction. If a job in a batch fails,
+    the batch is rolled back and its jobs are retried one per transaction so
+    only the failing job sees the error.
+
+    Jobs must flush their own changes and leave post-commit work (cache
+    invalidation, events) to the caller. If the writer task stops without
+    being closed, e.g. cancelled at shutdown, the jobs it hasn't committed
+    fail, and so do later submissions. When disabled, each job simply runs
+    in its own session and commits, which is what servers with real
+    concurrent writers such as PostgreSQL want.
+    """
+
+    def __init__(self, session_factory, enabled: bool = True, max_batch: int = 64):
+        self.session_factory = session_factory
+        self.enabled = enabled
+        self.max_batch = max_batch
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._closing = False
+
+    async def submit(self, job: WriteJob) -> Any:
+        """Run ``job`` in a write transaction and return its result once committed."""
+        if not self.enabled:
+            async with self.session_factory() as session:
+                result = await job(session)
+                await session.commit()
+                return result
+
+        self._ensure_running()
+        future = self._loop.create_future()
+        await self._queue.put((job, future))
+        return await future
+
+    async def close(self):
+        """Finish queued jobs and stop the writer task."""
+        if self._task is None or self._task.done():
+            return
+        self._closing = True
+        await self._queue.put(None)
+        try:
+            await self._task
+        finally:
+            self._closing = False
+            self._task = None
+
+    def _ensure_running(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is loop and self._closing:
+            raise RuntimeError("The writer is closing")
+        if self._loop is loop and self._task is not None and self._task.done():
+            raise RuntimeError("The writer task has stopped")
+        if self._task is None or self._loop is not loop:
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._task = loop.create_task(self._run())
+
+    async def _run(self):
+        batch = []
+        try:
+            while True:
+                item = await self._queue.get()
+                if item is None:
+                    return
+                batch = [item]
+                stop = False
+                while len(batch) < self.max_batch and not self._queue.empty():
+                    item = self._queue.get_nowait()
+                    if item is None:
+                        stop = True
+                        break
+                    batch.append(item)
+                await self._commit_batch(batch)
+                batch = []
+                if stop:
+                    return
+        finally:
+            # Whatever wasn't committed, including jobs queued behind the
+            # stop, would otherwise be awaited forever
+            while not self._queue.empty():
+                item = self._queue.get_nowait()
+                if item is not None:
+                    batch.append(item)
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(RuntimeError("The writer stopped before the write was committed"))
+
+    async def _commit_batch(self, batch: List[Tuple[WriteJob, asyncio.Future]]):
+        retry_separately = False
+        async with self.session_factory() as session:
+            try:
+                results = [await job(session) for job, _ in batch]
+                await session.commit()
+            except Exception as e:
+                await session.rollback()
+                if len(batch) > 1:
+                    retry_separately = True
+                else:
+                    _, future = batch[0]
+                    if not future.done():
+                        future.set_exception(e)
+                    return
+
+        if retry_separately:
+            for item in batch:
+                await self._commit_batch([item])
+            return
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+
+writer = WriteQueue(
+    AsyncSessionLocal,
+    enabled=is_sqlite,
+    max_batch=int(os.environ.get("NOTTOFU_WRITE_BATCH", 64)),
+)
@@ -0,0 +1,45 @@
+"""
+Shared setup for the benchmark scripts.
+
+The app reads its configuration from the environment when it is imported,
+so ``use_temp_database()`` must run before anything from ``app`` is imported.
+"""
+import os
+import sys
+import tempfile
+import time
+from typing import Callable, Optional
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def use_temp_database(url: Optional[str] = None) -> str:
+    """
+    Point the app at ``url``, or at a SQLite file in a fresh temporary
+    directory, put the repo on ``sys.path`` and return the database URL.
+    Blobs and archives go to the same temporary directory.
+    """
+    directory = tempfile.mkdtemp(prefix="nottofu-bench-")
+    url = url or f"sqlite:///{os.path.join(directory, 'NotTofu.db')}"
+    os.environ["NOTTOFU_DATABASE_URL"] = url
+    os.environ.setdefault("NOTTOFU_BLOB_DIR", os.path.join(directory, "blobs"))
+    os.environ.setdefault("NOTTOFU_ARCHIVE_DIR", os.path.join(directory, "archive"))
+    if REPO_ROOT not in sys.path:
+        sys.path.insert(0, REPO_ROOT)
+    return url
+
+
+def create_schema():
+    from app.database import engine
+    from app.models import Base
+    Base.metadata.create_all(engine)
+
+
+def best_of(repeat: int, fn: Callable[[], object]) -> float:
+    """The fastest of ``repeat`` timed calls of ``fn``, in seconds."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
@@ -0,0 +1,48 @@
+"""
+Runs created per second one request per run and phase versus through
+POST /runs/bulk, against an in-process app on a temporary SQLite database.
+
+    python benchmarks/bulk_ingest.py [--runs 500] [--phases 5] [--batch 100]
+"""
+import argparse
+import time
+
+import _setup
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=500)
+    parser.add_argument("--phases", type=int, default=5, help="phases per run")
+    parser.add_argument("--batch", type=int, default=100, help="runs per bulk request")
+    parser.add_argument("--database-url", help="defaults to a temporary SQLite file")
+    args = parser.parse_args()
+
+    _setup.use_temp_database(args.database_url)
+    _setup.create_schema()
+    from fastapi.testclient import TestClient
+    from app.main import app
+
+    phases = [{"name": f"phase {i}", "status": "PASSED", "measurements": {"v": {"value": i}}}
+              for i in range(args.phases)]
+    with TestClient(app) as client:
+        start = time.perf_counter()
+        for _ in range(args.runs):
+            run_id = client.post("/runs/", json={"name": "Board test"}).json()["id"]
+            for phase in phases:
+                client.post("/phases/", json={**phase, "test_run_id": run_id}).raise_for_status()
+        per_row = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for offset in range(0, args.runs, args.batch):
+            runs = [{"name": "Board test", "phases": phases}] * min(args.batch, args.runs - offset)
+            client.post("/runs/bulk", json=runs).raise_for_status()
+        bulk = time.perf_counter() - start
+
+    print(f"{args.runs} runs x {args.phases} phases")
+    print(f"per-row: {args.runs / per_row:,.0f} runs/s")
+    print(f"bulk:    {args.runs / bulk:,.0f} runs/s ({args.batch} runs per request)")
+
+
+if __name__ == "__main__":
+    main()
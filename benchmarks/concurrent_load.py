@@ -0,0 +1,138 @@
+"""
+Latency and throughput of the API under many concurrent clients issuing a
+mix of phase posts, filtered run listings and run detail requests.
+
+By default a uvicorn server is started on a temporary SQLite database
+seeded with ``--seed-runs`` runs, with the response cache off so every
+request reaches the database. Pass ``--url`` to load an already running
+server instead, e.g. one started from an older checkout for comparison.
+
+    python benchmarks/concurrent_load.py [--clients 200] [--requests 1000]
+"""
+import argparse
+import asyncio
+import os
+import random
+import subprocess
+import sys
+import time
+from datetime import datetime, timedelta
+
+import httpx
+
+import _setup
+
+
+def seed(n_runs: int):
+    from sqlalchemy import insert
+    from app.database import engine
+    from app.models import test_phase, test_run
+
+    start = datetime.utcnow() - timedelta(seconds=n_runs)
+    with engine.begin() as conn:
+        conn.execute(insert(test_run.TestRun), [
+            {"name": f"Board test {i % 10}", "uut_serial": f"SN-{i}", "status": "PASSED",
+             "created_at": start + timedelta(seconds=i), "updated_at": start}
+            for i in range(n_runs)
+        ])
+        conn.execute(insert(test_phase.TestPhase), [
+            {"test_run_id": run_id, "name": f"phase {j}", "status": "PASSED",
+             "created_at": start, "updated_at": start}
+            for run_id in range(1, n_runs + 1, 10) for j in range(5)
+        ])
+
+
+def start_server(port: int) -> subprocess.Popen:
+    env = {**os.environ, "NOTTOFU_CACHE_SIZE": "0"}
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=_setup.REPO_ROOT, env=env,
+    )
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            httpx.get(f"http://127.0.0.1:{port}/", timeout=1)
+            return server
+        except httpx.TransportError:
+            time.sleep(0.2)
+    server.kill()
+    raise RuntimeError("The server didn't start")
+
+
+def request_mix(n_requests: int, n_runs: int):
+    """(method, path, json) of each request, a third of each kind."""
+    requests = []
+    for i in range(n_requests):
+        run_id = random.randint(1, n_runs)
+        kind = i % 3
+        if kind == 0:
+            requests.append(("POST", "/phases/", {"test_run_id": run_id, "name": "load", "status": "PASSED"}))
+        elif kind == 1:
+            requests.append(("GET", f"/runs/?status=PASSED&name_prefix=Board%20test%20{run_id % 10}&limit=50", None))
+        else:
+            requests.append(("GET", f"/runs/{run_id}?include=phases", None))
+    return requests
+
+
+async def load(url: str, requests, n_clients: int):
+    queue = asyncio.Queue()
+    for request in requests:
+        queue.put_nowait(request)
+    latencies, errors = [], []
+
+    async def client_loop(client: httpx.AsyncClient):
+        while not queue.empty():
+            method, path, body = queue.get_nowait()
+            start = time.perf_counter()
+            try:
+                response = await client.request(method, path, json=body)
+                if response.status_code >= 400:
+                    errors.append(f"{method} {path}: {response.status_code}")
+            except httpx.HTTPError as e:
+                errors.append(f"{method} {path}: {e!r}")
+            latencies.append(time.perf_counter() - start)
+
+    limits = httpx.Limits(max_connections=n_clients)
+    async with httpx.AsyncClient(base_url=url, timeout=120, limits=limits) as client:
+        start = time.perf_counter()
+        await asyncio.gather(*(client_loop(client) for _ in range(n_clients)))
+        elapsed = time.perf_counter() - start
+    return elapsed, sorted(latencies), errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--clients", type=int, default=200)
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--seed-runs", type=int, default=20_000)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--url", help="load this server instead of starting one; it must hold --seed-runs runs")
+    args = parser.parse_args()
+
+    server = None
+    url = args.url
+    if url is None:
+        _setup.use_temp_database()
+        _setup.create_schema()
+        seed(args.seed_runs)
+        server = start_server(args.port)
+        url = f"http://127.0.0.1:{args.port}"
+    try:
+        elapsed, latencies, errors = asyncio.run(load(url, request_mix(args.requests, args.seed_runs), args.clients))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    def percentile(p):
+        return latencies[min(int(len(latencies) * p / 100), len(latencies) - 1)]
+
+    print(f"{args.requests} requests from {args.clients} clients in {elapsed:.1f} s "
+          f"({args.requests / elapsed:,.0f} requests/s), {len(errors)} errors")
+    print(f"p50 {percentile(50) * 1000:,.0f} ms, p99 {percentile(99) * 1000:,.0f} ms")
+    for error in errors[:10]:
+        print(" ", error)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Cost of checking measurements against procedure specs on the server.
+
+First specs.evaluate on its own, against checking each measurement in turn
+with the scalar helpers the ingest path used before. Then phases/s end to
+end through POST /runs/{id}/phases/bulk, for a procedure with specs and for
+one without, against an in-process app on a temporary SQLite database.
+
+    python benchmarks/measurement_specs.py [--measurements 120] [--specs 150]
+"""
+import argparse
+import copy
+import random
+import time
+from types import SimpleNamespace
+
+import _setup
+
+
+def spec_rows(n_specs: int):
+    return [{"name": f"m{i}", "unit": "V", "low_limit": 0.0, "high_limit": 1.0, "comparator": "GELE"}
+            for i in range(n_specs)]
+
+
+def phases(n_phases: int, n_measurements: int):
+    # About 5% of the values fall above the high limit
+    return [{"name": f"phase {j}", "status": "PENDING",
+             "measurements": {f"m{i}": {"value": random.random() * 1.05, "unit": "V"} for i in range(n_measurements)}}
+            for j in range(n_phases)]
+
+
+def evaluation(args):
+    from app import ingest, specs
+
+    spec_list = [SimpleNamespace(**row) for row in spec_rows(args.specs)]
+    compiled = specs.CompiledSpecs(spec_list)
+
+    def per_measurement(batch):
+        for phase in batch:
+            for name, data in phase["measurements"].items():
+                spec = spec_list[compiled.index[name]]
+                value = ingest._as_float(data["value"])
+                passed = ingest._measurement_passed(None, value, spec.low_limit, spec.high_limit)
+                data.update({"status": "PASS" if passed else "FAIL", "comparator": spec.comparator, "unit": spec.unit,
+                             "limits": {"min": spec.low_limit, "max": spec.high_limit}})
+
+    batch = phases(200, args.measurements)
+    for name, check in (("vectorized", lambda b: specs.evaluate(compiled, b)), ("per-measurement", per_measurement)):
+        copies = [copy.deepcopy(batch) for _ in range(args.repeat)]
+        best = _setup.best_of(args.repeat, lambda: check(copies.pop()))
+        print(f"evaluation, {name:<15}: {len(batch) / best:,.0f} phases/s ({best / len(batch) * 1e6:.0f} us/phase)")
+
+
+def end_to_end(args):
+    from fastapi.testclient import TestClient
+    from app.main import app
+
+    with TestClient(app) as client:
+        procedure_id = client.post("/procedures/", json={"name": "With specs"}).json()["id"]
+        client.put(f"/procedures/{procedure_id}/specs", json=spec_rows(args.specs)).raise_for_status()
+        for procedure in ("With specs", "Without specs"):
+            run_id = client.post("/runs/", json={"name": procedure}).json()["id"]
+            client.post(f"/runs/{run_id}/phases/bulk", json=phases(args.batch, args.measurements)).raise_for_status()
+            batches = [phases(args.batch, args.measurements) for _ in range(args.requests)]
+            start = time.perf_counter()
+            for batch in batches:
+                client.post(f"/runs/{run_id}/phases/bulk", json=batch).raise_for_status()
+            elapsed = time.perf_counter() - start
+            print(f"end to end, {procedure.lower():<13}: {args.batch * args.requests / elapsed:,.0f} phases/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--measurements", type=int, default=120, help="measurements per phase")
+    parser.add_argument("--specs", type=int, default=150, help="specs of the procedure")
+    parser.add_argument("--batch", type=int, default=50, help="phases per request")
+    parser.add_argument("--requests", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    _setup.use_temp_database()
+    _setup.create_schema()
+    print(f"{args.measurements} measurements per phase, {args.specs} specs")
+    evaluation(args)
+    end_to_end(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Latency of GET /analytics/measurements/{name} over one measurement's full
+history, against an in-process app on a temporary SQLite database.
+
+The first request reads every sample from the database. Each later one
+follows a new phase posted through the API, which invalidates the response
+cache, so it shows what a dashboard polling during production sees: the
+sample cache reads only the new rows.
+
+    python benchmarks/measurement_stats.py [--samples 1000000] [--requests 5]
+"""
+import argparse
+import os
+import random
+import statistics
+import time
+from datetime import datetime, timedelta
+
+import _setup
+
+CHUNK = 100_000
+
+
+def seed(n_samples: int):
+    from sqlalchemy import insert
+    from app.database import engine
+    from app.models import measurement, test_run
+
+    start = datetime.utcnow() - timedelta(seconds=30 * n_samples)
+    with engine.begin() as conn:
+        conn.execute(insert(test_run.TestRun), [{"name": "Board test", "status": "PASSED",
+                                                 "created_at": start, "updated_at": start}])
+        for offset in range(0, n_samples, CHUNK):
+            rows = []
+            for i in range(offset, min(offset + CHUNK, n_samples)):
+                value = random.gauss(5.0, 0.1)
+                created_at = start + timedelta(seconds=30 * i)
+                rows.append({"name": "vcc", "value": value, "unit": "V", "low_limit": 4.5, "high_limit": 5.5,
+                             "passed": 4.5 <= value <= 5.5, "phase_id": 1, "test_run_id": 1,
+                             "created_at": created_at, "updated_at": created_at})
+            conn.execute(insert(measurement.Measurement), rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--samples", type=int, default=1_000_000)
+    parser.add_argument("--requests", type=int, default=5, help="requests after the first")
+    parser.add_argument("--no-cache", action="store_true", help="turn the sample cache off")
+    args = parser.parse_args()
+
+    if args.no_cache:
+        os.environ["NOTTOFU_ANALYTICS_CACHE_MB"] = "0"
+    _setup.use_temp_database()
+    _setup.create_schema()
+    start = time.perf_counter()
+    seed(args.samples)
+    print(f"seeded {args.samples:,} samples in {time.perf_counter() - start:.0f} s")
+
+    from fastapi.testclient import TestClient
+    from app.main import app
+
+    with TestClient(app) as client:
+        def request() -> float:
+            start = time.perf_counter()
+            client.get("/analytics/measurements/vcc?bucket=day").raise_for_status()
+            return time.perf_counter() - start
+
+        print(f"first request: {request():.2f} s")
+        run_id = client.post("/runs/", json={"name": "Board test"}).json()["id"]
+        latencies = []
+        for _ in range(args.requests):
+            phase = {"test_run_id": run_id, "name": "Power", "status": "PASSED",
+                     "measurements": {"vcc": {"value": random.gauss(5.0, 0.1), "unit": "V"}}}
+            client.post("/phases/", json=phase).raise_for_status()
+            latencies.append(request())
+        print(f"after each new phase: median {statistics.median(latencies):.2f} s, "
+              f"max {max(latencies):.2f} s over {args.requests} requests")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+Latency of one page of runs by OFFSET versus by keyset cursor, at
+increasing page numbers, on a temporary SQLite database.
+
+    python benchmarks/pagination.py [--rows 200000] [--page-size 20]
+"""
+import argparse
+import asyncio
+import time
+from datetime import datetime, timedelta
+
+import _setup
+
+PAGES = (1, 1000, 10000)
+
+
+async def measure(pages, page_size: int, repeat: int, start: datetime):
+    from sqlalchemy import select
+    from app import pagination
+    from app.database import AsyncSessionLocal
+    from app.models import test_run
+
+    model = test_run.TestRun
+    async with AsyncSessionLocal() as db:
+        for page in pages:
+            skip = (page - 1) * page_size
+            query = select(model).order_by(model.created_at, model.id).offset(skip).limit(page_size)
+            t = time.perf_counter()
+            for _ in range(repeat):
+                offset_rows = (await db.scalars(query)).all()
+            offset = (time.perf_counter() - t) / repeat
+
+            # The cursor a client following X-Next-Cursor would hold on this page;
+            # row i was created i seconds after start
+            cursor = pagination.encode_cursor(start + timedelta(seconds=skip - 1), skip) if skip else None
+            t = time.perf_counter()
+            for _ in range(repeat):
+                keyset_rows, _, _ = await pagination.keyset_page(db, select(model), model, page_size, cursor)
+            keyset = (time.perf_counter() - t) / repeat
+
+            assert [row.id for row in offset_rows] == [row.id for row in keyset_rows]
+            print(f"page {page:>6}: offset {offset * 1000:6.2f} ms, keyset {keyset * 1000:6.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--page-size", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=20, help="queries averaged per measurement")
+    args = parser.parse_args()
+
+    _setup.use_temp_database()
+    _setup.create_schema()
+    from sqlalchemy import insert
+    from app.database import engine
+    from app.models import test_run
+
+    start = datetime(2024, 1, 1)
+    with engine.begin() as conn:
+        conn.execute(insert(test_run.TestRun), [
+            {"name": "Board test", "status": "PASSED", "created_at": start + timedelta(seconds=i), "updated_at": start}
+            for i in range(args.rows)
+        ])
+    pages = [page for page in PAGES if (page - 1) * args.page_size < args.rows]
+    print(f"{args.rows:,} runs, {args.page_size} per page")
+    asyncio.run(measure(pages, args.page_size, args.repeat, start))
+
+
+if __name__ == "__main__":
+    main()
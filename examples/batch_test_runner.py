@@ -6,7 +6,13 @@ This script demonstrates how to run multiple tests in batch mode
 and record the results in the NotTofu platform.
 
 Usage:
-    python batch_test_runner.py [--count N] [--config CONFIG_FILE]
+    python batch_test_runner.py [--count N] [--config CONFIG_FILE] [--workers N [--processes]]
+
+With --workers, tests run concurrently on N workers. Each worker is bound to
+one station for the whole batch, so a fixture is never shared by two tests
+at once. Station names come from the "stations" list of the config file if
+it has one (and are then passed to each test as its "station" parameter),
+otherwise the workers are named worker-1, worker-2, ...
 """
 
 import os
@@ -16,6 +22,9 @@ import random
 import json
 import argparse
 import subprocess
+import threading
+import queue
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
 
 # Add the examples directory to the path
@@ -25,6 +34,36 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from test_samples.simple_test import run_fake_test
 from test_samples.complex_test import run_complex_test
 
+def execute_test(test_type, params):
+    """Run one test and return whether it passed. Raises if it could not be run."""
+    if test_type == "simple":
+        return run_fake_test()
+    elif test_type == "complex":
+        device_id = params.get("device_id")
+        serial_number = params.get("serial_number")
+        return run_complex_test(device_id=device_id, serial_number=serial_number)
+    elif test_type == "external":
+        # Run an external test script
+        script_path = params.get("script_path")
+        if not script_path:
+            raise ValueError("script_path is required for external tests")
+        
+        args = [sys.executable, script_path]
+        for key, value in params.items():
+            if key != "script_path" and value is not None:
+                args.append(f"--{key}={value}")
+        
+        print(f"Running external script: {' '.join(args)}")
+        process = subprocess.run(args, capture_output=True, text=True)
+        success = process.returncode == 0
+        
+        if not success:
+            print(f"External script failed with code {process.returncode}")
+            print(f"Error output: {process.stderr}")
+        return success
+    else:
+        raise ValueError(f"Unknown test type: {test_type}")
+
 class BatchRunner:
     """Class to manage batch test execution."""
     
@@ -44,14 +83,21 @@ class BatchRunner:
             }
         }
         
+        self.lock = threading.Lock()
+        self.planned = 0
+        
         # Load configuration if provided
         self.config = {}
         if config_file and os.path.exists(config_file):
             with open(config_file, "r") as f:
                 self.config = json.load(f)
     
-    def run_test(self, test_type, params=None):
-        """Run a single test of the specified type with parameters."""
+    def run_test(self, test_type, params=None, station=None, executor=None):
+        """
+        Run a single test of the specified type with parameters and record
+        its result. With an executor, the test runs there instead of in the
+        calling thread.
+        """
         params = params or {}
         start_time = time.time()
         test_result = {
@@ -60,50 +106,21 @@ class BatchRunner:
             "start_time": datetime.fromtimestamp(start_time).isoformat(),
             "status": "UNKNOWN"
         }
+        prefix = f"[{station}] " if station else ""
         
         try:
             print(f"\n{'='*80}")
-            print(f"📋 Running {test_type} test with parameters: {params}")
+            print(f"📋 {prefix}Running {test_type} test with parameters: {params}")
             print(f"{'='*80}")
             
-            # Run the appropriate test based on type
-            if test_type == "simple":
-                success = run_fake_test()
-            elif test_type == "complex":
-                device_id = params.get("device_id")
-                serial_number = params.get("serial_number")
-                success = run_complex_test(device_id=device_id, serial_number=serial_number)
-            elif test_type == "external":
-                # Run an external test script
-                script_path = params.get("script_path")
-                if not script_path:
-                    raise ValueError("script_path is required for external tests")
-                
-                args = [sys.executable, script_path]
-                for key, value in params.items():
-                    if key != "script_path" and value is not None:
-                        args.append(f"--{key}={value}")
-                
-                print(f"Running external script: {' '.join(args)}")
-                process = subprocess.run(args, capture_output=True, text=True)
-                success = process.returncode == 0
-                
-                if not success:
-                    print(f"External script failed with code {process.returncode}")
-                    print(f"Error output: {process.stderr}")
+            if executor is not None:
+                success = executor.submit(execute_test, test_type, params).result()
             else:
-                raise ValueError(f"Unknown test type: {test_type}")
-            
-            # Record the result
+                success = execute_test(test_type, params)
             status = "PASSED" if success else "FAILED"
-            self.results["summary"]["total"] += 1
-            self.results["summary"]["passed" if success else "failed"] += 1
-            
         except Exception as e:
-            print(f"❌ Error running test: {e}")
+            print(f"❌ {prefix}Error running test: {e}")
             status = "ERROR"
-            self.results["summary"]["total"] += 1
-            self.results["summary"]["errors"] += 1
         
         end_time = time.time()
         duration = end_time - start_time
@@ -115,44 +132,116 @@ class BatchRunner:
             "status": status
         })
         
-        self.results["tests"].append(test_result)
-        print(f"\n📊 Test completed: {status} in {duration:.2f} seconds\n")
+        # Workers finish tests concurrently, so the counters are only
+        # touched under the lock
+        with self.lock:
+            summary = self.results["summary"]
+            summary["total"] += 1
+            summary[{"PASSED": "passed", "FAILED": "failed"}.get(status, "errors")] += 1
+            self.results["tests"].append(test_result)
+            progress = dict(summary)
+        print(f"\n📊 {prefix}Test completed: {status} in {duration:.2f} seconds\n")
+        if self.planned > 1:
+            print(f"📈 Progress: {progress['total']}/{self.planned} done "
+                  f"({progress['passed']} passed, {progress['failed']} failed, {progress['errors']} errors)")
         
         return status
     
-    def run_batch(self, count=1, test_types=None):
-        """Run a batch of tests."""
+    def run_batch(self, count=1, test_types=None, workers=1, processes=False):
+        """
+        Run a batch of tests, one after the other or, with ``workers`` > 1,
+        concurrently on that many workers (threads, or one process each with
+        ``processes``).
+        """
         test_types = test_types or ["simple", "complex"]
+        self.planned = count
         
         print(f"🧪 Starting batch run: {self.batch_name}")
         print(f"📅 {datetime.now().isoformat()}")
         print(f"📊 Planning to run {count} tests")
         
-        for i in range(count):
-            # Pick a random test type if multiple types are available
-            test_type = random.choice(test_types) if len(test_types) > 1 else test_types[0]
-            
-            # Generate random parameters for the test
-            params = {}
-            if test_type == "complex":
-                params = {
-                    "device_id": f"DEV-BATCH-{i+1}",
-                    "serial_number": f"SN-BATCH-{i+1:04d}"
-                }
-            
-            print(f"\n🔄 Running test {i+1} of {count} (type: {test_type})")
-            status = self.run_test(test_type, params)
-            
-            # Optional delay between tests
-            if i < count - 1:
-                delay = random.uniform(0.5, 2.0)
-                print(f"⏱️ Waiting {delay:.1f} seconds before next test...")
-                time.sleep(delay)
+        tests = (self.plan_test(i, test_types) for i in range(count))
+        if workers > 1:
+            self.run_parallel(tests, count, workers, processes)
+        else:
+            for i, (test_type, params) in enumerate(tests):
+                print(f"\n🔄 Running test {i+1} of {count} (type: {test_type})")
+                self.run_test(test_type, params)
+                
+                # Optional delay between tests
+                if i < count - 1:
+                    self.pause()
         
         self.end_time = time.time()
         self.generate_report()
         return True
     
+    def plan_test(self, i, test_types):
+        """Pick the type and parameters of the i-th test of the batch."""
+        # Pick a random test type if multiple types are available
+        test_type = random.choice(test_types) if len(test_types) > 1 else test_types[0]
+        
+        # Generate random parameters for the test
+        params = {}
+        if test_type == "complex":
+            params = {
+                "device_id": f"DEV-BATCH-{i+1}",
+                "serial_number": f"SN-BATCH-{i+1:04d}"
+            }
+        return test_type, params
+    
+    def pause(self, station=None):
+        """Delay between two tests, as when the next unit is put on the fixture."""
+        delay = random.uniform(0.5, 2.0)
+        prefix = f"[{station}] " if station else ""
+        print(f"⏱️ {prefix}Waiting {delay:.1f} seconds before next test...")
+        time.sleep(delay)
+    
+    def run_parallel(self, tests, count, workers, processes):
+        """
+        Run ``tests`` on ``workers`` workers, each bound to its own station.
+        Tests are handed out through a bounded queue, so a worker picks up
+        the next one as soon as it is free and the plan is never generated
+        far ahead of execution.
+        """
+        stations = self.config.get("stations")
+        if stations and len(stations) < workers:
+            raise ValueError(f"{workers} workers need {workers} stations, the config has {len(stations)}")
+        names = stations[:workers] if stations else [f"worker-{n+1}" for n in range(workers)]
+        pending = queue.Queue(maxsize=workers * 2)
+        
+        def work(station):
+            # A station's tests all run in the same thread, or in the same
+            # process with --processes, so fixture state stays in one place
+            executor = ProcessPoolExecutor(max_workers=1) if processes else None
+            try:
+                first = True
+                while True:
+                    test = pending.get()
+                    if test is None:
+                        return
+                    test_type, params = test
+                    if stations:
+                        params = dict(params, station=station)
+                    if not first:
+                        self.pause(station)
+                    first = False
+                    self.run_test(test_type, params, station=station, executor=executor)
+            finally:
+                if executor is not None:
+                    executor.shutdown()
+        
+        print(f"🔀 Running on {workers} {'processes' if processes else 'threads'}: {', '.join(names)}")
+        threads = [threading.Thread(target=work, args=(name,), name=name, daemon=True) for name in names]
+        for thread in threads:
+            thread.start()
+        for test in tests:
+            pending.put(test)
+        for _ in threads:
+            pending.put(None)
+        for thread in threads:
+            thread.join()
+    
     def generate_report(self, output_dir="reports"):
         """Generate a batch run report."""
         if not os.path.exists(output_dir):
@@ -183,6 +272,9 @@ def parse_args():
     parser.add_argument("--config", help="Path to a JSON configuration file")
     parser.add_argument("--name", help="Name for this batch run")
     parser.add_argument("--types", help="Comma-separated list of test types to run (default: simple,complex)")
+    parser.add_argument("--workers", type=int, default=1, help="Number of tests to run at once (default: 1)")
+    parser.add_argument("--processes", action="store_true",
+                        help="Run each worker's tests in its own process instead of a thread")
     return parser.parse_args()
 
 if __name__ == "__main__":
@@ -200,7 +292,8 @@ if __name__ == "__main__":
     print(f"🧪 Starting batch test runner with {args.count} tests")
     start_time = time.time()
     
-    success = runner.run_batch(count=args.count, test_types=test_types)
+    success = runner.run_batch(count=args.count, test_types=test_types,
+                               workers=args.workers, processes=args.processes)
     
     end_time = time.time()
     total_duration = end_time - start_time
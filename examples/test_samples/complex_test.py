@@ -9,7 +9,6 @@ Usage:
     python complex_test.py
 """
 
-import requests
 import json
 import time
 import random
@@ -18,9 +17,16 @@ import os
 import argparse
 from datetime import datetime
 
+# Make the nottofu package importable when run from a checkout
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+from nottofu.client import NotTofuClient, NotTofuError
+
 # Base URL for NotTofu API
 BASE_URL = "http://localhost:8000"
 
+# Shared by all test runs, so they reuse its open connections
+client = NotTofuClient(BASE_URL)
+
 class TestRun:
     """Class to manage a test run and its phases."""
     
@@ -38,23 +44,13 @@ class TestRun:
     
     def create(self):
         """Create the test run in NotTofu."""
-        url = f"{BASE_URL}/test-runs/"
-        
-        payload = {
-            "name": self.name,
-            "uut_id": self.device_id,
-            "uut_serial": self.serial_number,
-            "meta_data": self.metadata
-        }
-        
         try:
-            response = requests.post(url, json=payload)
-            response.raise_for_status()
-            result = response.json()
+            result = client.create_run(self.name, uut_id=self.device_id, uut_serial=self.serial_number,
+                                       meta_data=self.metadata)
             self.id = result["id"]
             print(f"✅ Created test run: {self.name} (ID: {self.id})")
             return True
-        except requests.exceptions.RequestException as e:
+        except NotTofuError as e:
             print(f"❌ Error creating test run: {e}")
             return False
     
@@ -62,8 +58,6 @@ class TestRun:
         """Add a test phase to this run."""
         phase.test_run_id = self.id
         self.phases.append(phase)
-        
-        # In a real implementation, this would call the API to add the phase
         print(f"📋 Added phase: {phase.name} with status {phase.status}")
         
         return phase
@@ -73,7 +67,16 @@ class TestRun:
         self.status = status
         self.end_time = time.time()
         
-        # In a real implementation, this would update the test run in the database
+        # Phases are only finished now, so they are all sent together with
+        # the final status
+        try:
+            for phase in self.phases:
+                client.add_phase(self.id, phase.name, phase.status, measurements=phase.measurements,
+                                 duration=phase.to_dict()["duration"], description=phase.description)
+            client.update_run_status(self.id, status)
+        except NotTofuError as e:
+            print(f"❌ Error completing test run: {e}")
+            return False
         print(f"✅ Completed test run with status: {status}")
         
         return True
@@ -9,17 +9,24 @@ Usage:
     python hw_motor_test.py [--device-id ID] [--serial SERIAL] [--rpm RPM]
 """
 
-import requests
 import json
+import os
 import time
 import random
 import sys
 import argparse
 from datetime import datetime
 
+# Make the nottofu package importable when run from a checkout
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+from nottofu.client import NotTofuClient, NotTofuError
+
 # Base URL for NotTofu API
 BASE_URL = "http://localhost:8000"
 
+# Shared by all test runs, so they reuse its open connections
+client = NotTofuClient(BASE_URL)
+
 class MotorTestRun:
     """Class to manage a motor test run."""
     
@@ -36,28 +43,22 @@ class MotorTestRun:
     
     def create_test_run(self):
         """Create the test run in NotTofu."""
-        url = f"{BASE_URL}/test-runs/"
-        
-        payload = {
-            "name": f"Motor Test - {self.serial_number}",
-            "uut_id": self.device_id,
-            "uut_serial": self.serial_number,
-            "meta_data": {
-                "target_rpm": self.target_rpm,
-                "test_type": "Motor Qualification",
-                "firmware_version": "2.5.1",
-                "hardware_version": "4.2"
-            }
-        }
-        
         try:
-            response = requests.post(url, json=payload)
-            response.raise_for_status()
-            result = response.json()
+            result = client.create_run(
+                f"Motor Test - {self.serial_number}",
+                uut_id=self.device_id,
+                uut_serial=self.serial_number,
+                meta_data={
+                    "target_rpm": self.target_rpm,
+                    "test_type": "Motor Qualification",
+                    "firmware_version": "2.5.1",
+                    "hardware_version": "4.2"
+                }
+            )
             self.test_run_id = result["id"]
             print(f"✅ Created motor test run (ID: {self.test_run_id})")
             return True
-        except requests.exceptions.RequestException as e:
+        except NotTofuError as e:
             print(f"❌ Error creating test run: {e}")
             return False
     
@@ -253,7 +254,14 @@ class MotorTestRun:
         print(f"\n✅ Test completed with overall status: {overall_status}")
         print(f"⏱️ Total duration: {self.end_time - self.start_time:.2f} seconds")
         
-        # In a real implementation, we would update the test run in the database
+        try:
+            for phase in self.phases:
+                client.add_phase(self.test_run_id, phase["name"], phase["status"],
+                                 measurements=phase["measurements"])
+            client.update_run_status(self.test_run_id, overall_status)
+        except NotTofuError as e:
+            print(f"❌ Error completing test run: {e}")
+            return False
         return True
     
     def generate_report(self, output_dir="reports"):
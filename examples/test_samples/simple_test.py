@@ -5,68 +5,68 @@ Simple Test Example
 This example demonstrates how to create and store test data in the NotTofu platform.
 It simulates a basic test with multiple phases and measurements.
 
+Results are recorded in a local spool and sent to the server in the
+background, so the test neither waits for nor fails with the server.
+
 Usage:
     python simple_test.py
 """
 
-import requests
-import json
+import atexit
+import os
+import threading
 import time
 import random
 import sys
 from datetime import datetime
 
+# Make the nottofu package importable when run from a checkout
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+from nottofu.client import SpooledClient
+
 # Base URL for NotTofu API
 BASE_URL = "http://localhost:8000"
 
+_client = None
+_client_lock = threading.Lock()
+
+def get_client():
+    """The spooled client shared by all tests in this process, created on first use."""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = SpooledClient(BASE_URL)
+            # Give the forwarder a chance to send the last results
+            atexit.register(_client.close)
+        return _client
+
 def create_test_run(name, uut_id=None, uut_serial=None, meta_data=None):
-    """Create a new test run in NotTofu."""
-    url = f"{BASE_URL}/test-runs/"
-    
-    payload = {
-        "name": name,
-        "uut_id": uut_id or f"DEVICE-{int(time.time())}",
-        "uut_serial": uut_serial or f"SN-{int(time.time())}",
-        "meta_data": meta_data or {}
-    }
-    
-    try:
-        response = requests.post(url, json=payload)
-        response.raise_for_status()
-        result = response.json()
-        print(f"✅ Created test run: {result['name']} (ID: {result['id']})")
-        return result
-    except requests.exceptions.RequestException as e:
-        print(f"❌ Error creating test run: {e}")
-        return None
+    """Record a new test run and return its local run key."""
+    run_key = get_client().create_run(
+        name,
+        uut_id=uut_id or f"DEVICE-{int(time.time())}",
+        uut_serial=uut_serial or f"SN-{int(time.time())}",
+        meta_data=meta_data or {}
+    )
+    print(f"✅ Recorded test run: {name} (key: {run_key})")
+    return run_key
 
 def add_test_phase(test_run_id, name, status, measurements=None, duration=None):
-    """Add a test phase to an existing test run."""
-    url = f"{BASE_URL}/test-phases/"
-    
-    payload = {
-        "name": name,
-        "test_run_id": test_run_id,
-        "status": status,
-        "measurements": measurements or {},
-        "duration": duration or 0.0,
-        "description": f"Phase created by simple_test.py"
-    }
-    
-    try:
-        response = requests.post(url, json=payload)
-        response.raise_for_status()
-        result = response.json()
-        print(f"✅ Added phase: {result['name']} with status: {result['status']}")
-        return result
-    except requests.exceptions.RequestException as e:
-        print(f"❌ Error adding test phase: {e}")
-        return None
+    """Record a test phase of a test run, given its run key."""
+    get_client().add_phase(
+        test_run_id,
+        name,
+        status,
+        measurements=measurements or {},
+        duration=duration or 0.0,
+        description="Phase created by simple_test.py"
+    )
+    print(f"✅ Recorded phase: {name} with status: {status}")
 
 def run_fake_test():
     """Run a simulated test with multiple phases and store the results."""
     # Create a test run
-    test_run = create_test_run(
+    test_run_id = create_test_run(
         name="Example Simple Test",
         meta_data={
             "version": "1.0.0",
@@ -75,12 +75,6 @@ def run_fake_test():
         }
     )
     
-    if not test_run:
-        print("Could not create test run. Exiting.")
-        return False
-    
-    test_run_id = test_run["id"]
-    
     # Simulate initialization phase
     print("\n🔄 Running initialization phase...")
     time.sleep(1)  # Simulate work
@@ -162,14 +156,8 @@ def run_fake_test():
     overall_status = "PASSED" if (voltage_in_range and temp_in_range and functionality_passed) else "FAILED"
     print(f"\n✅ Test complete with status: {overall_status}")
     
-    # Update the test run status in the database
-    try:
-        url = f"{BASE_URL}/test-runs/{test_run_id}/status"
-        response = requests.put(url, json={"status": overall_status})
-        response.raise_for_status()
-        print(f"✅ Updated test run status to: {overall_status}")
-    except requests.exceptions.RequestException as e:
-        print(f"❌ Error updating test run status: {e}")
+    get_client().update_run_status(test_run_id, overall_status)
+    print(f"✅ Recorded test run status: {overall_status}")
     
     return True
 
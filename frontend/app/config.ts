@@ -6,6 +6,10 @@ export const API_URL = 'http://localhost:8000';
 // Refresh intervals (in milliseconds)
 export const API_STATUS_CHECK_INTERVAL = 10000; // 10 seconds
 export const DATA_REFRESH_INTERVAL = 5000; // 5 seconds
+export const STREAM_REFRESH_DEBOUNCE = 250; // Coalesce bursts of run events into one refetch
+
+// Events pushed by the /runs/stream Server-Sent Events endpoint
+export const RUN_STREAM_EVENTS = ['run-created', 'phase-added', 'status-changed'];
 
 // Timeouts (in milliseconds)
 export const API_REQUEST_TIMEOUT = 5000; // 5 seconds
@@ -15,8 +19,23 @@ export const API_ENDPOINTS = {
   root: '/',
   status: '/status',
   testRuns: '/runs/',
+  runStream: '/runs/stream',
   testPhases: '/phases/',
   getTestRun: (id: number | string) => `/runs/${id}`,
   getTestRunPhases: (id: number | string) => `/runs/${id}/phases`,
   updateTestRunStatus: (id: number | string) => `/runs/${id}/status`,
+  uploadRunAttachment: (id: number | string) => `/runs/${id}/attachments`,
+  uploadPhaseAttachment: (id: number | string) => `/phases/${id}/attachments`,
+  attachmentContent: (id: number | string) => `/attachments/${id}/content`,
+  measurementStats: (name: string) => `/analytics/measurements/${encodeURIComponent(name)}`,
+  stations: '/stations/',
+  getStation: (id: number | string) => `/stations/${id}`,
+  stationsMetrics: '/stations/metrics',
+  stationMetrics: (id: number | string) => `/stations/${id}/metrics`,
+  procedures: '/procedures/',
+  getProcedure: (id: number | string) => `/procedures/${id}`,
+  procedureMetrics: (id: number | string) => `/procedures/${id}/metrics`,
+  procedureSpecs: (id: number | string) => `/procedures/${id}/specs`,
+  exportRuns: '/export/runs',
+  exportMeasurements: '/export/measurements',
 }; 
\ No newline at end of file
@@ -9,6 +9,7 @@ import {
   ClockIcon,
   ChevronRightIcon
 } from '@heroicons/react/24/outline'
+import { API_URL, API_ENDPOINTS, RUN_STREAM_EVENTS, STREAM_REFRESH_DEBOUNCE } from '../../config'
 
 // Define interfaces for test run and test phase
 interface TestRun {
@@ -71,17 +72,26 @@ export default function TestRunDetailPage({ params }: { params: { id: string } }
     }
   };
 
-  // Fetch test run details on component mount and set up auto-refresh interval
+  // Fetch test run details on component mount, then refetch when this run changes
   useEffect(() => {
     fetchTestRunDetails();
     
-    // Set up auto-refresh interval (every 5 seconds)
-    const refreshInterval = setInterval(() => {
-      fetchTestRunDetails();
-    }, 5000);
+    let refreshTimeout: ReturnType<typeof setTimeout> | undefined;
+    const scheduleRefresh = () => {
+      clearTimeout(refreshTimeout);
+      refreshTimeout = setTimeout(fetchTestRunDetails, STREAM_REFRESH_DEBOUNCE);
+    };
     
-    // Clean up interval on component unmount
-    return () => clearInterval(refreshInterval);
+    // Only events for this run are streamed; refetch on reconnect in case any were missed
+    const events = new EventSource(`${API_URL}${API_ENDPOINTS.runStream}?run_id=${runId}`);
+    RUN_STREAM_EVENTS.forEach(type => events.addEventListener(type, scheduleRefresh));
+    events.onopen = scheduleRefresh;
+    
+    // Close the stream on component unmount
+    return () => {
+      clearTimeout(refreshTimeout);
+      events.close();
+    };
   }, [runId]);
 
   // Function to format timestamp
@@ -4,7 +4,7 @@ import { useState, useEffect } from 'react'
 import Link from 'next/link'
 import { DocumentTextIcon, ClockIcon, ComputerDesktopIcon, CheckCircleIcon, XCircleIcon } from '@heroicons/react/24/outline'
 import ApiStatus from './status'
-import { API_URL, API_ENDPOINTS, DATA_REFRESH_INTERVAL, API_REQUEST_TIMEOUT } from '../config'
+import { API_URL, API_ENDPOINTS, API_REQUEST_TIMEOUT, RUN_STREAM_EVENTS, STREAM_REFRESH_DEBOUNCE } from '../config'
 
 // Define the test run interface
 interface TestRun {
@@ -31,7 +31,7 @@ export default function TestRunsPage() {
       console.log(`Fetching test runs from ${apiEndpoint}...`);
       
       const response = await fetch(apiEndpoint, {
-        cache: 'no-store', // Prevent caching
+        cache: 'no-cache', // Revalidate with the server's ETag (304 when unchanged)
         signal: AbortSignal.timeout(API_REQUEST_TIMEOUT) // Set timeout
       });
       
@@ -69,17 +69,26 @@ export default function TestRunsPage() {
     }
   };
 
-  // Fetch test runs on component mount and set up auto-refresh interval
+  // Fetch test runs on component mount, then refetch whenever the server pushes a change
   useEffect(() => {
     fetchTestRuns();
     
-    // Set up auto-refresh interval
-    const refreshInterval = setInterval(() => {
-      fetchTestRuns();
-    }, DATA_REFRESH_INTERVAL);
+    let refreshTimeout: ReturnType<typeof setTimeout> | undefined;
+    const scheduleRefresh = () => {
+      clearTimeout(refreshTimeout);
+      refreshTimeout = setTimeout(fetchTestRuns, STREAM_REFRESH_DEBOUNCE);
+    };
     
-    // Clean up interval on component unmount
-    return () => clearInterval(refreshInterval);
+    // EventSource reconnects by itself; refetch on reconnect in case events were missed
+    const events = new EventSource(`${API_URL}${API_ENDPOINTS.runStream}`);
+    RUN_STREAM_EVENTS.forEach(type => events.addEventListener(type, scheduleRefresh));
+    events.onopen = scheduleRefresh;
+    
+    // Close the stream on component unmount
+    return () => {
+      clearTimeout(refreshTimeout);
+      events.close();
+    };
   }, []);
 
   // Function to format timestamp
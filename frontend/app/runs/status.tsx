@@ -1,7 +1,7 @@
 'use client'
 
 import { useState, useEffect } from 'react'
-import { API_URL, API_ENDPOINTS, API_STATUS_CHECK_INTERVAL, API_REQUEST_TIMEOUT } from '../config'
+import { API_URL, API_ENDPOINTS, API_STATUS_CHECK_INTERVAL, API_REQUEST_TIMEOUT, STREAM_REFRESH_DEBOUNCE } from '../config'
 
 export default function ApiStatus() {
   const [status, setStatus] = useState<'loading' | 'connected' | 'error'>('loading')
@@ -13,11 +13,10 @@ export default function ApiStatus() {
   const checkApiStatus = async () => {
     try {
       setStatus('loading')
-      const apiEndpoint = `${API_URL}${API_ENDPOINTS.testRuns}`
+      const apiEndpoint = `${API_URL}${API_ENDPOINTS.status}`
       console.log(`Checking API status at ${apiEndpoint}`)
       
       const response = await fetch(apiEndpoint, { 
-        // Add cache: 'no-store' to prevent caching
         cache: 'no-store',
         // Set a timeout for the fetch request
         signal: AbortSignal.timeout(API_REQUEST_TIMEOUT)
@@ -25,9 +24,10 @@ export default function ApiStatus() {
       
       if (response.ok) {
         const data = await response.json()
-        setTestRuns(data.length)
         setStatus('connected')
-        setMessage('API is connected and functioning correctly')
+        setMessage(data.status === 'operational'
+          ? 'API is connected and functioning correctly'
+          : `API is connected but reports status: ${data.status}`)
         setLastUpdated(new Date().toLocaleTimeString())
         setRetryCount(0) // Reset retry count on success
       } else {
@@ -41,15 +41,48 @@ export default function ApiStatus() {
     }
   }
 
+  const fetchRunCount = async () => {
+    try {
+      const response = await fetch(`${API_URL}${API_ENDPOINTS.testRuns}`, {
+        // Revalidate with the server's ETag so unchanged refreshes get an empty 304
+        cache: 'no-cache',
+        signal: AbortSignal.timeout(API_REQUEST_TIMEOUT)
+      })
+      if (response.ok) {
+        const data = await response.json()
+        setTestRuns(data.length)
+      }
+    } catch (err) {
+      // The periodic /status check reports connectivity; a missed count is refreshed on the next event
+      console.error('Failed to refresh the test run count:', err)
+    }
+  }
+
   useEffect(() => {
     checkApiStatus()
     
-    // Check periodically 
+    // Health comes from /status on an interval; EventSource reconnects on its
+    // own after every dropped stream, so the stream only refreshes the run count
     const interval = setInterval(() => {
       checkApiStatus()
     }, API_STATUS_CHECK_INTERVAL)
     
-    return () => clearInterval(interval)
+    let refreshTimeout: ReturnType<typeof setTimeout> | undefined
+    const scheduleRefresh = () => {
+      clearTimeout(refreshTimeout)
+      refreshTimeout = setTimeout(fetchRunCount, STREAM_REFRESH_DEBOUNCE)
+    }
+    
+    // Recount on reconnect too, in case runs were created while the stream was down
+    const events = new EventSource(`${API_URL}${API_ENDPOINTS.runStream}`)
+    events.addEventListener('run-created', scheduleRefresh)
+    events.onopen = scheduleRefresh
+    
+    return () => {
+      clearInterval(interval)
+      clearTimeout(refreshTimeout)
+      events.close()
+    }
   }, [])
 
   // Auto-retry with increasing backoff if in error state
@@ -0,0 +1 @@
+"""Python tools for reporting test results to a NotTofu server."""
@@ -0,0 +1,15 @@
+"""
+Clients for reporting test runs and phases to the NotTofu API.
+
+NotTofuClient is for ordinary blocking test scripts and AsyncNotTofuClient
+for asyncio ones. Both keep their connections alive between requests,
+buffer phases and send them in batches, and retry requests that fail on
+the network or with a 429/502/503/504 response. Every POST carries an
+Idempotency-Key that its retries reuse, so a retried write is stored once.
+"""
+from ._common import DEFAULT_URL, NotTofuError
+from .aio import AsyncNotTofuClient
+from .spool import SpooledClient
+from .sync import NotTofuClient
+
+__all__ = ["AsyncNotTofuClient", "DEFAULT_URL", "NotTofuClient", "NotTofuError", "SpooledClient"]
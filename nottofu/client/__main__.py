@@ -0,0 +1,22 @@
+import argparse
+
+from ._common import DEFAULT_URL
+from .spool import DEFAULT_SPOOL, Spool
+from .sync import NotTofuClient
+
+parser = argparse.ArgumentParser(prog="python -m nottofu.client")
+commands = parser.add_subparsers(dest="command", required=True)
+forward = commands.add_parser("forward", help="send the entries left in a spool")
+forward.add_argument("path", nargs="?", default=DEFAULT_SPOOL, help=f"spool file (default {DEFAULT_SPOOL})")
+forward.add_argument("--url", default=DEFAULT_URL, help=f"NotTofu server (default {DEFAULT_URL})")
+args = parser.parse_args()
+
+spool = Spool(args.path)
+with NotTofuClient(args.url) as client:
+    sent = 0
+    while True:
+        count = spool.forward_once(client)
+        if not count:
+            break
+        sent += count
+print(f"Sent {sent} entries, {len(spool.failed())} in the spool were rejected by the server")
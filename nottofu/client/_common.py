@@ -0,0 +1,129 @@
+import os
+import random
+import uuid
+from typing import Any, Dict, List, Optional, Tuple
+import httpx
+
+DEFAULT_URL = os.environ.get("NOTTOFU_URL", "http://localhost:8000")
+
+# Responses that mean the server didn't handle the request and it is worth
+# trying again
+RETRY_STATUSES = {429, 502, 503, 504}
+
+
+class NotTofuError(Exception):
+    """A request the server rejected, or that still failed after all retries."""
+
+    def __init__(self, message: str, status_code: Optional[int] = None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class ClientBase:
+    """
+    State shared by the sync and asyncio clients: connection settings, the
+    retry policy and the buffer of phases waiting to be sent.
+
+    Phases added with ``add_phase`` are kept per run and sent with one
+    request per run once ``batch_size`` of them are buffered, when the run's
+    status is set, on ``flush()`` and when the client is closed. A batch
+    that couldn't be sent is kept apart with its idempotency key and sent
+    again, with the same key, before the run's newer phases.
+    """
+
+    def __init__(self, base_url: str = DEFAULT_URL, batch_size: int = 20, retries: int = 4,
+                 backoff: float = 0.5, max_backoff: float = 8.0, timeout: float = 10.0,
+                 max_connections: int = 10):
+        self.base_url = base_url.rstrip("/")
+        self.batch_size = batch_size
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.timeout = httpx.Timeout(timeout)
+        # One keep-alive pool per client, so every request after the first
+        # reuses an open connection
+        self.limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+        self._buffer: Dict[int, List[dict]] = {}
+        self._unsent: Dict[int, List[Tuple[List[dict], str]]] = {}
+        self._buffered = 0
+
+    def _buffer_phase(self, test_run_id: int, name: str, status: str, measurements: Optional[dict],
+                      duration: Optional[float], description: Optional[str]) -> bool:
+        """Buffer a phase and return whether the buffer is now full."""
+        self._buffer.setdefault(test_run_id, []).append({
+            "name": name,
+            "status": status,
+            "description": description,
+            "measurements": measurements,
+            "duration": duration,
+        })
+        self._buffered += 1
+        return self._buffered >= self.batch_size
+
+    def _take(self, test_run_id: Optional[int] = None) -> List[Tuple[int, List[dict], str]]:
+        """
+        Remove and return the buffered (run id, phases, idempotency key)
+        batches, of one run or of all, each run's in the order to send them.
+        Batches that failed before come first with their key; a run's other
+        phases form one batch with a new key.
+        """
+        run_ids = list(dict.fromkeys([*self._unsent, *self._buffer])) if test_run_id is None else [test_run_id]
+        batches = []
+        for run_id in run_ids:
+            batches.extend((run_id, phases, key) for phases, key in self._unsent.pop(run_id, []))
+            phases = self._buffer.pop(run_id, None)
+            if phases:
+                batches.append((run_id, phases, uuid.uuid4().hex))
+        self._buffered -= sum(len(phases) for _, phases, _ in batches)
+        return batches
+
+    def _restore(self, batches: List[Tuple[int, List[dict], str]]):
+        """Put batches that couldn't be sent back in front of their runs' other batches, keeping their keys."""
+        restored: Dict[int, List[Tuple[List[dict], str]]] = {}
+        for test_run_id, phases, key in batches:
+            restored.setdefault(test_run_id, []).append((phases, key))
+            self._buffered += len(phases)
+        for test_run_id, entries in restored.items():
+            self._unsent[test_run_id] = entries + self._unsent.get(test_run_id, [])
+
+    def _delay(self, attempt: int, response: Optional[httpx.Response] = None) -> float:
+        """Seconds to wait before retry number ``attempt`` (from 0): exponential backoff with jitter."""
+        if response is not None:
+            retry_after = response.headers.get("Retry-After", "")
+            if retry_after.isdigit():
+                return min(float(retry_after), self.max_backoff)
+        return min(self.backoff * 2 ** attempt, self.max_backoff) * random.uniform(0.5, 1.0)
+
+    def _should_retry(self, attempt: int, response: Optional[httpx.Response], keyed: bool = False) -> bool:
+        if attempt >= self.retries:
+            return False
+        if response is None or response.status_code in RETRY_STATUSES:
+            return True
+        # A keyed write that raced its own earlier attempt on another server
+        # worker; trying again replays that attempt's response
+        return keyed and response.status_code == 409
+
+    @staticmethod
+    def _result(response: httpx.Response) -> Any:
+        if response.status_code >= 400:
+            try:
+                detail = response.json().get("detail", response.text)
+            except ValueError:
+                detail = response.text
+            raise NotTofuError(f"{response.request.method} {response.request.url.path} failed with "
+                               f"{response.status_code}: {detail}", response.status_code)
+        return response.json()
+
+    @staticmethod
+    def _headers(idempotency_key: Optional[str]) -> dict:
+        """
+        Headers of a POST. Without a key of the caller's, the request gets a
+        new one that its retries reuse, so a retry after a timeout of a write
+        the server did commit is replayed rather than written twice.
+        """
+        return {"Idempotency-Key": idempotency_key or uuid.uuid4().hex}
+
+    @staticmethod
+    def _run_payload(name: str, uut_id: Optional[str], uut_serial: Optional[str],
+                     meta_data: Optional[dict]) -> dict:
+        return {"name": name, "uut_id": uut_id, "uut_serial": uut_serial, "meta_data": meta_data}
@@ -0,0 +1,104 @@
+import asyncio
+from typing import Any, List, Optional, Tuple
+import httpx
+
+from ._common import ClientBase, NotTofuError
+
+
+class AsyncNotTofuClient(ClientBase):
+    """
+    asyncio NotTofu client, with the same methods as NotTofuClient as
+    coroutines.
+
+    Requests share one keep-alive connection pool. Requests that are issued
+    concurrently, including the per-run batches of one ``flush()``, are in
+    flight at the same time over separate pooled connections instead of
+    waiting for each other::
+
+        async with AsyncNotTofuClient("http://localhost:8000") as client:
+            run = await client.create_run("Motor Test", uut_serial="SN123")
+            await client.add_phase(run["id"], "Startup", "PASSED", measurements={...})
+            await client.update_run_status(run["id"], "PASSED")
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._http = httpx.AsyncClient(base_url=self.base_url, timeout=self.timeout, limits=self.limits)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def close(self):
+        """Send the buffered phases and close the connections."""
+        try:
+            await self.flush()
+        finally:
+            await self._http.aclose()
+
+    async def _request(self, method: str, path: str, **kwargs) -> Any:
+        attempt = 0
+        while True:
+            response = error = None
+            try:
+                response = await self._http.request(method, path, **kwargs)
+            except httpx.TransportError as e:
+                error = e
+            if not self._should_retry(attempt, response, "Idempotency-Key" in kwargs.get("headers", {})):
+                if response is None:
+                    raise NotTofuError(f"{method} {path} failed: {error}") from error
+                return self._result(response)
+            await asyncio.sleep(self._delay(attempt, response))
+            attempt += 1
+
+    async def create_run(self, name: str, uut_id: Optional[str] = None, uut_serial: Optional[str] = None,
+                         meta_data: Optional[dict] = None, idempotency_key: Optional[str] = None) -> dict:
+        """Create a test run and return it as the API does."""
+        return await self._request("POST", "/runs/", json=self._run_payload(name, uut_id, uut_serial, meta_data),
+                                  headers=self._headers(idempotency_key))
+
+    async def get_run(self, test_run_id: int) -> dict:
+        return await self._request("GET", f"/runs/{test_run_id}")
+
+    async def add_phase(self, test_run_id: int, name: str, status: str = "PENDING",
+                        measurements: Optional[dict] = None, duration: Optional[float] = None,
+                        description: Optional[str] = None):
+        """Buffer a phase of a run. Sends the buffer once it holds ``batch_size`` phases."""
+        if self._buffer_phase(test_run_id, name, status, measurements, duration, description):
+            await self.flush()
+
+    async def flush(self, test_run_id: Optional[int] = None) -> List[int]:
+        """Send the buffered phases, of one run or of all, concurrently, and return their IDs."""
+        by_run = {}
+        for batch in self._take(test_run_id):
+            by_run.setdefault(batch[0], []).append(batch)
+        results = await asyncio.gather(*(self._send_batches(batches) for batches in by_run.values()),
+                                       return_exceptions=True)
+        for result in results:
+            if isinstance(result, BaseException):
+                raise result
+        return [phase_id for result in results for phase_id in result]
+
+    async def _send_batches(self, batches: List[Tuple[int, List[dict], str]]) -> List[int]:
+        """Send the batches of one run in order, putting back the unsent ones if one fails."""
+        ids = []
+        for i, (run_id, phases, key) in enumerate(batches):
+            try:
+                ids.extend(await self.send_phases(run_id, phases, idempotency_key=key))
+            except BaseException:
+                self._restore(batches[i:])
+                raise
+        return ids
+
+    async def send_phases(self, test_run_id: int, phases: List[dict],
+                          idempotency_key: Optional[str] = None) -> List[int]:
+        """Add ``phases`` (dicts of add_phase's arguments) to a run right away and return their IDs."""
+        return (await self._request("POST", f"/runs/{test_run_id}/phases/bulk", json=phases,
+                                    headers=self._headers(idempotency_key)))["ids"]
+
+    async def update_run_status(self, test_run_id: int, status: str) -> dict:
+        """Send the run's buffered phases, then set its status."""
+        await self.flush(test_run_id)
+        return await self._request("PUT", f"/runs/{test_run_id}/status", json={"status": status})
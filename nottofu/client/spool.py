@@ -0,0 +1,270 @@
+"""
+Store-and-forward reporting for test stations.
+
+SpooledClient records runs, phases and status changes in a local SQLite
+spool and returns at once; a background thread forwards the spool to the
+server in order, in batches, and keeps retrying while the server is slow or
+down. A test cycle therefore never waits on the network, and whatever was
+recorded survives a crash or restart of the station and is sent once the
+spool is opened again.
+
+Every entry carries an idempotency key, and the entries forwarded together
+are assigned to their batch in the spool before it is sent, so a batch
+resent after a lost response or a restart repeats the same request with
+the same key and the server can recognise it.
+
+``python -m nottofu.client forward PATH`` sends what is left in a spool,
+e.g. one a station left behind while the server was unreachable.
+"""
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from typing import List, Optional
+
+from ._common import DEFAULT_URL, NotTofuError
+from .sync import NotTofuClient
+
+logger = logging.getLogger(__name__)
+
+# Responses that mean the server will never accept the entries. Anything
+# else, e.g. a 409 while a concurrent request holds the same idempotency key,
+# leaves them to be sent again with the same key
+REJECT_STATUSES = {400, 404, 422}
+
+DEFAULT_SPOOL = os.environ.get("NOTTOFU_SPOOL", "nottofu_spool.db")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind TEXT NOT NULL,
+    run_key TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    idempotency_key TEXT NOT NULL,
+    batch TEXT,
+    error TEXT
+);
+CREATE TABLE IF NOT EXISTS runs (
+    run_key TEXT PRIMARY KEY,
+    run_id INTEGER NOT NULL
+);
+"""
+
+
+class Spool:
+    """
+    Durable, ordered queue of report entries in a SQLite file.
+
+    Entries are ``run``, ``phase`` or ``status`` and belong to a run by its
+    local run key, since the server's run ID is only known once the run has
+    been forwarded; the ``runs`` table maps the two. Entries the server
+    rejected are kept with their error instead of blocking the queue.
+    """
+
+    def __init__(self, path: str = DEFAULT_SPOOL):
+        self.path = path
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        # FULL makes each append durable once it returns, even across a
+        # power cut
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=FULL")
+        self._db.executescript(_SCHEMA)
+        self._lock = threading.Lock()
+
+    def close(self):
+        self._db.close()
+
+    def append(self, kind: str, run_key: str, payload: dict):
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO entries (kind, run_key, payload, idempotency_key) VALUES (?, ?, ?, ?)",
+                (kind, run_key, json.dumps(payload), uuid.uuid4().hex),
+            )
+
+    def pending(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT count(*) FROM entries WHERE error IS NULL").fetchone()[0]
+
+    def failed(self) -> List[dict]:
+        """Entries the server rejected, with the reason."""
+        with self._lock:
+            rows = self._db.execute("SELECT seq, kind, run_key, payload, error FROM entries "
+                                    "WHERE error IS NOT NULL ORDER BY seq").fetchall()
+        return [{"seq": seq, "kind": kind, "run_key": run_key, "payload": json.loads(payload), "error": error}
+                for seq, kind, run_key, payload, error in rows]
+
+    def _claim(self, batch_size: int):
+        """
+        Read the oldest pending entry and assign the batch of phases it
+        starts, if that hasn't happened yet. Runs in a write transaction, so
+        processes sharing the spool see the same batches.
+        """
+        head = self._db.execute("SELECT seq, kind, run_key, payload, idempotency_key, batch FROM entries "
+                                "WHERE error IS NULL ORDER BY seq LIMIT 1").fetchone()
+        if head is None:
+            return None
+        seq, kind, run_key, payload, key, batch = head
+        run = self._db.execute("SELECT run_id FROM runs WHERE run_key = ?", (run_key,)).fetchone()
+        entries = [(seq, payload)]
+        if kind == "phase":
+            if batch is None:
+                # Consecutive phases of the same run go out together. The
+                # batch is recorded first so a resend has the same content
+                batch = key
+                rows = self._db.execute(
+                    "SELECT seq, kind, run_key, batch FROM entries WHERE error IS NULL AND seq >= ? "
+                    "ORDER BY seq LIMIT ?", (seq, batch_size)).fetchall()
+                seqs = []
+                for row_seq, row_kind, row_run_key, row_batch in rows:
+                    if row_kind != "phase" or row_run_key != run_key or row_batch is not None:
+                        break
+                    seqs.append(row_seq)
+                self._db.executemany("UPDATE entries SET batch = ? WHERE seq = ?", [(batch, s) for s in seqs])
+            entries = self._db.execute("SELECT seq, payload FROM entries WHERE batch = ? ORDER BY seq",
+                                       (batch,)).fetchall()
+            key = batch
+        return kind, run_key, payload, key, run, entries
+
+    def forward_once(self, client: NotTofuClient, batch_size: int = 50) -> int:
+        """
+        Send the oldest pending entry, or the batch of phases it starts, and
+        return how many entries were sent (0 when the spool is empty). Raises
+        NotTofuError if the server couldn't be reached or didn't handle the
+        request; entries it rejects as invalid are marked failed.
+        """
+        with self._lock:
+            # IMMEDIATE takes the write lock up front, so another process
+            # can't claim an overlapping batch between the read and the update
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                claimed = self._claim(batch_size)
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+            self._db.execute("COMMIT")
+        if claimed is None:
+            return 0
+        kind, run_key, payload, key, run, entries = claimed
+
+        seqs = [entry_seq for entry_seq, _ in entries]
+        try:
+            if kind == "run":
+                created = client.create_run(**json.loads(payload), idempotency_key=key)
+            elif run is None:
+                raise NotTofuError(f"Run {run_key} was never created", 404)
+            elif kind == "phase":
+                client.send_phases(run[0], [json.loads(data) for _, data in entries], idempotency_key=key)
+            else:
+                client.update_run_status(run[0], json.loads(payload)["status"])
+        except NotTofuError as e:
+            if e.status_code not in REJECT_STATUSES:
+                raise
+            with self._lock:
+                self._db.executemany("UPDATE entries SET error = ? WHERE seq = ?", [(str(e), s) for s in seqs])
+            return len(seqs)
+
+        with self._lock:
+            self._db.execute("BEGIN")
+            if kind == "run":
+                self._db.execute("INSERT OR REPLACE INTO runs (run_key, run_id) VALUES (?, ?)",
+                                 (run_key, created["id"]))
+            self._db.executemany("DELETE FROM entries WHERE seq = ?", [(s,) for s in seqs])
+            if kind == "status":
+                # The run is finished; forget its ID once nothing else refers to it
+                self._db.execute("DELETE FROM runs WHERE run_key = ? AND NOT EXISTS "
+                                 "(SELECT 1 FROM entries WHERE run_key = ?)", (run_key, run_key))
+            self._db.execute("COMMIT")
+        return len(seqs)
+
+
+class SpooledClient:
+    """
+    Reporting client that never blocks the test on the server.
+
+    ``create_run`` returns a local run key (a string) to pass to
+    ``add_phase`` and ``update_run_status``; the calls only append to the
+    spool. A forwarder thread sends the spool with a NotTofuClient, backing
+    off while the server is unreachable. ``close()`` gives it up to
+    ``timeout`` seconds to catch up; anything left stays in the spool for
+    the next run of the station or ``python -m nottofu.client forward``.
+    """
+
+    def __init__(self, base_url: str = DEFAULT_URL, spool: str = DEFAULT_SPOOL, batch_size: int = 50,
+                 max_backoff: float = 30.0):
+        self.spool = Spool(spool)
+        self.batch_size = batch_size
+        self.max_backoff = max_backoff
+        # The forwarder does its own backing off, so the client only retries
+        # once before handing the error back
+        self._client = NotTofuClient(base_url, retries=1)
+        self._wakeup = threading.Event()
+        self._stopping = False
+        self._left = 0
+        self._thread = threading.Thread(target=self._forward, name="nottofu-forwarder", daemon=True)
+        self._thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def create_run(self, name: str, uut_id: Optional[str] = None, uut_serial: Optional[str] = None,
+                   meta_data: Optional[dict] = None) -> str:
+        run_key = uuid.uuid4().hex
+        self._append("run", run_key, NotTofuClient._run_payload(name, uut_id, uut_serial, meta_data))
+        return run_key
+
+    def add_phase(self, run_key: str, name: str, status: str = "PENDING", measurements: Optional[dict] = None,
+                  duration: Optional[float] = None, description: Optional[str] = None):
+        self._append("phase", run_key, {"name": name, "status": status, "description": description,
+                                        "measurements": measurements, "duration": duration})
+
+    def update_run_status(self, run_key: str, status: str):
+        self._append("status", run_key, {"status": status})
+
+    def _append(self, kind: str, run_key: str, payload: dict):
+        self.spool.append(kind, run_key, payload)
+        self._wakeup.set()
+
+    def _forward(self):
+        failures = 0
+        while not self._stopping:
+            # Cleared before looking at the spool, so an append made while
+            # this pass runs isn't missed
+            self._wakeup.clear()
+            try:
+                sent = self.spool.forward_once(self._client, self.batch_size)
+                failures = 0
+            except NotTofuError:
+                sent = 0
+                failures += 1
+            except Exception:
+                # E.g. the spool file is locked or the disk is full; keep the
+                # thread alive and try again after backing off
+                logger.exception("Forwarding the spool %s failed", self.spool.path)
+                sent = 0
+                failures += 1
+            if sent:
+                continue
+            wait = min(self._client.backoff * 2 ** failures, self.max_backoff) if failures else None
+            self._wakeup.wait(wait)
+
+    def close(self, timeout: float = 10.0) -> int:
+        """Wait up to ``timeout`` seconds for the spool to drain, stop forwarding and return what is left."""
+        if self._stopping:
+            return self._left
+        self._wakeup.set()
+        deadline = time.monotonic() + timeout
+        while self.spool.pending() and time.monotonic() < deadline:
+            time.sleep(0.05)
+        self._stopping = True
+        self._wakeup.set()
+        self._thread.join()
+        self._client.close()
+        self._left = self.spool.pending()
+        self.spool.close()
+        return self._left
@@ -0,0 +1,96 @@
+import threading
+import time
+from typing import Any, List, Optional
+import httpx
+
+from ._common import ClientBase, NotTofuError
+
+
+class NotTofuClient(ClientBase):
+    """
+    Blocking NotTofu client.
+
+    All requests go through one keep-alive connection pool, and failed
+    requests are retried with exponential backoff. A client can be shared by
+    several threads. Use it as a context manager, or call ``close()`` to send
+    the remaining phases and close the connections::
+
+        with NotTofuClient("http://localhost:8000") as client:
+            run = client.create_run("Motor Test", uut_serial="SN123")
+            client.add_phase(run["id"], "Startup", "PASSED", measurements={...})
+            client.update_run_status(run["id"], "PASSED")
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._http = httpx.Client(base_url=self.base_url, timeout=self.timeout, limits=self.limits)
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """Send the buffered phases and close the connections."""
+        try:
+            self.flush()
+        finally:
+            self._http.close()
+
+    def _request(self, method: str, path: str, **kwargs) -> Any:
+        attempt = 0
+        while True:
+            response = error = None
+            try:
+                response = self._http.request(method, path, **kwargs)
+            except httpx.TransportError as e:
+                error = e
+            if not self._should_retry(attempt, response, "Idempotency-Key" in kwargs.get("headers", {})):
+                if response is None:
+                    raise NotTofuError(f"{method} {path} failed: {error}") from error
+                return self._result(response)
+            time.sleep(self._delay(attempt, response))
+            attempt += 1
+
+    def create_run(self, name: str, uut_id: Optional[str] = None, uut_serial: Optional[str] = None,
+                   meta_data: Optional[dict] = None, idempotency_key: Optional[str] = None) -> dict:
+        """Create a test run and return it as the API does."""
+        return self._request("POST", "/runs/", json=self._run_payload(name, uut_id, uut_serial, meta_data),
+                             headers=self._headers(idempotency_key))
+
+    def get_run(self, test_run_id: int) -> dict:
+        return self._request("GET", f"/runs/{test_run_id}")
+
+    def add_phase(self, test_run_id: int, name: str, status: str = "PENDING", measurements: Optional[dict] = None,
+                  duration: Optional[float] = None, description: Optional[str] = None):
+        """Buffer a phase of a run. Sends the buffer once it holds ``batch_size`` phases."""
+        with self._lock:
+            full = self._buffer_phase(test_run_id, name, status, measurements, duration, description)
+        if full:
+            self.flush()
+
+    def flush(self, test_run_id: Optional[int] = None) -> List[int]:
+        """Send the buffered phases, of one run or of all, and return their IDs."""
+        with self._lock:
+            batches = self._take(test_run_id)
+        ids = []
+        for i, (run_id, phases, key) in enumerate(batches):
+            try:
+                ids.extend(self.send_phases(run_id, phases, idempotency_key=key))
+            except Exception:
+                with self._lock:
+                    self._restore(batches[i:])
+                raise
+        return ids
+
+    def send_phases(self, test_run_id: int, phases: List[dict], idempotency_key: Optional[str] = None) -> List[int]:
+        """Add ``phases`` (dicts of add_phase's arguments) to a run right away and return their IDs."""
+        return self._request("POST", f"/runs/{test_run_id}/phases/bulk", json=phases,
+                             headers=self._headers(idempotency_key))["ids"]
+
+    def update_run_status(self, test_run_id: int, status: str) -> dict:
+        """Send the run's buffered phases, then set its status."""
+        self.flush(test_run_id)
+        return self._request("PUT", f"/runs/{test_run_id}/status", json={"status": status})
@@ -9,57 +9,43 @@ Usage:
     python simple_test.py
 """
 
+import atexit
 import time
 import random
 import sys
-from datetime import datetime
 
-# Mock API endpoint info - in a real implementation, this would be used
+from nottofu.client import SpooledClient
+
 BASE_URL = "http://localhost:8000"
 
+# Results go to a local spool and are forwarded whenever the API is
+# reachable, so nothing is lost while the server has errors
+client = SpooledClient(BASE_URL)
+atexit.register(client.close)
+
 def create_test_run(name, uut_id=None, uut_serial=None, meta_data=None):
-    """Create a new test run in NotTofu."""
-    url = f"{BASE_URL}/test-runs/"
-    
-    # Create mock IDs
-    device_id = uut_id or f"DEVICE-{int(time.time())}"
-    serial = uut_serial or f"SN-{int(time.time())}"
-    
-    # Log what we would have sent
-    print(f"💡 MOCK MODE: Not calling API due to server errors")
-    print(f"📋 Would send to {url}:")
-    print(f"    name: {name}")
-    print(f"    device_id: {device_id}")
-    print(f"    serial: {serial}")
-    
-    # Create a mock result
-    mock_id = int(time.time())
-    result = {
-        "id": mock_id,
-        "name": name,
-        "device_id": device_id,
-        "serial": serial,
-        "metadata": meta_data or {},
-        "created_at": datetime.now().isoformat(),
-        "status": "CREATED"
-    }
-    
-    print(f"✅ Created mock test run: {result['name']} (ID: {result['id']})")
-    return result
+    """Record a new test run and return its local run key."""
+    run_key = client.create_run(
+        name,
+        uut_id=uut_id or f"DEVICE-{int(time.time())}",
+        uut_serial=uut_serial or f"SN-{int(time.time())}",
+        meta_data=meta_data or {}
+    )
+    print(f"✅ Recorded test run: {name} (key: {run_key})")
+    return run_key
 
 def add_test_phase(test_run_id, name, status, measurements=None, duration=None):
-    """Add a test phase to an existing test run."""
-    # In a real implementation, this would call the API to add a phase
-    # For this example, we'll just print what would be added
+    """Record a test phase of a test run, given its run key."""
     print(f"📋 Adding phase '{name}' to test run {test_run_id}")
     print(f"   Status: {status}")
     print(f"   Measurements: {measurements or {}}")
     print(f"   Duration: {duration or 0.0} seconds")
+    client.add_phase(test_run_id, name, status, measurements=measurements or {}, duration=duration or 0.0)
 
 def run_fake_test():
     """Run a simulated test with multiple phases and store the results."""
     # Create a test run
-    test_run = create_test_run(
+    test_run_id = create_test_run(
         name="Example Simple Test",
         meta_data={
             "version": "1.0.0",
@@ -68,12 +54,6 @@ def run_fake_test():
         }
     )
     
-    if not test_run:
-        print("Could not create test run. Exiting.")
-        return False
-    
-    test_run_id = test_run["id"]
-    
     # Simulate initialization phase
     print("\n🔄 Running initialization phase...")
     time.sleep(1)  # Simulate work
@@ -155,7 +135,7 @@ def run_fake_test():
     overall_status = "PASSED" if (voltage_in_range and temp_in_range and functionality_passed) else "FAILED"
     print(f"\n✅ Test complete with status: {overall_status}")
     
-    # In a real implementation, we would update the test run status in the database
+    client.update_run_status(test_run_id, overall_status)
     return True
 
 if __name__ == "__main__":
@@ -0,0 +1,61 @@
+"""
+Shared fixtures. The app reads its configuration from the environment when
+it is imported, so the database and blob store are pointed at a temporary
+directory here, before any test module imports ``app``.
+"""
+import os
+import shutil
+import tempfile
+
+import httpx
+import pytest
+
+TEST_DIR = tempfile.mkdtemp(prefix="nottofu-tests-")
+os.environ["NOTTOFU_DATABASE_URL"] = f"sqlite:///{os.path.join(TEST_DIR, 'NotTofu.db')}"
+os.environ["NOTTOFU_BLOB_DIR"] = os.path.join(TEST_DIR, "blobs")
+os.environ["NOTTOFU_ARCHIVE_DIR"] = os.path.join(TEST_DIR, "archive")
+
+from app.database import engine  # noqa: E402
+from app.models import Base  # noqa: E402
+
+
+def pytest_sessionfinish(session, exitstatus):
+    shutil.rmtree(TEST_DIR, ignore_errors=True)
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture
+def database():
+    """Empty tables, archive and in-process caches for a test of the API's database."""
+    from app import analytics, archive, compression, registry, specs
+    from app.cache import response_cache
+    from app.live import live_metrics
+
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    shutil.rmtree(archive.ARCHIVE_DIR, ignore_errors=True)
+    compression.dictionaries.load()
+    response_cache.clear()
+    analytics.sample_cache.clear()
+    registry.stations.invalidate()
+    registry.procedures.invalidate()
+    specs.spec_cache.clear()
+    live_metrics.clear()
+    yield engine
+
+
+@pytest.fixture
+async def client(database):
+    """An HTTP client calling the app in-process."""
+    from app.main import app
+    from app.writer import writer
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        yield client
+    # The writer task belongs to this test's event loop
+    await writer.close()
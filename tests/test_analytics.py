@@ -0,0 +1,111 @@
+"""Measurement statistics, and the sample cache behind them staying in step with the database."""
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+from sqlalchemy import delete, insert
+
+from app import analytics
+from app.database import AsyncSessionLocal, engine
+from app.models import measurement
+
+pytestmark = pytest.mark.anyio
+
+START = datetime(2024, 1, 1)
+
+
+def _store(rows):
+    with engine.begin() as conn:
+        conn.execute(insert(measurement.Measurement), [
+            {"name": "vcc", "unit": "V", "low_limit": 4.5, "high_limit": 5.5, "phase_id": 1, "updated_at": START,
+             **row}
+            for row in rows
+        ])
+
+
+def _samples(n: int, run_offset: int = 0, start: datetime = START):
+    rng = np.random.default_rng(n + run_offset)
+    rows = []
+    for i, value in enumerate(rng.normal(5.0, 0.2, n).tolist()):
+        rows.append({"value": value, "passed": 4.5 <= value <= 5.5, "test_run_id": run_offset + i + 1,
+                     "created_at": start + timedelta(hours=i)})
+    return rows
+
+
+async def _load(**kwargs):
+    async with AsyncSessionLocal() as db:
+        return await analytics.load_samples(db, "vcc", **kwargs)
+
+
+async def test_measurement_stats(client):
+    rows = _samples(200)
+    # Run 1 is retried and passes the second time; its first pass still failed
+    rows[0]["value"], rows[0]["passed"] = 5.9, False
+    rows.append({"value": 5.0, "passed": True, "test_run_id": 1, "created_at": START + timedelta(minutes=30)})
+    _store(rows)
+
+    response = await client.get("/analytics/measurements/vcc?bucket=day")
+    assert response.status_code == 200
+    stats = response.json()
+    values = np.array([row["value"] for row in rows])
+    assert stats["count"] == len(rows)
+    assert stats["mean"] == pytest.approx(values.mean())
+    assert stats["std"] == pytest.approx(values.std(ddof=1))
+    assert stats["percentiles"]["p50"] == pytest.approx(np.percentile(values, 50))
+    assert stats["cpk"] == pytest.approx(min(5.5 - values.mean(), values.mean() - 4.5) / (3 * values.std(ddof=1)))
+
+    first_day = stats["buckets"][0]
+    assert first_day["start"] == "2024-01-01T00:00:00"
+    assert first_day["samples"] == 25 and first_day["runs"] == 24
+    passed = sum(row["passed"] for row in rows[1:24])
+    assert first_day["first_pass_yield"] == pytest.approx(passed / 24)
+    assert sum(bucket["samples"] for bucket in stats["buckets"]) == len(rows)
+
+
+async def test_sample_cache_follows_the_database(database):
+    _store(_samples(500))
+    first = await _load()
+    assert len(first) == 500
+
+    # New samples, some of them backfilled before cached ones
+    _store(_samples(50, run_offset=1000, start=START + timedelta(days=30)))
+    _store(_samples(20, run_offset=2000, start=START - timedelta(days=1)))
+    cached = await _load()
+    async with AsyncSessionLocal() as db:
+        stored = await analytics._query_samples(db, "vcc")
+    assert len(cached) == 570
+    assert np.array_equal(cached[:, analytics.ID], stored[:, analytics.ID])
+    assert np.all(np.diff(cached[:, analytics.TIME]) >= 0)
+
+    # Deleted (archived) samples disappear from the cache too
+    with engine.begin() as conn:
+        conn.execute(delete(measurement.Measurement).where(measurement.Measurement.test_run_id <= 100))
+    cached = await _load()
+    assert len(cached) == 470
+    assert cached[:, analytics.RUN].min() > 100
+
+
+async def test_sample_cache_time_range(database):
+    _store(_samples(100))
+    await _load()
+    after, before = START + timedelta(hours=10), START + timedelta(hours=20)
+    cached = await _load(created_after=after, created_before=before)
+    async with AsyncSessionLocal() as db:
+        stored = await analytics._query_samples(db, "vcc", after, before)
+    assert len(cached) == 10
+    assert np.array_equal(cached, stored)
+
+
+async def test_sample_cache_is_bounded_by_bytes(database):
+    _store(_samples(100))
+    _store([{**row, "name": "icc"} for row in _samples(300, run_offset=100)])
+    cache = analytics.SampleCache(max_bytes=300 * 5 * 8)
+    async with AsyncSessionLocal() as db:
+        assert len(await cache.get(db, "vcc")) == 100
+        assert len(await cache.get(db, "icc")) == 300
+        # The least recently used measurement makes room
+        assert list(cache._entries) == ["icc"] and cache._size == 300 * 5 * 8
+
+        small = analytics.SampleCache(max_bytes=200 * 5 * 8)
+        assert len(await small.get(db, "icc")) == 300
+        assert not small._entries and small._size == 0
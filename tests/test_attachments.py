@@ -0,0 +1,29 @@
+"""Attachment uploads and the blob store."""
+import os
+
+import pytest
+
+from app.blobs import blob_store
+
+pytestmark = pytest.mark.anyio
+
+
+def _blobs() -> set:
+    return {name for _, _, files in os.walk(blob_store.root) for name in files}
+
+
+@pytest.mark.parametrize("path", ["/runs/42/attachments", "/phases/42/attachments"])
+async def test_upload_to_missing_target_stores_nothing(client, path):
+    before = _blobs()
+    response = await client.post(path, files={"file": ("log.txt", os.urandom(1024), "text/plain")})
+    assert response.status_code == 404
+    assert _blobs() == before
+
+
+async def test_upload_is_stored(client):
+    run_id = (await client.post("/runs/", json={"name": "Board test"})).json()["id"]
+    content = os.urandom(1024)
+    response = await client.post(f"/runs/{run_id}/attachments", files={"file": ("log.bin", content)})
+    assert response.status_code == 200, response.text
+    assert blob_store.exists(response.json()["sha256"])
+    assert (await client.get(f"/attachments/{response.json()['id']}/content")).content == content
@@ -0,0 +1,73 @@
+"""Concurrent misses of the response cache share one build."""
+import asyncio
+
+import pytest
+
+from app.cache import ResponseCache
+
+pytestmark = pytest.mark.anyio
+
+
+class Builder:
+    def __init__(self):
+        self.calls = 0
+        self.release = asyncio.Event()
+
+    async def __call__(self):
+        self.calls += 1
+        body = f"build {self.calls}".encode()
+        await self.release.wait()
+        return body, ["runs"], {}
+
+
+async def test_concurrent_misses_share_a_build():
+    cache, build = ResponseCache(), Builder()
+    requests = [asyncio.create_task(cache.get_or_build("runs", build)) for _ in range(20)]
+    await asyncio.sleep(0)
+    build.release.set()
+    entries = await asyncio.gather(*requests)
+    assert build.calls == 1
+    assert {entry.body for entry in entries} == {b"build 1"}
+    assert cache.get("runs").body == b"build 1"
+
+
+async def test_requests_after_an_invalidation_dont_join_an_older_build():
+    cache, build = ResponseCache(), Builder()
+    before = [asyncio.create_task(cache.get_or_build("runs", build)) for _ in range(5)]
+    await asyncio.sleep(0)
+    cache.invalidate("runs")
+    after = [asyncio.create_task(cache.get_or_build("runs", build)) for _ in range(5)]
+    await asyncio.sleep(0)
+    build.release.set()
+    assert {entry.body for entry in await asyncio.gather(*before)} == {b"build 1"}
+    assert {entry.body for entry in await asyncio.gather(*after)} == {b"build 2"}
+    assert build.calls == 2
+    assert cache.get("runs").body == b"build 2"
+
+
+async def test_failed_build_fails_its_waiters_and_isnt_cached():
+    cache = ResponseCache()
+    release = asyncio.Event()
+
+    async def build():
+        await release.wait()
+        raise LookupError("gone")
+
+    requests = [asyncio.create_task(cache.get_or_build("run:1", build)) for _ in range(3)]
+    await asyncio.sleep(0)
+    release.set()
+    results = await asyncio.gather(*requests, return_exceptions=True)
+    assert all(isinstance(result, LookupError) for result in results)
+    assert cache.get("run:1") is None
+
+
+async def test_waiters_take_over_when_the_building_request_is_cancelled():
+    cache, build = ResponseCache(), Builder()
+    leader = asyncio.create_task(cache.get_or_build("runs", build))
+    await asyncio.sleep(0)
+    waiter = asyncio.create_task(cache.get_or_build("runs", build))
+    await asyncio.sleep(0)
+    leader.cancel()
+    await asyncio.sleep(0)
+    build.release.set()
+    assert (await waiter).body == b"build 2"
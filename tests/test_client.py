@@ -0,0 +1,62 @@
+"""Buffered phases of the Python clients are resent under the key they were first sent with."""
+import json
+
+import httpx
+import pytest
+
+from nottofu.client import AsyncNotTofuClient, NotTofuClient, NotTofuError
+
+
+class FlakyServer:
+    """Stores phase batches by key, but times out the first response like a slow committed write."""
+
+    def __init__(self):
+        self.requests = []
+        self.stored = {}
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        key = request.headers["Idempotency-Key"]
+        names = [phase["name"] for phase in json.loads(request.content)]
+        self.requests.append((key, names))
+        self.stored.setdefault(key, names)
+        if len(self.requests) == 1:
+            raise httpx.ReadTimeout("timed out", request=request)
+        return httpx.Response(200, json={"ids": list(range(len(self.stored[key])))})
+
+
+def _sent(server: FlakyServer) -> list:
+    return [name for names in server.stored.values() for name in names]
+
+
+def test_sync_flush_retries_with_the_same_key():
+    server = FlakyServer()
+    client = NotTofuClient(retries=0)
+    client._http = httpx.Client(transport=httpx.MockTransport(server), base_url="http://test")
+    client.add_phase(1, "a")
+    with pytest.raises(NotTofuError):
+        client.flush()
+    client.add_phase(1, "b")
+    client.flush()
+    client.close()
+
+    assert server.requests[0] == server.requests[1]
+    assert server.requests[2] == (server.requests[2][0], ["b"])
+    assert _sent(server) == ["a", "b"]
+
+
+@pytest.mark.anyio
+async def test_async_flush_retries_with_the_same_key():
+    server = FlakyServer()
+    client = AsyncNotTofuClient(retries=0)
+    client._http = httpx.AsyncClient(transport=httpx.MockTransport(server), base_url="http://test")
+    await client.add_phase(1, "a")
+    with pytest.raises(NotTofuError):
+        await client.flush()
+    await client.add_phase(1, "b")
+    await client.add_phase(2, "c")
+    await client.flush()
+    await client.close()
+
+    assert server.requests[0] == server.requests[1]
+    assert sorted(_sent(server)) == ["a", "b", "c"]
+    assert len(server.stored) == 3
@@ -0,0 +1,42 @@
+"""Compressed JSON columns convert values without touching the database."""
+from datetime import datetime
+
+import pytest
+import zstandard
+from sqlalchemy import insert
+
+from app import compression
+from app.database import engine
+from app.models import test_run
+
+
+class NoDatabase:
+    def connect(self):
+        raise AssertionError("queried the database while converting a value")
+
+
+def test_processors_use_loaded_dictionaries(database, monkeypatch):
+    now = datetime.utcnow()
+    with engine.begin() as conn:
+        conn.execute(insert(test_run.TestRun), [
+            {"name": "Board test", "status": "passed", "created_at": now, "updated_at": now,
+             "meta_data": {"station": f"ST-{i % 7}", "operator": f"op{i % 13}", "fixture": {"slot": i % 4},
+                           "firmware": f"1.{i % 5}.{i % 11}", "serial": f"SN-{i:06d}"}}
+            for i in range(3000)
+        ])
+    dict_id = compression.train()
+    assert dict_id is not None
+    assert compression.dictionaries.latest().dict_id() == dict_id
+
+    monkeypatch.setattr(compression, "engine", NoDatabase())
+    monkeypatch.setattr(compression, "COMPRESS_JSON", True)
+    column_type = compression.CompressedJSON()
+    bind = column_type.bind_processor(engine.dialect)
+    result = column_type.result_processor(engine.dialect, None)
+    value = {"station": "ST-3", "operator": "op5", "fixture": {"slot": 2}, "firmware": "1.2.3", "serial": "SN-000042"}
+    stored = bind(value)
+    assert isinstance(stored, bytes) and zstandard.get_frame_parameters(stored).dict_id == dict_id
+    assert result(stored) == value
+
+    with pytest.raises(LookupError):
+        compression.DictionaryRegistry().get(dict_id)
@@ -0,0 +1,18 @@
+"""Query-string filters of the run listing."""
+import pytest
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.mark.parametrize("name, prefix", [
+    ("Board test", "Board"),
+    ("Board\U0010ffff test", "Board\U0010ffff"),
+    ("Board\ud7ff test", "Board\ud7ff"),
+    ("\U0010ffff\U0010ffff", "\U0010ffff"),
+])
+async def test_name_prefix(client, name, prefix):
+    for run_name in (name, "Other test"):
+        assert (await client.post("/runs/", json={"name": run_name})).status_code == 200
+    response = await client.get("/runs/", params={"name_prefix": prefix})
+    assert response.status_code == 200, response.text
+    assert [run["name"] for run in response.json()] == [name]
@@ -0,0 +1,47 @@
+"""NDJSON report import through POST /runs/ingest."""
+import json
+
+import pytest
+
+pytestmark = pytest.mark.anyio
+
+
+def _ndjson(*lines) -> str:
+    return "\n".join(line if isinstance(line, str) else json.dumps(line) for line in lines)
+
+
+async def test_import_runs_and_reports(client):
+    body = _ndjson(
+        {"name": "Board test", "status": "passed", "created_at": "2024-01-01T10:00:00", "results": {"yield": 1},
+         "phases": [{"name": "Power", "status": "passed", "created_at": "2024-01-01T10:00:05"}]},
+        "",
+        {"test_run": {"serial_number": "SN-1", "start_time": "2024-01-02T10:00:00"},
+         "phases": [{"name": "Boot", "status": "FAILED", "start_time": "2024-01-02T10:00:01",
+                     "attachments": [{"filename": "boot.log", "data": "aGk="}]}]},
+    )
+    response = await client.post("/runs/ingest", content=body)
+    assert response.json() == {"runs": 2, "chunks": 1}
+
+    runs = (await client.get("/runs/")).json()
+    assert [(run["name"], run["status"], run["created_at"]) for run in runs] == [
+        ("Board test", "passed", "2024-01-01T10:00:00"),
+        ("Imported Report - SN-1", "failed", "2024-01-02T10:00:00"),
+    ]
+    assert runs[0]["results"] == {"yield": 1}
+    detail = (await client.get(f"/runs/{runs[1]['id']}", params={"include": "attachments"})).json()
+    assert [attachment["file_size"] for attachment in detail["attachments"]] == [2]
+
+
+@pytest.mark.parametrize("line, error", [
+    ({"name": "Board test", "created_at": "yesterday"}, "created_at"),
+    ({"name": "Board test", "status": "bogus"}, "Invalid status value: bogus"),
+    ({"name": "Board test", "phases": [{"status": "passed"}]}, "phases.0.name"),
+    ({"uut_serial": "SN-1"}, "name"),
+    ([1, 2], "Expected a JSON object"),
+    ({"test_run": {"start_time": "nope"}}, "created_at"),
+])
+async def test_invalid_line_is_named(client, line, error):
+    response = await client.post("/runs/ingest", content=_ndjson({"name": "Board test"}, "", line))
+    assert response.status_code == 400
+    assert "Invalid report on line 3: " in response.json()["detail"]
+    assert error in response.json()["detail"]
@@ -0,0 +1,20 @@
+"""Query timing for /status and /metrics."""
+import pytest
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_queries_of_both_engines_are_timed(client):
+    for name in ("Board test", "Other test"):
+        await client.post("/runs/", json={"name": name})
+    before = (await client.get("/status")).json()["database"]["query_kinds"]["SELECT"]["count"]
+
+    # Exports read through the synchronous engine in a worker thread
+    response = await client.get("/export/runs", params={"format": "csv"})
+    assert response.status_code == 200, response.text
+    kinds = (await client.get("/status")).json()["database"]["query_kinds"]
+    # The second /status adds one SELECT of its own on the async engine
+    assert kinds["SELECT"]["count"] == before + 2
+
+    text = (await client.get("/metrics")).text
+    assert 'nottofu_db_query_duration_seconds_count{kind="SELECT"}' in text
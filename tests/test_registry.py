@@ -0,0 +1,26 @@
+"""The in-memory station and procedure maps only learn committed rows."""
+import pytest
+from sqlalchemy import select
+
+from app import registry
+from app.database import AsyncSessionLocal, engine
+from app.models import procedure
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_reload_in_a_rolled_back_transaction_is_discarded(database):
+    async with AsyncSessionLocal() as db:
+        await registry.procedures.resolve(db, ["Board test"])
+        # A reload in the same transaction sees the row it registered
+        registry.procedures.invalidate()
+        await registry.procedures.resolve(db, ["Other test"])
+        await db.rollback()
+
+    async with AsyncSessionLocal() as db:
+        ids = await registry.procedures.resolve(db, ["Board test"])
+        await db.commit()
+    with engine.connect() as conn:
+        stored = conn.scalar(select(procedure.Procedure.id).where(procedure.Procedure.name == "Board test"))
+    assert ids == {"Board test": stored}
+    assert registry.procedures._ids["Board test"] == stored
@@ -0,0 +1,45 @@
+"""Rollups rebuilt from scratch match the ones kept up to date by the writes."""
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import select, update
+
+from app import archive, rollups
+from app.database import AsyncSessionLocal, engine
+from app.models import rollup
+
+pytestmark = pytest.mark.anyio
+
+
+def _rollups() -> tuple:
+    with engine.connect() as conn:
+        return tuple(sorted(tuple(row) for row in conn.execute(select(table)).all())
+                     for table in (rollup.RunRollup.__table__, rollup.PhaseRollup.__table__))
+
+
+async def _rebuild():
+    async with AsyncSessionLocal() as db:
+        await rollups.rebuild(db)
+        await db.commit()
+
+
+async def test_rebuild_counts_archived_runs(client):
+    for i in range(6):
+        run_id = (await client.post("/runs/", json={"name": f"Board {i % 2}"})).json()["id"]
+        phases = [{"name": f"phase {j}", "status": "failed" if j == i else "passed", "duration": 0.5 * j}
+                  for j in range(4)]
+        assert (await client.post(f"/runs/{run_id}/phases/bulk", json=phases)).status_code == 200
+    incremental = _rollups()
+    await _rebuild()
+    assert _rollups() == incremental
+
+    # Old enough to be archived
+    with engine.begin() as conn:
+        conn.execute(update(archive.RUNS).where(archive.RUNS.c.id <= 3).values(created_at=datetime(2024, 1, 15)))
+    await _rebuild()
+    expected = _rollups()
+    assert expected[0] and expected[1]
+
+    assert archive.archive_runs(timedelta(days=30)) == 3
+    await _rebuild()
+    assert _rollups() == expected
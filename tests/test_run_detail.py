@@ -0,0 +1,86 @@
+"""GET /runs/{id}?include= loads a run's relationships in a fixed number of queries."""
+import pytest
+from sqlalchemy import event
+
+from app.database import async_engine
+
+pytestmark = pytest.mark.anyio
+
+
+class QueryCounter:
+    """Counts the statements the API's engine executes while active."""
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.statements = []
+
+    def _record(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement)
+
+    def __enter__(self):
+        event.listen(self.engine, "before_cursor_execute", self._record)
+        return self
+
+    def __exit__(self, *exc_info):
+        event.remove(self.engine, "before_cursor_execute", self._record)
+
+    @property
+    def count(self) -> int:
+        return len(self.statements)
+
+
+async def _create_run(client, n_phases: int, n_attachments: int) -> int:
+    """A run with ``n_phases`` phases and ``n_attachments`` attachments on the run and on each phase."""
+    response = await client.post("/runs/", json={"name": "Board test", "uut_serial": "SN-1"})
+    response.raise_for_status()
+    run_id = response.json()["id"]
+    phases = [{"name": f"phase {i}", "status": "passed", "measurements": {"v": i}} for i in range(n_phases)]
+    response = await client.post(f"/runs/{run_id}/phases/bulk", json=phases)
+    response.raise_for_status()
+    targets = [f"/runs/{run_id}/attachments"] + [f"/phases/{phase_id}/attachments" for phase_id in response.json()["ids"]]
+    for target in targets:
+        for i in range(n_attachments):
+            response = await client.post(target, files={"file": (f"log{i}.txt", b"log line\n", "text/plain")})
+            response.raise_for_status()
+    return run_id
+
+
+async def _count_queries(client, path: str) -> int:
+    with QueryCounter(async_engine.sync_engine) as counter:
+        response = await client.get(path)
+    assert response.status_code == 200
+    return counter.count
+
+
+@pytest.mark.parametrize("include", ["", "phases", "attachments", "phases,attachments"])
+async def test_run_detail_query_count_is_constant(client, include):
+    small = await _create_run(client, n_phases=1, n_attachments=1)
+    large = await _create_run(client, n_phases=20, n_attachments=3)
+
+    small_count = await _count_queries(client, f"/runs/{small}?include={include}")
+    large_count = await _count_queries(client, f"/runs/{large}?include={include}")
+
+    # One query for the run and one per included relationship level
+    assert small_count == large_count == 1 + include.count("phases") + include.count("attachments") * (
+        2 if "phases" in include else 1)
+
+
+async def test_run_detail_includes_relationships(client):
+    run_id = await _create_run(client, n_phases=3, n_attachments=2)
+
+    response = await client.get(f"/runs/{run_id}?include=phases,attachments")
+    assert response.status_code == 200
+    run = response.json()
+    assert [phase["name"] for phase in run["phases"]] == ["phase 0", "phase 1", "phase 2"]
+    assert all(len(phase["attachments"]) == 2 for phase in run["phases"])
+    # A run's attachments include those of its phases
+    assert len(run["attachments"]) == 2 + 3 * 2
+
+    response = await client.get(f"/runs/{run_id}")
+    assert "phases" not in response.json() and "attachments" not in response.json()
+
+
+async def test_run_detail_rejects_unknown_include(client):
+    run_id = await _create_run(client, n_phases=1, n_attachments=0)
+    response = await client.get(f"/runs/{run_id}?include=phases,owner")
+    assert response.status_code == 400
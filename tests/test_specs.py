@@ -0,0 +1,47 @@
+"""Measurement specs belong to a procedure by id and are checked on the server."""
+import pytest
+
+pytestmark = pytest.mark.anyio
+
+SPECS = [{"name": "vcc", "unit": "V", "low_limit": 3.2, "high_limit": 3.4}]
+
+
+async def _report(client, procedure_name: str, value: float) -> dict:
+    run_id = (await client.post("/runs/", json={"name": procedure_name})).json()["id"]
+    response = await client.post(f"/runs/{run_id}/phases/bulk",
+                                 json=[{"name": "Power", "measurements": {"vcc": {"value": value}}}])
+    assert response.status_code == 200, response.text
+    return (await client.get(f"/runs/{run_id}/phases")).json()[0]
+
+
+async def test_specs_follow_procedure_through_rename(client):
+    procedure_id = (await client.post("/procedures/", json={"name": "Board test"})).json()["id"]
+    response = await client.put(f"/procedures/{procedure_id}/specs", json=SPECS)
+    assert response.status_code == 200, response.text
+    assert response.json()[0]["procedure_id"] == procedure_id
+
+    phase = await _report(client, "Board test", 3.5)
+    assert phase["status"] == "failed"
+    assert phase["measurements"]["vcc"] == {"value": 3.5, "unit": "V", "status": "FAIL", "comparator": "GELE",
+                                            "limits": {"min": 3.2, "max": 3.4}}
+
+    response = await client.put(f"/procedures/{procedure_id}", json={"name": "Board test v2"})
+    assert response.status_code == 200, response.text
+    assert (await _report(client, "Board test v2", 3.3))["status"] == "passed"
+    assert (await _report(client, "Board test v2", 3.1))["status"] == "failed"
+
+    response = await client.get(f"/procedures/{procedure_id}/specs")
+    assert [spec["name"] for spec in response.json()] == ["vcc"]
+
+
+async def test_runs_of_other_procedures_are_not_checked(client):
+    procedure_id = (await client.post("/procedures/", json={"name": "Board test"})).json()["id"]
+    await client.put(f"/procedures/{procedure_id}/specs", json=SPECS)
+    phase = await _report(client, "Other test", 5.0)
+    assert phase["status"] == "pending"
+    assert phase["measurements"]["vcc"] == {"value": 5.0}
+
+
+async def test_unknown_procedure(client):
+    assert (await client.get("/procedures/42/specs")).status_code == 404
+    assert (await client.put("/procedures/42/specs", json=SPECS)).status_code == 404
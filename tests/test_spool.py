@@ -0,0 +1,110 @@
+"""The station spool when several processes share it, and its forwarder thread."""
+import threading
+import time
+
+import pytest
+
+from nottofu.client import NotTofuError
+from nottofu.client.spool import Spool, SpooledClient
+
+N_PHASES = 300
+
+
+class RecordingClient:
+    """Stands in for NotTofuClient and records what would have been sent."""
+
+    backoff = 0.01
+
+    def __init__(self, fail_first: int = 0):
+        self.fail_first = fail_first
+        self.calls = 0
+        self.batches = []
+        self.lock = threading.Lock()
+
+    def create_run(self, name, idempotency_key=None, **kwargs):
+        return {"id": 1}
+
+    def send_phases(self, run_id, phases, idempotency_key=None):
+        with self.lock:
+            self.calls += 1
+            if self.calls <= self.fail_first:
+                raise RuntimeError("unexpected")
+            self.batches.append((idempotency_key, [phase["name"] for phase in phases]))
+
+    def update_run_status(self, run_id, status):
+        pass
+
+    def close(self):
+        pass
+
+
+def test_processes_sharing_a_spool_claim_the_same_batches(tmp_path):
+    path = str(tmp_path / "spool.db")
+    spool = Spool(path)
+    spool.append("run", "r", {"name": "Board test"})
+    for i in range(N_PHASES):
+        spool.append("phase", "r", {"name": f"phase {i}"})
+    client = RecordingClient()
+
+    def forward():
+        # A connection of its own, like another batch_test_runner process
+        own = Spool(path)
+        while own.forward_once(client, batch_size=7):
+            pass
+        own.close()
+
+    threads = [threading.Thread(target=forward) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert spool.pending() == 0
+    # A batch may be resent, but always under its key and with its content
+    batches = dict(client.batches)
+    assert len(batches) == len(set(map(tuple, batches.values())))
+    sent = sorted((name for names in batches.values() for name in names), key=lambda name: int(name.split()[1]))
+    assert sent == [f"phase {i}" for i in range(N_PHASES)]
+    spool.close()
+
+
+def test_forwarder_survives_unexpected_errors(tmp_path):
+    spooled = SpooledClient(spool=str(tmp_path / "spool.db"))
+    spooled._client = client = RecordingClient(fail_first=2)
+    run_key = spooled.create_run("Board test")
+    spooled.add_phase(run_key, "phase 0")
+    deadline = time.monotonic() + 10
+    while spooled.spool.pending() and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert spooled._thread.is_alive()
+    assert spooled.close() == 0
+    assert [names for _, names in client.batches] == [["phase 0"]]
+
+
+class ConflictingClient(RecordingClient):
+    """Answers 409 while a concurrent request with the same key is in progress, then 422."""
+
+    def __init__(self):
+        super().__init__()
+        self.statuses = [409, 422]
+
+    def send_phases(self, run_id, phases, idempotency_key=None):
+        super().send_phases(run_id, phases, idempotency_key)
+        if self.statuses:
+            raise NotTofuError("rejected", self.statuses.pop(0))
+
+
+def test_conflict_is_retried_with_the_same_key(tmp_path):
+    spool = Spool(str(tmp_path / "spool.db"))
+    spool.append("run", "r", {"name": "Board test"})
+    spool.append("phase", "r", {"name": "phase 0"})
+    client = ConflictingClient()
+    assert spool.forward_once(client) == 1
+
+    with pytest.raises(NotTofuError):
+        spool.forward_once(client)
+    assert spool.pending() == 1 and spool.failed() == []
+    assert spool.forward_once(client) == 1
+    assert [entry["error"] for entry in spool.failed()] == ["rejected"]
+    assert len({key for key, _ in client.batches}) == 1
+    spool.close()
@@ -0,0 +1,106 @@
+"""Concurrent writes through app.writer neither fail on SQLite's lock nor get lost."""
+import asyncio
+import threading
+from datetime import datetime
+
+import pytest
+from sqlalchemy import func, insert, select
+from sqlalchemy.exc import OperationalError
+
+from app.database import engine
+from app.models import test_phase, test_run
+from app.writer import WriteQueue
+
+pytestmark = pytest.mark.anyio
+
+N_RUNS = 200
+N_PHASE_BATCHES = 50
+N_SCRIPT_RUNS = 100
+
+
+def _count(model) -> int:
+    with engine.connect() as conn:
+        return conn.scalar(select(func.count()).select_from(model))
+
+
+async def test_concurrent_api_writes(client):
+    response = await client.post("/runs/", json={"name": "Target run"})
+    target = response.json()["id"]
+
+    # A command line script writing through the sync engine at the same time,
+    # which the writer task has to share the database lock with
+    script_errors = []
+
+    def script():
+        now = datetime.utcnow()
+        try:
+            for i in range(N_SCRIPT_RUNS):
+                with engine.begin() as conn:
+                    conn.execute(insert(test_run.TestRun).values(name="Script run", uut_serial=f"S-{i}",
+                                                                 status="running", created_at=now, updated_at=now))
+        except OperationalError as e:
+            script_errors.append(e)
+
+    thread = threading.Thread(target=script)
+    thread.start()
+    runs = [client.post("/runs/", json={"name": "Board test", "uut_serial": f"SN-{i}"}) for i in range(N_RUNS)]
+    phases = [client.post(f"/runs/{target}/phases/bulk", json=[{"name": f"phase {i}", "status": "passed"}] * 2)
+              for i in range(N_PHASE_BATCHES)]
+    responses = await asyncio.gather(*runs, *phases)
+    await asyncio.to_thread(thread.join)
+
+    failures = [response.text for response in responses if response.status_code != 200]
+    assert failures == []
+    assert script_errors == []
+    assert _count(test_run.TestRun) == 1 + N_RUNS + N_SCRIPT_RUNS
+    assert _count(test_phase.TestPhase) == 2 * N_PHASE_BATCHES
+    run_ids = [response.json()["id"] for response in responses[:N_RUNS]]
+    assert len(set(run_ids)) == N_RUNS
+
+
+async def test_failing_job_only_fails_itself(database):
+    from app.database import AsyncSessionLocal
+
+    queue = WriteQueue(AsyncSessionLocal)
+
+    def job(i):
+        async def write(session):
+            if i % 10 == 3:
+                raise ValueError(f"job {i}")
+            session.add(test_run.TestRun(name="Board test", uut_serial=f"SN-{i}"))
+            await session.flush()
+            return i
+        return write
+
+    results = await asyncio.gather(*(queue.submit(job(i)) for i in range(100)), return_exceptions=True)
+    await queue.close()
+
+    failed = [i for i, result in enumerate(results) if isinstance(result, Exception)]
+    assert failed == [i for i in range(100) if i % 10 == 3]
+    assert all(isinstance(results[i], ValueError) for i in failed)
+    assert _count(test_run.TestRun) == 100 - len(failed)
+
+
+async def test_stopped_writer_fails_pending_and_new_jobs(database):
+    from app.database import AsyncSessionLocal
+
+    queue = WriteQueue(AsyncSessionLocal)
+    started = asyncio.Event()
+
+    async def slow(session):
+        started.set()
+        await asyncio.sleep(60)
+
+    async def quick(session):
+        return 1
+
+    pending = [asyncio.ensure_future(queue.submit(slow))]
+    await started.wait()
+    pending.append(asyncio.ensure_future(queue.submit(quick)))
+    await asyncio.sleep(0)
+    queue._task.cancel()
+
+    results = await asyncio.wait_for(asyncio.gather(*pending, return_exceptions=True), timeout=5)
+    assert all(isinstance(result, RuntimeError) for result in results)
+    with pytest.raises(RuntimeError):
+        await queue.submit(quick)